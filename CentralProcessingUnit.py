@@ -1,17 +1,94 @@
-from typing import cast
+import json
+import time
+from contextlib import AbstractContextManager
+from typing import Any, Iterable, Optional, Union, cast
+from base.FileRam import FileRam
 from base.Flag import Flag
+from base.PagedRam import PagedRam
 from base.Ram import Ram
 from base.Register import Register
+from base.RegisterFile import RegisterFile
 from central_processing_unit.ArithmeticLogicUnit import ArithmeticLogicUnit
 from central_processing_unit.ControlUnit import ControlUnit
 from central_processing_unit.InstructionUnit import InstructionUnit
+from central_processing_unit.Scheduler import Scheduler
+from IO_controller.InputDevice import InputDevice, IteratorInput
 from IO_controller.IoController import IoController
+from IO_controller.OutputDevice import MemoryOutput, OutputDevice
 from memory_controller.MemoryController import MemoryController
+from memory_controller.MemoryManagementUnit import MemoryManagementUnit
+from metrics.Metrics import Metrics
 from interrupt_controller.InterruptController import InterruptController
-from data_types import Byte, Instruction_OneOperand, Instruction_ThreeOperands, Instruction_TwoOperands, Instruction_ZeroOperands, MetaInstruction, InstructionSet, Interrupt, OperandType, OperandTypeSet, RegisterSet
+from loader.MachineSnapshot import MachineSnapshot
+from loader.ProgramImage import ProgramImage
+from profiler.Profiler import Profiler
+from tracer.Tracer import Tracer
+from data_types import Byte, CPUContext, ExecutionStatus, InstructionMethod, Instruction_OneOperand, Instruction_ThreeOperands, Instruction_TwoOperands, Instruction_ZeroOperands, MetaInstruction, InstructionSet, Interrupt, InterruptStatus, MemoryFault, OperandType, OperandTypeSet, RegisterSet, RunResult, Task
 
 
 class CentralProcessingUnit:
+    __RUN_STATUS_NAMES: dict[ExecutionStatus, str] = {
+        ExecutionStatus.HALTED: "halted",
+        ExecutionStatus.RETURNED: "returned",
+        ExecutionStatus.IDLE: "idle",
+    }
+
+    # The instruction set architecture, also used without a CPU (e.g. by the assembler):
+    # mnemonic and number of operands by opcode, operand types by code and register names by code
+    INSTRUCTIONS: dict[Byte, tuple[str, int]] = {
+        # Control operations
+        0x00: ("NOP",   0), # fmt: skip
+        0x01: ("HLT",   0), # fmt: skip
+        # Data operations
+        0x02: ("MOV",   2), # fmt: skip
+        # Branch operations
+        0x03: ("BEQ",   1), # fmt: skip
+        0x04: ("BNE",   1), # fmt: skip
+        0x05: ("B",     1), # fmt: skip
+        0x06: ("BL",    1), # fmt: skip
+        0x07: ("BX",    0), # fmt: skip
+        # Arithmetic operations
+        0x08: ("ADD",   3), # fmt: skip
+        0x09: ("SUB",   3), # fmt: skip
+        0x0A: ("MUL",   3), # fmt: skip
+        0x0B: ("DIV",   3), # fmt: skip
+        0x0C: ("MOD",   3), # fmt: skip
+        # Logical operations
+        0x0D: ("AND",   3), # fmt: skip
+        0x0E: ("ORR",   3), # fmt: skip
+        0x0F: ("XOR",   3), # fmt: skip
+        0x10: ("NOT",   2), # fmt: skip
+        # Shift operations
+        0x11: ("LSL",   3), # fmt: skip
+        0x12: ("LSR",   3), # fmt: skip
+        # Compare operations
+        0x13: ("CMP",   2), # fmt: skip
+        # Memory operations
+        0x14: ("LDR",   2), # fmt: skip
+        0x15: ("STR",   2), # fmt: skip
+        # I/O operations
+        0x16: ("INP",   1), # fmt: skip
+        0x17: ("OUT",   1), # fmt: skip
+        0x18: ("OUTC",  1), # fmt: skip
+        # Interrupt operations
+        0x19: ("WFI",   0), # fmt: skip
+        # Atomic memory operations
+        0x1A: ("CAS",   3), # fmt: skip
+        0x1B: ("SWP",   2), # fmt: skip
+        0x1C: ("LDADD", 3), # fmt: skip
+        # Block memory operations
+        0x1D: ("MCPY",  3), # fmt: skip
+        0x1E: ("MSET",  3), # fmt: skip
+        0x1F: ("MCMP",  3), # fmt: skip
+        0xFF: ("IRET",  0), # fmt: skip
+    }
+    OPERAND_TYPES: OperandTypeSet = {
+        0x00: OperandType(name="register", operand_size_byte=1),
+        0x01: OperandType(name="value",    operand_size_byte=2),
+        0x02: OperandType(name="address",  operand_size_byte=4),  # Values beyond 2 bytes, e.g. addresses of large memories # fmt: skip
+    }
+    REGISTER_NAMES: dict[Byte, str] = {code: f"R{code}" for code in range(0x07)}
+
     def __init__(
         self,
         memory_size_byte: int = 1024,
@@ -20,102 +97,583 @@ class CentralProcessingUnit:
         r2_size_byte: int = 2,
         r3_size_byte: int = 2,
         r5_size_byte: int = 2,
+        use_block_compiler: bool = True,
+        max_pending_interrupts: int = 1024,
+        interrupt_priorities: Optional[dict[Byte, int]] = None,
+        load_batch_size: int = 16,
+        max_interrupt_depth: int = 64,
+        scheduler_quantum: int = 10000,
+        memory: Optional[Ram] = None,
+        atomic_lock: Optional[AbstractContextManager] = None,
+        input_device: Optional[InputDevice] = None,
+        output_device: Optional[OutputDevice] = None,
+        profiler: Optional[Profiler] = None,
+        tracer: Optional[Tracer] = None,
+        register_banks: int = 8,
+        page_size: Optional[int] = None,
+        program_limit: Optional[int] = None,
+        fault_handler: Optional[Byte] = None,
+        memory_file: Optional[str] = None,
     ):
+        # Cores of a multi-core system pass the shared memory and the lock of its atomic instructions
+        # Options a clone is created with
+        self.__options: dict[str, object] = {
+            "use_block_compiler": use_block_compiler,
+            "max_pending_interrupts": max_pending_interrupts,
+            "interrupt_priorities": interrupt_priorities,
+            "load_batch_size": load_batch_size,
+            "max_interrupt_depth": max_interrupt_depth,
+            "scheduler_quantum": scheduler_quantum,
+            "register_banks": register_banks,
+            "page_size": page_size,
+            "program_limit": program_limit,
+            "fault_handler": fault_handler,
+        }
         self.__Z: Flag = Flag()  # Zero flag
-        self.__memory: Ram = Ram(memory_size_byte)
+        # With page_size the memory is allocated page by page when it is first written,
+        # with memory_file it is the mapped file, shared with every process that maps it
+        if memory is None and memory_file is not None:
+            memory = FileRam(memory_file, memory_size_byte)
+        elif memory is None:
+            memory = Ram(memory_size_byte) if page_size is None else PagedRam(memory_size_byte, page_size) # fmt: skip
+        self.__memory: Ram = memory
+        # Memory faults start the program at fault_handler like a run interrupt
+        self.__fault_handler: Optional[Byte] = fault_handler
+        # Nested interrupts switch register banks, beyond register_banks - 1 levels contexts are copied
+        self.__register_file: RegisterFile = RegisterFile(number_of_registers=7, number_of_banks=register_banks)
         self.__register_set: RegisterSet = {
-            0x00: Register(size_byte=r0_size_byte, name="R0"),  # General purpose register # fmt: skip
-            0x01: Register(size_byte=r1_size_byte, name="R1"),  # General purpose register # fmt: skip
-            0x02: Register(size_byte=r2_size_byte, name="R2"),  # Output register # fmt: skip
-            0x03: Register(size_byte=r3_size_byte, name="R3"),  # Link register # fmt: skip
-            0x04: Register(size_byte=1,            name="R4"),  # Memory byte register only 1 byte # fmt: skip
-            0x05: Register(size_byte=r5_size_byte, name="R5"),  # Program counter # fmt: skip
-            0x06: Register(size_byte=r5_size_byte, name="R6"),  # Current program base address # fmt: skip
+            0x00: Register(size_byte=r0_size_byte, name=self.REGISTER_NAMES[0x00], register_file=self.__register_file, index=0x00),  # General purpose register # fmt: skip
+            0x01: Register(size_byte=r1_size_byte, name=self.REGISTER_NAMES[0x01], register_file=self.__register_file, index=0x01),  # General purpose register # fmt: skip
+            0x02: Register(size_byte=r2_size_byte, name=self.REGISTER_NAMES[0x02], register_file=self.__register_file, index=0x02),  # Output register # fmt: skip
+            0x03: Register(size_byte=r3_size_byte, name=self.REGISTER_NAMES[0x03], register_file=self.__register_file, index=0x03),  # Link register # fmt: skip
+            0x04: Register(size_byte=1,            name=self.REGISTER_NAMES[0x04], register_file=self.__register_file, index=0x04),  # Memory byte register only 1 byte # fmt: skip
+            0x05: Register(size_byte=r5_size_byte, name=self.REGISTER_NAMES[0x05], register_file=self.__register_file, index=0x05),  # Program counter # fmt: skip
+            0x06: Register(size_byte=r5_size_byte, name=self.REGISTER_NAMES[0x06], register_file=self.__register_file, index=0x06),  # Current program base address # fmt: skip
         }
         self.__arithmetic_logic_unit: ArithmeticLogicUnit = ArithmeticLogicUnit(self.__Z) # fmt: skip
         self.__instruction_unit: InstructionUnit          = InstructionUnit(self.__Z, self.__memory, self.__register_set) # fmt: skip
-        self.__io_controller: IoController                = IoController(self.__register_set)
-        self.__memory_controller: MemoryController        = MemoryController(self.__Z, self.__memory) # fmt: skip
-        self.__interrupt_controller: InterruptController  = InterruptController(self.__register_set) # fmt: skip
-        self.__instruction_set: InstructionSet = {
+        self.__io_controller: IoController                = IoController(self.__register_set, input_device, output_device) # fmt: skip
+        # With program_limit data addresses are relative to R6 and limited to program_limit bytes
+        self.__data_memory: Union[Ram, MemoryManagementUnit] = self.__memory
+        if program_limit is not None:
+            self.__data_memory = MemoryManagementUnit(self.__memory, self.__register_set[0x06], program_limit) # fmt: skip
+        self.__memory_controller: MemoryController        = MemoryController(self.__Z, self.__data_memory, atomic_lock) # fmt: skip
+        self.__interrupt_controller: InterruptController  = InterruptController(self.__register_set, self.__Z, max_pending_interrupts, interrupt_priorities, max_interrupt_depth) # fmt: skip
+        self.__scheduler: Scheduler = Scheduler(scheduler_quantum)
+        # Seconds WFI blocks without tasks, None until an interrupt arrives, 0 when run in slices
+        self.__idle_timeout: Optional[float] = None
+        self.__depth: int = 0
+        self.__timer: int = 0
+        # Set by restore, the next start continues the restored programs instead of booting
+        self.__restored: bool = False
+        # Pending load interrupts serviced together in one pass
+        self.__load_batch_size: int = load_batch_size
+        # Units executing the instructions by mnemonic
+        methods: dict[str, InstructionMethod] = {
             # Control operations
-            0x00: MetaInstruction(mnemonic="NOP",  method=cast(Instruction_ZeroOperands, self.__instruction_unit.asm_NOP),       number_of_operands=0), # fmt: skip
-            0x01: MetaInstruction(mnemonic="HLT",  method=cast(Instruction_ZeroOperands, self.__instruction_unit.asm_HLT),       number_of_operands=0), # fmt: skip
+            "NOP":   cast(Instruction_ZeroOperands, self.__instruction_unit.asm_NOP), # fmt: skip
+            "HLT":   cast(Instruction_ZeroOperands, self.__instruction_unit.asm_HLT), # fmt: skip
             # Data operations
-            0x02: MetaInstruction(mnemonic="MOV",  method=cast(Instruction_TwoOperands, self.__instruction_unit.asm_MOV),        number_of_operands=2), # fmt: skip
+            "MOV":   cast(Instruction_TwoOperands, self.__instruction_unit.asm_MOV), # fmt: skip
             # Branch operations
-            0x03: MetaInstruction(mnemonic="BEQ",  method=cast(Instruction_OneOperand, self.__instruction_unit.asm_BEQ),         number_of_operands=1), # fmt: skip
-            0x04: MetaInstruction(mnemonic="BNE",  method=cast(Instruction_OneOperand, self.__instruction_unit.asm_BNE),         number_of_operands=1), # fmt: skip
-            0x05: MetaInstruction(mnemonic="B",    method=cast(Instruction_OneOperand, self.__instruction_unit.asm_B),           number_of_operands=1), # fmt: skip
-            0x06: MetaInstruction(mnemonic="BL",   method=cast(Instruction_OneOperand, self.__instruction_unit.asm_BL),          number_of_operands=1), # fmt: skip
-            0x07: MetaInstruction(mnemonic="BX",   method=cast(Instruction_ZeroOperands, self.__instruction_unit.asm_BX),        number_of_operands=0), # fmt: skip
+            "BEQ":   cast(Instruction_OneOperand, self.__instruction_unit.asm_BEQ), # fmt: skip
+            "BNE":   cast(Instruction_OneOperand, self.__instruction_unit.asm_BNE), # fmt: skip
+            "B":     cast(Instruction_OneOperand, self.__instruction_unit.asm_B), # fmt: skip
+            "BL":    cast(Instruction_OneOperand, self.__instruction_unit.asm_BL), # fmt: skip
+            "BX":    cast(Instruction_ZeroOperands, self.__instruction_unit.asm_BX), # fmt: skip
             # Arithmetic operations
-            0x08: MetaInstruction(mnemonic="ADD",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_ADD), number_of_operands=3), # fmt: skip
-            0x09: MetaInstruction(mnemonic="SUB",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_SUB), number_of_operands=3), # fmt: skip
-            0x0A: MetaInstruction(mnemonic="MUL",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_MUL), number_of_operands=3), # fmt: skip
-            0x0B: MetaInstruction(mnemonic="DIV",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_DIV), number_of_operands=3), # fmt: skip
-            0x0C: MetaInstruction(mnemonic="MOD",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_MOD), number_of_operands=3), # fmt: skip
+            "ADD":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_ADD), # fmt: skip
+            "SUB":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_SUB), # fmt: skip
+            "MUL":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_MUL), # fmt: skip
+            "DIV":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_DIV), # fmt: skip
+            "MOD":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_MOD), # fmt: skip
             # Logical operations
-            0x0D: MetaInstruction(mnemonic="AND",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_AND), number_of_operands=3), # fmt: skip
-            0x0E: MetaInstruction(mnemonic="ORR",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_ORR), number_of_operands=3), # fmt: skip
-            0x0F: MetaInstruction(mnemonic="XOR",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_XOR), number_of_operands=3), # fmt: skip
-            0x10: MetaInstruction(mnemonic="NOT",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_NOT), number_of_operands=2), # fmt: skip
+            "AND":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_AND), # fmt: skip
+            "ORR":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_ORR), # fmt: skip
+            "XOR":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_XOR), # fmt: skip
+            "NOT":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_NOT), # fmt: skip
             # Shift operations
-            0x11: MetaInstruction(mnemonic="LSL",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_LSL), number_of_operands=3), # fmt: skip
-            0x12: MetaInstruction(mnemonic="LSR",  method=cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_LSR), number_of_operands=3), # fmt: skip
+            "LSL":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_LSL), # fmt: skip
+            "LSR":   cast(Instruction_ThreeOperands, self.__arithmetic_logic_unit.asm_LSR), # fmt: skip
             # Compare operations
-            0x13: MetaInstruction(mnemonic="CMP",  method=cast(Instruction_TwoOperands, self.__arithmetic_logic_unit.asm_CMP),   number_of_operands=2), # fmt: skip
+            "CMP":   cast(Instruction_TwoOperands, self.__arithmetic_logic_unit.asm_CMP), # fmt: skip
             # Memory operations
-            0x14: MetaInstruction(mnemonic="LDR",  method=cast(Instruction_TwoOperands, self.__memory_controller.asm_LDR),       number_of_operands=2), # fmt: skip
-            0x15: MetaInstruction(mnemonic="STR",  method=cast(Instruction_TwoOperands, self.__memory_controller.asm_STR),       number_of_operands=2), # fmt: skip
+            "LDR":   cast(Instruction_TwoOperands, self.__memory_controller.asm_LDR), # fmt: skip
+            "STR":   cast(Instruction_TwoOperands, self.__memory_controller.asm_STR), # fmt: skip
             # I/O operations
-            0x16: MetaInstruction(mnemonic="INP",  method=cast(Instruction_OneOperand, self.__io_controller.asm_INP),            number_of_operands=1), # fmt: skip
-            0x17: MetaInstruction(mnemonic="OUT",  method=cast(Instruction_OneOperand, self.__io_controller.asm_OUT),            number_of_operands=1), # fmt: skip
-            0x18: MetaInstruction(mnemonic="OUTC", method=cast(Instruction_OneOperand, self.__io_controller.asm_OUTC),           number_of_operands=1), # fmt: skip
+            "INP":   cast(Instruction_OneOperand, self.__io_controller.asm_INP), # fmt: skip
+            "OUT":   cast(Instruction_OneOperand, self.__io_controller.asm_OUT), # fmt: skip
+            "OUTC":  cast(Instruction_OneOperand, self.__io_controller.asm_OUTC), # fmt: skip
             # Interrupt operations
-            0xFF: MetaInstruction(mnemonic="IRET", method=cast(Instruction_ZeroOperands, self.__interrupt_controller.asm_IRET),  number_of_operands=0), # fmt: skip
+            "WFI":   cast(Instruction_ZeroOperands, self.__interrupt_controller.asm_WFI), # fmt: skip
+            # Atomic memory operations
+            "CAS":   cast(Instruction_ThreeOperands, self.__memory_controller.asm_CAS), # fmt: skip
+            "SWP":   cast(Instruction_TwoOperands, self.__memory_controller.asm_SWP), # fmt: skip
+            "LDADD": cast(Instruction_ThreeOperands, self.__memory_controller.asm_LDADD), # fmt: skip
+            # Block memory operations
+            "MCPY":  cast(Instruction_ThreeOperands, self.__memory_controller.asm_MCPY), # fmt: skip
+            "MSET":  cast(Instruction_ThreeOperands, self.__memory_controller.asm_MSET), # fmt: skip
+            "MCMP":  cast(Instruction_ThreeOperands, self.__memory_controller.asm_MCMP), # fmt: skip
+            "IRET":  cast(Instruction_ZeroOperands, self.__interrupt_controller.asm_IRET), # fmt: skip
         }
-        self.__operand_type_set: OperandTypeSet = {
-            0x00: OperandType(name="register", operand_size_byte=1),
-            0x01: OperandType(name="value",    operand_size_byte=2),
+        self.__instruction_set: InstructionSet = {
+            opcode: MetaInstruction(mnemonic=mnemonic, method=methods[mnemonic], number_of_operands=number_of_operands) # fmt: skip
+            for opcode, (mnemonic, number_of_operands) in self.INSTRUCTIONS.items()
         }
-        self.__control_unit: ControlUnit = ControlUnit(self.__memory, self.__instruction_set, self.__register_set, self.__operand_type_set) # fmt: skip
+        self.__operand_type_set: OperandTypeSet = self.OPERAND_TYPES
+        self.__control_unit: ControlUnit = ControlUnit(self.__memory, self.__instruction_set, self.__register_set, self.__operand_type_set, self.__Z, use_block_compiler, self.__data_memory) # fmt: skip
+        self.__control_unit.set_profiler(profiler)
+        self.__control_unit.set_tracer(tracer)
 
-    def __run_interrupt_sub_routine(self, address: Byte) -> None:
-        self.__interrupt_controller.save_current_context()
-        self.__run_CPU(address)
+    def __run_interrupt_sub_routine(self, interrupt: Interrupt) -> bool:
+        # The interrupted program's context is saved, IRET continues it. False if nesting is too deep
+        if not self.__interrupt_controller.save_current_context(interrupt):
+            print("Interrupt nesting limit reached, run interrupt refused")
+            if interrupt.on_complete is not None:
+                interrupt.on_complete(InterruptStatus.BUSY, b"Interrupt nesting limit reached") # fmt: skip
+            return False
+        self.__control_unit.set_program_counter(interrupt.memory_address)
+        self.__register_set[0x06].set(interrupt.memory_address)
+        return True
+
+    def __run_fault_handler(self, fault: MemoryFault) -> bool:
+        # The fault handler runs like a run interrupt with the faulting address in R0 and the access
+        # (1 read, 2 write) in R1. IRET continues after the faulting instruction
+        if self.__fault_handler is None:
+            return False
+        if not self.__run_interrupt_sub_routine(Interrupt(0x01, self.__fault_handler, bytearray())): # fmt: skip
+            return False
+        self.__register_set[0x00].set(fault.address)
+        self.__register_set[0x01].set(fault.access)
+        if self.__control_unit.profiler is not None:
+            self.__control_unit.profiler.enter_interrupt(0x01, self.__fault_handler)
+        return True
 
-    def __handle_interrupt(self) -> None:
-        interrupt: Interrupt = self.__interrupt_controller.get_next_interrupt() # fmt: skip
+    def __load_interrupt_program(self, interrupt: Interrupt) -> None:
+        try:
+            self.load_program(interrupt.memory_address, interrupt.arguments)
+        except ValueError as e:
+            print(f"Error in load, try again: {e}")
+            if interrupt.on_complete is not None:
+                interrupt.on_complete(InterruptStatus.ERROR, str(e).encode("utf-8"))
+            return
+        if interrupt.on_complete is not None:
+            result: dict[str, int] = {
+                "address": interrupt.memory_address,
+                "length": len(interrupt.arguments),
+            }
+            interrupt.on_complete(InterruptStatus.OK, json.dumps(result).encode("utf-8")) # fmt: skip
+
+    def __handle_interrupt(self) -> bool:
+        # True if a program was started
+        interrupts: list[Interrupt] = self.__interrupt_controller.get_next_interrupts(self.__load_batch_size) # fmt: skip
+        interrupt: Interrupt = interrupts[0]
         interrupt_command: Byte = interrupt.interrupt_command
-        interrupt_address: Byte = interrupt.memory_address
-        interrupt_args: bytearray = interrupt.arguments
+        profiler: Optional[Profiler] = self.__control_unit.profiler
+        start: int = time.perf_counter_ns() if profiler is not None else 0
         if interrupt_command == 0x00:
-            self.load_program(interrupt_address, interrupt_args)
+            for load_interrupt in interrupts:
+                self.__load_interrupt_program(load_interrupt)
         elif interrupt_command == 0x01:
-            self.__run_interrupt_sub_routine(interrupt_address)
+            started: bool = self.__run_interrupt_sub_routine(interrupt)
+            if started and profiler is not None:
+                # Serviced until its IRET or HLT
+                profiler.enter_interrupt(interrupt_command, interrupt.memory_address)
+            return started
+        elif interrupt_command == 0x02:
+            self.__scheduler.add_task(interrupt.memory_address, interrupt=interrupt)
+        elif interrupt_command == 0x03:
+            self.__interrupt_controller.report_metrics(interrupt)
         else:
-            print(f"Unknwown command: {interrupt_command}")
-            return
+            print(f"Unknown command: {interrupt_command}")
+            if interrupt.on_complete is not None:
+                interrupt.on_complete(InterruptStatus.UNKNOWN_COMMAND, b"")
+        if profiler is not None:
+            profiler.record_interrupt(interrupt_command, time.perf_counter_ns() - start)
+        return False
 
-    def __run_CPU(self, address: Byte) -> None:
+    def __switch_task(self, finished_status: Optional[str] = None) -> Optional[Task]:
+        # Timer interrupt: the running task's context is saved and the next task's context restored.
+        # A finished task is reported and dropped, without tasks the CPU goes back to the idle loop.
+        # A program the CPU was started at (not the CPU loop at 0x0000) continues as a task
+        interrupt_controller: InterruptController = self.__interrupt_controller
+        task: Optional[Task] = self.__scheduler.current
+        context: Optional[CPUContext] = None
+        if task is None and finished_status is None and self.__register_set[0x06].get() != 0x00:
+            task = self.__scheduler.add_running_program()
+        if task is not None:
+            if finished_status is None:
+                context = interrupt_controller.capture_context()
+            else:
+                interrupt_controller.complete(task.interrupt, finished_status, {"task": task.id, "cycles": task.cycles, "slices": task.slices}) # fmt: skip
+        task = self.__scheduler.switch(context)
+        if task is None:
+            self.__control_unit.set_program_counter(0x00)
+            self.__register_set[0x06].set(0x00)
+            interrupt_controller.idle_timeout = self.__idle_timeout
+        else:
+            interrupt_controller.restore_context(task.context)
+            # WFI in a task yields instead of blocking the other tasks
+            interrupt_controller.idle_timeout = 0
+        return task
+
+    def __start_CPU(self, address: Byte) -> None:
         self.__control_unit.set_program_counter(address)
         self.__register_set[0x06].set(address)
+        self.__control_unit.status = ExecutionStatus.RUNNING
+        self.__depth = 0  # Programs started by interrupts on top of the first one or the running task
+        self.__timer = 0  # Cycles left in the running task's quantum
+
+    def __resume_CPU(self) -> None:
+        # Continues a restored machine at its PC, programs it interrupted continue after their IRET
+        self.__restored = False
+        self.__control_unit.status = ExecutionStatus.RUNNING
+        self.__depth = self.__interrupt_controller.context_depth
+        self.__timer = 0
+
+    def __boot_CPU(self, address: Byte) -> None:
+        if self.__restored:
+            self.__resume_CPU()
+        else:
+            self.__start_CPU(address)
+
+    def __run_slice(self, max_instructions: Optional[int] = None) -> Optional[ExecutionStatus]:
+        # One loop for all programs, run interrupts push a context and IRET pops it. Runs until
+        # max_instructions are executed (None: no limit, the last block may go beyond it) and returns None,
+        # IDLE when the CPU waits for an interrupt, RETURNED when the program it was started at returns
+        interrupt_controller: InterruptController = self.__interrupt_controller
+        control_unit: ControlUnit = self.__control_unit
+        scheduler: Scheduler = self.__scheduler
+        metrics: Metrics = interrupt_controller.metrics
+        depth: int = self.__depth
+        timer: int = self.__timer
+        executed: int = 0
         try:
-            while True:
-                if self.__interrupt_controller.has_interrupt:
-                    self.__handle_interrupt()
-                self.__control_unit.clock()
-        except StopIteration as e:
-            print(f"StopIteration: {e}")
-            self.__run_CPU(0x00)  # jump to initial CPU loop
-        except StopAsyncIteration:
-            print("IRET")
-            return
+            while max_instructions is None or executed < max_instructions:
+                if interrupt_controller.has_interrupt and self.__handle_interrupt():
+                    depth += 1
+                task: Optional[Task] = scheduler.current
+                if depth == 0 and (task is not None or scheduler.has_ready_tasks):
+                    if task is None or timer <= 0:
+                        task = cast(Task, self.__switch_task())
+                        timer = scheduler.quantum
+                else:
+                    task = None  # Without task or in an interrupt on top of it, nothing counts as task cycles
+                error: Optional[Exception] = None
+                try:
+                    clocked: int = control_unit.clock() if task is None else control_unit.clock(timer) # fmt: skip
+                except Exception as e:
+                    # Instructions of a compiled block before the failing one count as executed
+                    clocked = control_unit.retired_instructions
+                    error = e
+                if task is not None:
+                    timer -= clocked
+                    task.cycles += clocked
+                executed += clocked
+                metrics.instructions += clocked
+                if error is not None:
+                    if not isinstance(error, MemoryFault) or not self.__run_fault_handler(error): # fmt: skip
+                        raise error
+                    depth += 1
+                    continue
+                status: ExecutionStatus = control_unit.status
+                if status == ExecutionStatus.RUNNING:
+                    continue
+                control_unit.status = ExecutionStatus.RUNNING
+                self.__io_controller.flush()
+                if status == ExecutionStatus.HALTED:
+                    print("HLT instruction executed")
+                    interrupt_controller.halt()
+                    if control_unit.profiler is not None:
+                        control_unit.profiler.exit_all_interrupts()
+                    depth = 0
+                    if scheduler.current is not None:
+                        self.__switch_task("halted")
+                        timer = scheduler.quantum
+                    else:
+                        control_unit.set_program_counter(0x00)  # jump to initial CPU loop
+                        self.__register_set[0x06].set(0x00)
+                elif status == ExecutionStatus.RETURNED:
+                    print("IRET")
+                    if depth > 0:
+                        depth -= 1
+                        if control_unit.profiler is not None:
+                            control_unit.profiler.exit_interrupt()
+                    elif scheduler.current is not None:
+                        self.__switch_task("returned")
+                        timer = scheduler.quantum
+                    else:
+                        return ExecutionStatus.RETURNED
+                elif status == ExecutionStatus.IDLE:
+                    timer = 0
+                    if not scheduler.has_ready_tasks:
+                        return ExecutionStatus.IDLE
+        finally:
+            self.__depth = depth
+            self.__timer = timer
+        return None
+
+    def __run_CPU(self, address: Byte) -> None:
+        # Returns when the program started at address (or resumed after restore) returns with IRET
+        self.__boot_CPU(address)
+        while self.__run_slice() == ExecutionStatus.IDLE:
+            self.__interrupt_controller.wait_for_interrupt()
 
-    def start(self, address: Byte = 0x00) -> None:
-        self.__interrupt_controller.start_interrupt_listener()
+    def start(
+        self, address: Byte = 0x00, host: str = "localhost", port: Optional[int] = 9999
+    ) -> None:
+        # Without port no listener is started, interrupts come from queue_interrupt only.
+        # After restore the CPU continues where the snapshot was taken instead of at address
+        if port is not None:
+            self.__interrupt_controller.start_interrupt_listener(host, port)
         self.__run_CPU(address)
 
+    def start_sliced(self, address: Byte = 0x00) -> None:
+        # Instead of start, the caller runs the CPU with run_slice (e.g. a host of many machines).
+        # WFI never blocks, an idle CPU returns from run_slice until an interrupt is queued
+        self.__idle_timeout = 0
+        self.__interrupt_controller.idle_timeout = 0
+        self.__boot_CPU(address)
+
+    def run_slice(self, max_instructions: int) -> Optional[ExecutionStatus]:
+        # About max_instructions of the programs started with start_sliced, see __run_slice
+        return self.__run_slice(max_instructions)
+
+    def abort(self, error: str) -> None:
+        # After an exception in run_slice: the running programs end as if halted, their run interrupts
+        # and task are answered with the error and the CPU continues with the next task or at 0x0000
+        self.__interrupt_controller.halt("error", {"error": error})
+        if self.__control_unit.profiler is not None:
+            self.__control_unit.profiler.exit_all_interrupts()
+        self.__depth = 0
+        self.__control_unit.status = ExecutionStatus.RUNNING
+        if self.__scheduler.current is not None:
+            self.__switch_task("error")
+            self.__timer = self.__scheduler.quantum
+        else:
+            self.__control_unit.set_program_counter(0x00)
+            self.__register_set[0x06].set(0x00)
+
+    def queue_interrupt(
+        self, interrupt: Interrupt, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        # For interrupts from the same process, thread-safe like the listener
+        return self.__interrupt_controller.queue_interrupt(interrupt, block, timeout)
+
     def load_program(self, address: Byte, program: bytearray) -> None:
-        self.__memory.set_with_address(address, program)
+        self.__memory.load_program(address, program)
+
+    def load_image(self, image: ProgramImage) -> None:
+        self.__memory.load_program(image.load_address, image.code)
+
+    def map_image(
+        self,
+        address: int,
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        read_only: bool = True,
+    ) -> int:
+        # Maps a binary file into the memory without copying it, read-only (ROM) or copy-on-write
+        if not isinstance(self.__memory, PagedRam):
+            raise ValueError("Mapping images requires paged memory (page_size)")
+        return self.__memory.map_file(address, path, offset, length, read_only)
+
+    def get_instruction_set(self) -> InstructionSet:
+        return self.__instruction_set
+
+    def get_operand_type_set(self) -> OperandTypeSet:
+        return self.__operand_type_set
+
+    def get_register_set(self) -> RegisterSet:
+        return self.__register_set
+
+    def get_memory(self) -> Ram:
+        return self.__memory
+
+    def get_interrupt_controller(self) -> InterruptController:
+        return self.__interrupt_controller
+
+    def get_control_unit(self) -> ControlUnit:
+        return self.__control_unit
+
+    def get_scheduler(self) -> Scheduler:
+        return self.__scheduler
+
+    def get_profiler(self) -> Optional[Profiler]:
+        return self.__control_unit.profiler
+
+    def set_profiler(self, profiler: Optional[Profiler]) -> None:
+        # Compiled blocks are profiled as a whole, pass None to run at full speed again
+        self.__control_unit.set_profiler(profiler)
+
+    def get_tracer(self) -> Optional[Tracer]:
+        return self.__control_unit.tracer
+
+    def set_tracer(self, tracer: Optional[Tracer]) -> None:
+        # Compiled blocks record their instructions too, pass None to run at full speed again
+        self.__control_unit.set_tracer(tracer)
+
+    def dump_trace(self, path: Optional[str] = None) -> None:
+        # Writes the recorded instructions to path or the tracer's own file
+        if self.__control_unit.tracer is None:
+            raise ValueError("Tracing is not enabled")
+        self.__control_unit.tracer.dump(path)
+
+    def snapshot(self) -> MachineSnapshot:
+        # Memory, registers, Z flag, saved contexts and pending interrupts (without their callbacks).
+        # Only consistent while the CPU is not running, e.g. before start, between headless runs or slices.
+        # Paged memory is not saved, its address space would be stored in full
+        if isinstance(self.__memory, PagedRam):
+            raise ValueError("Snapshots of paged memory (page_size) are not supported")
+        interrupt_controller: InterruptController = self.__interrupt_controller
+        return MachineSnapshot(
+            self.__memory.to_bytes(),
+            [register.size_byte for register in self.__register_set.values()],
+            [register.get() for register in self.__register_set.values()],
+            self.__Z.isFlagSet,
+            interrupt_controller.get_contexts(),
+            interrupt_controller.get_pending_interrupts(),
+        )
+
+    def restore(self, snapshot: MachineSnapshot) -> None:
+        # The memory is copied in one piece, decoded and compiled code stays cached if it is unchanged
+        if len(snapshot.memory) != len(self.__memory):
+            raise ValueError(f"Snapshot memory size {len(snapshot.memory)} does not match the CPU's {len(self.__memory)}") # fmt: skip
+        if snapshot.register_sizes != [register.size_byte for register in self.__register_set.values()]: # fmt: skip
+            raise ValueError("Snapshot register sizes do not match the CPU's")
+        self.__memory.load_program(0, snapshot.memory)
+        # Selects the register bank of the running program, its registers are set afterwards
+        self.__interrupt_controller.set_contexts(snapshot.contexts)
+        for register, value in zip(self.__register_set.values(), snapshot.registers):
+            register.set(value)
+        self.__Z.isFlagSet = snapshot.zero_flag
+        self.__interrupt_controller.set_pending_interrupts(snapshot.interrupts)
+        self.__restored = True
+
+    @classmethod
+    def from_snapshot(
+        cls, snapshot: MachineSnapshot, **options: Any
+    ) -> "CentralProcessingUnit":
+        # Memory and register sizes come from the snapshot, options are passed to the constructor
+        register_sizes: list[int] = snapshot.register_sizes
+        cpu: CentralProcessingUnit = cls(
+            memory_size_byte=len(snapshot.memory),
+            r0_size_byte=register_sizes[0x00],
+            r1_size_byte=register_sizes[0x01],
+            r2_size_byte=register_sizes[0x02],
+            r3_size_byte=register_sizes[0x03],
+            r5_size_byte=register_sizes[0x05],
+            **options,
+        )
+        cpu.restore(snapshot)
+        return cpu
+
+    def clone(self) -> "CentralProcessingUnit":
+        # New CPU with the state of this one, e.g. a warmed-up machine for every job
+        return self.from_snapshot(self.snapshot(), **self.__options)
+
+    def add_task(self, entry: Byte, base: Optional[Byte] = None) -> Task:
+        # The task is scheduled once the CPU is started, at runtime tasks are added with interrupt 0x02
+        return self.__scheduler.add_task(entry, base)
+
+    def run(
+        self,
+        program: Union[bytearray, ProgramImage, None],
+        entry: Optional[Byte] = None,
+        max_cycles: Optional[int] = None,
+        stdin: Union[str, Iterable[str], InputDevice, None] = None,
+        timeout: Optional[float] = None,
+        reset_memory: bool = False,
+        output: Optional[OutputDevice] = None,
+    ) -> RunResult:
+        # Runs a program without interrupt listener until HLT, IRET, WFI or the budget is used up.
+        # A bytearray is loaded at entry, an image at its load address (R6) and started at its entry.
+        # Registers and Z flag are reset before the run, the memory only with reset_memory
+        # (everything outside of the program is set to zero).
+        # Output goes to the output device if one is given, otherwise it is returned in the result.
+        if isinstance(program, ProgramImage):
+            self.load_image(program)
+            program_address: Byte = program.load_address
+            program_length: int = len(program.code)
+            entry = program.entry if entry is None else entry
+        else:
+            if entry is None:
+                raise ValueError("Entry address is required unless a program image is run")
+            program_address = entry
+            program_length = 0
+            if program is not None:
+                self.load_program(entry, program)
+                program_length = len(program)
+        if reset_memory:
+            program_end: int = program_address + program_length
+            self.__memory.fill(0, program_address)
+            self.__memory.fill(program_end, len(self.__memory) - program_end)
+        if isinstance(stdin, InputDevice):
+            input_device: InputDevice = stdin
+        else:
+            if isinstance(stdin, str):
+                stdin = stdin.splitlines()
+            input_device = IteratorInput(stdin if stdin is not None else ())
+        # Without output device the output is captured in the result
+        captured_output: Optional[MemoryOutput] = None
+        if output is None:
+            output = captured_output = MemoryOutput()
+
+        for register in self.__register_set.values():
+            register.set(0)
+        self.__Z.isFlagSet = False
+        self.__restored = False
+        self.__control_unit.set_program_counter(entry)
+        self.__register_set[0x06].set(program_address)
+
+        io_controller: IoController = self.__io_controller
+        devices = (io_controller.input_device, io_controller.output_device)
+        io_controller.input_device, io_controller.output_device = input_device, output
+        # Nothing services interrupts during the run, WFI without pending interrupt ends it
+        interrupt_controller: InterruptController = self.__interrupt_controller
+        idle_timeout: Optional[float] = interrupt_controller.idle_timeout
+        interrupt_controller.idle_timeout = 0
+        control_unit: ControlUnit = self.__control_unit
+        control_unit.status = ExecutionStatus.RUNNING
+        cycles: int = 0
+        error: Optional[str] = None
+        start_time: float = time.perf_counter()
+        deadline: Optional[float] = None if timeout is None else start_time + timeout
+        try:
+            while True:
+                if max_cycles is None:
+                    cycles += control_unit.clock()
+                elif cycles < max_cycles:
+                    cycles += control_unit.clock(max_cycles - cycles)
+                else:
+                    status: str = "cycle_limit"
+                    break
+                if control_unit.status != ExecutionStatus.RUNNING:
+                    status = self.__RUN_STATUS_NAMES[control_unit.status]
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    status = "timeout"
+                    break
+        except Exception as e:
+            # Instructions of a compiled block before the failing one count as executed
+            cycles += control_unit.retired_instructions
+            status = "error"
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            output.flush()
+            io_controller.input_device, io_controller.output_device = devices
+            interrupt_controller.idle_timeout = idle_timeout
+            interrupt_controller.metrics.instructions += cycles
+            control_unit.status = ExecutionStatus.RUNNING
+        return RunResult(
+            status=status,
+            registers={
+                register.name: register.get() for register in self.__register_set.values()
+            },
+            zero_flag=self.__Z.isFlagSet,
+            cycles=cycles,
+            wall_time=time.perf_counter() - start_time,
+            output="" if captured_output is None else captured_output.getvalue(),
+            error=error,
+        )
@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, TextIO, Union
+
+
+class InputDevice(ABC):
+    # Source of the lines INP reads, EOFError when there is no more input
+    @abstractmethod
+    def read_line(self, prompt: str) -> str: ...
+
+    def close(self) -> None:
+        pass
+
+
+class ConsoleInput(InputDevice):
+    def read_line(self, prompt: str) -> str:
+        return input(prompt)
+
+
+class IteratorInput(InputDevice):
+    def __init__(self, lines: Iterable[str]):
+        self.__lines: Iterator[str] = iter(lines)
+
+    def read_line(self, prompt: str) -> str:
+        try:
+            return next(self.__lines)
+        except StopIteration:
+            raise EOFError("No more input for INP") from None
+
+
+class FileInput(IteratorInput):
+    # One line per INP, read lazily from a path or an open text stream
+    def __init__(self, file: Union[str, TextIO]):
+        self.__stream: TextIO = (
+            open(file, "r", encoding="utf-8") if isinstance(file, str) else file
+        )
+        super().__init__(line.rstrip("\r\n") for line in self.__stream)
+
+    def close(self) -> None:
+        self.__stream.close()
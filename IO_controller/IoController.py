@@ -1,13 +1,28 @@
+from typing import Optional
 from base.Register import Register
 from data_types import RegisterSet
+from IO_controller.InputDevice import ConsoleInput, InputDevice
+from IO_controller.OutputDevice import ConsoleOutput, OutputDevice
 
 
 class IoController:
-    def __init__(self, register_set: RegisterSet):
+    def __init__(
+        self,
+        register_set: RegisterSet,
+        input_device: Optional[InputDevice] = None,
+        output_device: Optional[OutputDevice] = None,
+    ):
         self.R2 = register_set[0x02]
+        self.input_device: InputDevice = input_device or ConsoleInput()
+        self.output_device: OutputDevice = output_device or ConsoleOutput()
+
+    def flush(self) -> None:
+        self.output_device.flush()
 
     def asm_INP(self, register: Register) -> None:
-        text: str = input("INP: ")
+        # Pending output (e.g. a question) is shown before waiting for input
+        self.output_device.flush()
+        text: str = self.input_device.read_line("INP: ")
         try:
             data: int = int(text)
         except ValueError:  # if the input is not an integer convert it to ascii
@@ -16,8 +31,8 @@ class IoController:
 
     def asm_OUT(self, register: Register) -> None:
         self.R2.set(register.get())
-        print(f"{register.get()}")
+        self.output_device.write(f"{register.get()}\n")
 
     def asm_OUTC(self, register: Register) -> None:
         self.R2.set(register.get())
-        print(f"{chr(register.get())}", end="")
+        self.output_device.write(chr(register.get()))
@@ -0,0 +1,91 @@
+import sys
+from abc import ABC, abstractmethod
+from typing import TextIO
+
+
+class OutputDevice(ABC):
+    # Collects the output of OUT/OUTC and hands it to the sink in large writes.
+    # The CPU flushes on INP, when a program stops (HLT, IRET, WFI) and at the end of a run
+    def __init__(self, buffer_size: int = 64 * 1024):
+        self.buffer_size: int = buffer_size
+        self.__buffer: list[str] = []
+        self.__buffered: int = 0
+
+    def write(self, text: str) -> None:
+        self.__buffer.append(text)
+        self.__buffered += len(text)
+        if self.__buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.__buffer:
+            text: str = "".join(self.__buffer)
+            self.__buffer.clear()
+            self.__buffered = 0
+            self.write_to_sink(text)
+
+    @abstractmethod
+    def write_to_sink(self, text: str) -> None: ...
+
+    def close(self) -> None:
+        self.flush()
+
+
+class ConsoleOutput(OutputDevice):
+    # Line buffered by default, so OUT shows up right away and OUTC strings in one write
+    def __init__(self, buffer_size: int = 4096, line_buffered: bool = True):
+        super().__init__(buffer_size)
+        self.line_buffered: bool = line_buffered
+
+    def write(self, text: str) -> None:
+        super().write(text)
+        if self.line_buffered and "\n" in text:
+            self.flush()
+
+    def write_to_sink(self, text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class StreamOutput(OutputDevice):
+    # Any open text stream, e.g. a pipe or a file the caller manages
+    def __init__(self, stream: TextIO, buffer_size: int = 64 * 1024):
+        super().__init__(buffer_size)
+        self.stream: TextIO = stream
+
+    def write_to_sink(self, text: str) -> None:
+        self.stream.write(text)
+
+    def flush(self) -> None:
+        super().flush()
+        self.stream.flush()
+
+
+class FileOutput(StreamOutput):
+    def __init__(self, path: str, buffer_size: int = 1024 * 1024, append: bool = False):
+        super().__init__(
+            open(path, "a" if append else "w", encoding="utf-8"), buffer_size
+        )
+
+    def close(self) -> None:
+        super().close()
+        self.stream.close()
+
+
+class MemoryOutput(OutputDevice):
+    def __init__(self):
+        super().__init__()
+        self.__chunks: list[str] = []
+
+    def write(self, text: str) -> None:
+        # Nothing to save by buffering, the text is kept as it is
+        self.write_to_sink(text)
+
+    def write_to_sink(self, text: str) -> None:
+        self.__chunks.append(text)
+
+    def getvalue(self) -> str:
+        return "".join(self.__chunks)
+
+    def clear(self) -> None:
+        self.__chunks.clear()
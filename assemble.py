@@ -0,0 +1,21 @@
+import argparse
+import os
+from assembler.Assembler import Assembler, get_default_cache_directory
+from loader.ProgramImage import ProgramImage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Assemble a program into a binary program image")
+    parser.add_argument("source", help="Assembly source file")
+    parser.add_argument("-o", "--output", default=None, help="Image file (default: source with .vcpu extension)")
+    parser.add_argument("--cache-dir", default=get_default_cache_directory(), help="Directory of cached images")
+    args = parser.parse_args()
+
+    image: ProgramImage = Assembler().assemble_file(args.source, args.cache_dir)
+    output: str = args.output or os.path.splitext(args.source)[0] + ".vcpu"
+    image.write_file(output)
+    print(f"{output}: {len(image.code)} bytes, load address 0x{image.load_address:02X}, entry 0x{image.entry:02X}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import re
+from typing import Optional
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import Byte, OperandTypeSet
+from loader.ProgramImage import ProgramImage
+
+type AssemblyLine = tuple[int, str, list[str]]  # (line number, mnemonic or directive, operands)
+
+
+def get_default_cache_directory() -> str:
+    return os.environ.get(
+        "VIRTUAL_CPU_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "virtual_cpu_python"),
+    )
+
+
+class Assembler:
+    # Part of the cache key, increase when the generated bytecode changes
+    VERSION: int = 4
+    DEFAULT_LOAD_ADDRESS: int = 0x0A
+    __REGISTER_OPERAND: int = 0x00
+    __VALUE_OPERAND: int = 0x01
+    __ADDRESS_OPERAND: int = 0x02
+    # Labels in front of an instruction, possibly several
+    __LABEL_PATTERN: re.Pattern[str] = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*:")
+    # Comments and operand separators, character literals are matched to skip them
+    __SEPARATOR_PATTERN: re.Pattern[str] = re.compile(r"'.'|[;,]")
+
+    def __init__(self) -> None:
+        # The instruction set comes from the CPU's tables, no CPU is created
+        self.__opcodes: dict[str, tuple[Byte, int]] = {
+            mnemonic: (opcode, number_of_operands)
+            for opcode, (mnemonic, number_of_operands) in CentralProcessingUnit.INSTRUCTIONS.items() # fmt: skip
+        }
+        self.__register_codes: dict[str, Byte] = {
+            name: code for code, name in CentralProcessingUnit.REGISTER_NAMES.items()
+        }
+        operand_type_set: OperandTypeSet = CentralProcessingUnit.OPERAND_TYPES
+        self.__value_size_byte: int = operand_type_set[self.__VALUE_OPERAND].operand_size_byte # fmt: skip
+        self.__address_size_byte: int = operand_type_set[self.__ADDRESS_OPERAND].operand_size_byte # fmt: skip
+
+    def __strip_comment(self, line: str) -> str:
+        for match in self.__SEPARATOR_PATTERN.finditer(line):
+            if match.group() == ";":
+                return line[: match.start()]
+        return line
+
+    def __split_operands(self, text: str) -> list[str]:
+        operands: list[str] = []
+        start: int = 0
+        for match in self.__SEPARATOR_PATTERN.finditer(text):
+            if match.group() == ",":
+                operands.append(text[start : match.start()].strip())
+                start = match.end()
+        operands.append(text[start:].strip())
+        return operands
+
+    def __parse_lines(self, source: str) -> list[AssemblyLine]:
+        lines: list[AssemblyLine] = []
+        for line_number, line in enumerate(source.splitlines(), start=1):
+            line = self.__strip_comment(line)
+            while (label := self.__LABEL_PATTERN.match(line)) is not None:
+                lines.append((line_number, label.group(1) + ":", []))
+                line = line[label.end() :]
+            line = line.strip()
+            if not line:
+                continue
+            parts: list[str] = line.split(None, 1)
+            operands: list[str] = []
+            if len(parts) > 1:
+                operands = self.__split_operands(parts[1])
+            # Mnemonics are case-insensitive, directives start with a dot
+            mnemonic: str = parts[0].lower() if parts[0].startswith(".") else parts[0].upper() # fmt: skip
+            lines.append((line_number, mnemonic, operands))
+        return lines
+
+    def __parse_value(self, text: str, labels: dict[str, int], line_number: int) -> int:
+        text = text.strip()
+        if text.startswith("[") and text.endswith("]"):
+            text = text[1:-1].strip()
+        if text.startswith("#"):
+            text = text[1:]
+        if len(text) == 3 and text[0] == text[2] == "'":
+            return ord(text[1])
+        if text in labels:
+            return labels[text]
+        try:
+            return int(text, 0)
+        except ValueError:
+            raise ValueError(f"Line {line_number}: Unknown value or label: {text}") from None
+
+    @staticmethod
+    def __fits(value: int, size_byte: int) -> bool:
+        # Signed or unsigned
+        bits: int = 8 * size_byte
+        return -(1 << (bits - 1)) <= value < 1 << bits
+
+    def __fits_value_operand(self, value: int) -> bool:
+        return self.__fits(value, self.__value_size_byte)
+
+    @staticmethod
+    def __get_register_name(text: str) -> str:
+        # Registers may be written in brackets when they hold an address, e.g. LDR R0, [R1]
+        text = text.strip()
+        if text.startswith("[") and text.endswith("]"):
+            text = text[1:-1].strip()
+        return text.upper()
+
+    def __is_register(self, text: str) -> bool:
+        return self.__get_register_name(text) in self.__register_codes
+
+    def __is_address_operand(self, text: str) -> bool:
+        # Literals that do not fit into a value operand are encoded as address operands, labels never are
+        try:
+            value: int = self.__parse_value(text, {}, 0)
+        except ValueError:
+            return False
+        return not self.__fits_value_operand(value)
+
+    def __get_size(self, mnemonic: str, operands: list[str], line_number: int) -> int:
+        if mnemonic in (".load", ".entry"):
+            if len(operands) != 1:
+                raise ValueError(f"Line {line_number}: {mnemonic} expects 1 operand, got {len(operands)}") # fmt: skip
+            return 0
+        if mnemonic in (".byte", ".word") and not operands:
+            raise ValueError(f"Line {line_number}: {mnemonic} expects at least 1 operand")
+        if mnemonic == ".byte":
+            return len(operands)
+        if mnemonic == ".word":
+            return len(operands) * self.__value_size_byte
+        if mnemonic not in self.__opcodes:
+            raise ValueError(f"Line {line_number}: Unknown mnemonic: {mnemonic}")
+        number_of_operands: int = self.__opcodes[mnemonic][1]
+        if len(operands) != number_of_operands:
+            raise ValueError(
+                f"Line {line_number}: {mnemonic} expects {number_of_operands} operands, got {len(operands)}"
+            )
+        if number_of_operands == 0:
+            return 1
+        if self.__is_register(operands[-1]):
+            return 2 + number_of_operands
+        if self.__is_address_operand(operands[-1]):
+            return 2 + (number_of_operands - 1) + self.__address_size_byte
+        return 2 + (number_of_operands - 1) + self.__value_size_byte
+
+    def __get_register_code(self, text: str, line_number: int) -> Byte:
+        if not self.__is_register(text):
+            raise ValueError(f"Line {line_number}: Expected a register, got: {text}")
+        return self.__register_codes[self.__get_register_name(text)]
+
+    def __encode_value(self, value: int, size_byte: int, line_number: int) -> bytes:
+        # Negative values are stored as two's complement
+        if not self.__fits(value, size_byte):
+            raise ValueError(f"Line {line_number}: Value {value} does not fit into {size_byte} byte(s)") # fmt: skip
+        return (value & ((1 << (8 * size_byte)) - 1)).to_bytes(size_byte, byteorder="little")
+
+    def assemble(self, source: str) -> ProgramImage:
+        lines: list[AssemblyLine] = self.__parse_lines(source)
+
+        # First pass: label offsets (relative to the program base address R6)
+        labels: dict[str, int] = {}
+        offset: int = 0
+        for line_number, mnemonic, operands in lines:
+            if mnemonic.endswith(":"):
+                label: str = mnemonic[:-1]
+                if label in labels:
+                    raise ValueError(f"Line {line_number}: Duplicate label: {label}")
+                labels[label] = offset
+                continue
+            offset += self.__get_size(mnemonic, operands, line_number)
+
+        # Second pass: bytecode
+        code: bytearray = bytearray()
+        load_address: int = self.DEFAULT_LOAD_ADDRESS
+        entry_offset: int = 0
+        for line_number, mnemonic, operands in lines:
+            if mnemonic.endswith(":"):
+                continue
+            if mnemonic == ".load":
+                load_address = self.__parse_value(operands[0], {}, line_number)
+            elif mnemonic == ".entry":
+                entry_offset = self.__parse_value(operands[0], labels, line_number)
+            elif mnemonic == ".byte":
+                for operand in operands:
+                    code += self.__encode_value(self.__parse_value(operand, labels, line_number), 1, line_number) # fmt: skip
+            elif mnemonic == ".word":
+                for operand in operands:
+                    code += self.__encode_value(self.__parse_value(operand, labels, line_number), self.__value_size_byte, line_number) # fmt: skip
+            else:
+                opcode, number_of_operands = self.__opcodes[mnemonic]
+                code.append(opcode)
+                if number_of_operands == 0:
+                    continue
+                last_operand: str = operands[-1]
+                is_register: bool = self.__is_register(last_operand)
+                is_address: bool = not is_register and self.__is_address_operand(last_operand) # fmt: skip
+                if is_register:
+                    code.append(self.__REGISTER_OPERAND)
+                else:
+                    code.append(self.__ADDRESS_OPERAND if is_address else self.__VALUE_OPERAND)
+                for operand in operands[:-1]:
+                    code.append(self.__get_register_code(operand, line_number))
+                if is_register:
+                    code.append(self.__get_register_code(last_operand, line_number))
+                elif is_address:
+                    value: int = self.__parse_value(last_operand, labels, line_number)
+                    code += self.__encode_value(value, self.__address_size_byte, line_number)
+                else:
+                    value = self.__parse_value(last_operand, labels, line_number)
+                    if not self.__fits_value_operand(value):
+                        raise ValueError(f"Line {line_number}: Label {last_operand} does not fit into a value operand") # fmt: skip
+                    code += self.__encode_value(value, self.__value_size_byte, line_number)
+        return ProgramImage(load_address, load_address + entry_offset, bytes(code))
+
+    def assemble_file(
+        self, path: str, cache_directory: Optional[str] = None
+    ) -> ProgramImage:
+        # Assembled images are cached on disk by the hash of the source
+        with open(path, "rb") as file:
+            source: bytes = file.read()
+        cache_directory = cache_directory or get_default_cache_directory()
+        source_hash: str = hashlib.sha256(
+            f"v{self.VERSION}:".encode() + source
+        ).hexdigest()
+        cache_path: str = os.path.join(cache_directory, f"{source_hash}.vcpu")
+        if os.path.exists(cache_path):
+            try:
+                return ProgramImage.read_file(cache_path)
+            except ValueError:
+                pass  # Broken cache entry, assemble again
+        image: ProgramImage = self.assemble(source.decode("utf-8"))
+        os.makedirs(cache_directory, exist_ok=True)
+        temporary_path: str = f"{cache_path}.{os.getpid()}.tmp"
+        image.write_file(temporary_path)
+        os.replace(temporary_path, cache_path)
+        return image
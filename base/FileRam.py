@@ -0,0 +1,44 @@
+import mmap
+import os
+from typing import Optional
+from base.Ram import Ram
+
+
+class FileRam(Ram):
+    # Ram in a mapped file. Writes go to the file, so processes that map the same file share the memory
+    # through the page cache instead of each holding a copy. With copy_on_write the file is only read
+    # and writes stay private to this Ram
+    def __init__(
+        self,
+        path: str,
+        memory_size_byte: Optional[int] = None,
+        copy_on_write: bool = False,
+    ):
+        # Without memory_size_byte the memory is as large as the file. A shorter file is extended with zeros
+        mode: str = "rb" if copy_on_write else "r+b" if os.path.exists(path) else "w+b"
+        with open(path, mode) as file:
+            file_size: int = os.fstat(file.fileno()).st_size
+            if memory_size_byte is None:
+                memory_size_byte = file_size
+            if memory_size_byte <= 0:
+                raise ValueError(f"Memory file {path} is empty")
+            if file_size < memory_size_byte:
+                if copy_on_write:
+                    raise ValueError(f"Memory file {path} has {file_size} of {memory_size_byte} bytes") # fmt: skip
+                file.truncate(memory_size_byte)
+            self.__mapping: mmap.mmap = mmap.mmap(
+                file.fileno(),
+                memory_size_byte,
+                access=mmap.ACCESS_COPY if copy_on_write else mmap.ACCESS_WRITE,
+            )
+        self.__copy_on_write: bool = copy_on_write
+        super().__init__(memory_size_byte, memoryview(self.__mapping))
+
+    def flush(self) -> None:
+        # Writes changed pages back to the file
+        if not self.__copy_on_write:
+            self.__mapping.flush()
+
+    def close(self) -> None:
+        super().close()
+        self.__mapping.close()
@@ -0,0 +1,262 @@
+import mmap
+from typing import Iterator, Optional, Union
+from base.Ram import Ram
+from data_types import Buffer, Byte, MemoryFault, PageProtection
+
+
+class PagedRam(Ram):
+    # Memory of fixed-size pages that are allocated on their first non-zero write. Pages that were
+    # never written read as zeros and cost nothing, so large address spaces only pay for touched pages.
+    # Accesses to pages without the permission raise a MemoryFault. Pages can be mapped from a file
+    def __init__(self, memory_size_byte: int, page_size: int = 4096):
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError("Page size has to be a power of two")
+        super().__init__(0)
+        self.page_size: int = page_size
+        self.__page_shift: int = page_size.bit_length() - 1
+        self.__offset_mask: int = page_size - 1
+        self.__size: int = memory_size_byte
+        # Mapped pages are views into a file mapping until they are written
+        self.__pages: dict[int, Union[bytearray, memoryview]] = {}
+        self.__mappings: list[mmap.mmap] = []
+        self.__zero_page: memoryview = memoryview(bytes(page_size))
+        # Only pages that are not READ_WRITE
+        self.__protections: dict[int, PageProtection] = {}
+
+    def __len__(self) -> int:
+        return self.__size
+
+    @property
+    def allocated_pages(self) -> int:
+        return len(self.__pages)
+
+    @property
+    def resident_bytes(self) -> int:
+        return len(self.__pages) * self.page_size
+
+    def __check_bounds(self, address: int, length: int) -> None:
+        if address < 0 or address >= self.__size:
+            raise ValueError(f"Address {address} is out of bounds")
+        if address + length > self.__size:
+            raise ValueError(f"Data of {length} bytes at {address} is out of bounds")
+
+    def __check_access(self, address: int, length: int, access: PageProtection) -> None:
+        if not self.__protections:
+            return
+        shift: int = self.__page_shift
+        for page_number in range(address >> shift, ((address + length - 1) >> shift) + 1):
+            if not self.__protections.get(page_number, PageProtection.READ_WRITE) & access:
+                raise MemoryFault(max(address, page_number << shift), access)
+
+    def __chunks(self, address: int, length: int) -> Iterator[tuple[int, int, int, int]]:
+        # (page number, offset in the page, offset in the range, length) of each page in the range
+        position: int = 0
+        while position < length:
+            current: int = address + position
+            offset: int = current & self.__offset_mask
+            chunk: int = min(self.page_size - offset, length - position)
+            yield current >> self.__page_shift, offset, position, chunk
+            position += chunk
+
+    def __get_page(self, page_number: int) -> Union[bytearray, memoryview]:
+        # Page to write into, read-only mapped pages are copied first
+        page: Union[bytearray, memoryview, None] = self.__pages.get(page_number)
+        if page is None:
+            page = self.__pages[page_number] = bytearray(self.page_size)
+        elif isinstance(page, memoryview) and page.readonly:
+            page = self.__pages[page_number] = bytearray(page)
+        return page
+
+    def __read_range(self, address: int, length: int) -> memoryview:
+        offset: int = address & self.__offset_mask
+        if offset + length <= self.page_size:  # Within one page, no copy
+            page: Union[bytearray, memoryview, None] = self.__pages.get(address >> self.__page_shift) # fmt: skip
+            if page is None:
+                return self.__zero_page[:length]
+            return memoryview(page)[offset : offset + length]
+        data: bytearray = bytearray(length)
+        for page_number, offset, position, chunk in self.__chunks(address, length):
+            page = self.__pages.get(page_number)
+            if page is not None:
+                data[position : position + chunk] = page[offset : offset + chunk]
+        return memoryview(data)
+
+    def __write_range(self, address: int, data: Buffer) -> None:
+        view: memoryview = memoryview(data)
+        for page_number, offset, position, chunk in self.__chunks(address, len(view)):
+            part: memoryview = view[position : position + chunk]
+            if page_number not in self.__pages and part == self.__zero_page[:chunk]:
+                continue  # Zeros into an untouched page keep it unallocated
+            self.__get_page(page_number)[offset : offset + chunk] = part
+
+    # Pages
+    def protect(self, address: int, length: int, protection: PageProtection) -> None:
+        # Applies to every page the range touches
+        self.__check_bounds(address, length)
+        shift: int = self.__page_shift
+        for page_number in range(address >> shift, ((address + length - 1) >> shift) + 1):
+            if protection == PageProtection.READ_WRITE:
+                self.__protections.pop(page_number, None)
+            else:
+                self.__protections[page_number] = protection
+
+    def get_protection(self, address: int) -> PageProtection:
+        self.__check_bounds(address, 1)
+        return self.__protections.get(address >> self.__page_shift, PageProtection.READ_WRITE) # fmt: skip
+
+    def release(self, address: int, length: int) -> None:
+        # Frees the pages that lie completely in the range, they read as zeros again
+        self.__check_bounds(address, length)
+        first_page: int = -(-address // self.page_size)
+        end_page: int = (address + length) >> self.__page_shift
+        for page_number in range(first_page, end_page):
+            if self.__pages.pop(page_number, None) is not None:
+                self.invalidate(page_number << self.__page_shift, self.page_size)
+
+    def map_file(
+        self,
+        address: int,
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        read_only: bool = True,
+    ) -> int:
+        # Maps length bytes of the file from offset (default: up to its end) to the page aligned address
+        # without copying. read_only pages are protected READ (ROM), otherwise writes are copy-on-write
+        # and never reach the file. Returns the mapped length
+        if address & self.__offset_mask:
+            raise ValueError(f"Address {address} is not aligned to the page size {self.page_size}") # fmt: skip
+        with open(path, "rb") as file:
+            mapping: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ if read_only else mmap.ACCESS_COPY) # fmt: skip
+        if length is None:
+            length = len(mapping) - offset
+        if offset < 0 or length <= 0 or offset + length > len(mapping):
+            mapping.close()
+            raise ValueError(f"File range of {length} bytes at {offset} is out of bounds")
+        self.__check_bounds(address, length)
+        self.__mappings.append(mapping)
+        view: memoryview = memoryview(mapping)[offset : offset + length]
+        for page_number, page_offset, position, chunk in self.__chunks(address, length):
+            if chunk == self.page_size:
+                self.__pages[page_number] = view[position : position + chunk]
+            else:  # Last partial page
+                self.__get_page(page_number)[page_offset : page_offset + chunk] = view[position : position + chunk] # fmt: skip
+        if read_only:
+            self.protect(address, length, PageProtection.READ)
+        self.invalidate(address, length)
+        return length
+
+    # Bulk access
+    def read(self, address: int, length: int) -> memoryview:
+        # Zero-copy view within a page, only valid until the memory is written again
+        self.__check_bounds(address, length)
+        self.__check_access(address, length, PageProtection.READ)
+        return self.__read_range(address, length)
+
+    def write(self, address: int, data: Buffer) -> None:
+        length: int = len(data)
+        self.__check_bounds(address, length)
+        self.__check_access(address, length, PageProtection.WRITE)
+        self.__write_range(address, data)
+        self.invalidate(address, length)
+
+    def load_program(self, address: int, program: Buffer) -> None:
+        # Loads are done by the host, they are allowed into protected pages (e.g. read-only code)
+        # Compared page by page, unchanged and zero pages are not written (e.g. restoring a snapshot)
+        self.__check_bounds(address, len(program))
+        view: memoryview = memoryview(program)
+        changed: bool = False
+        for page_number, offset, position, chunk in self.__chunks(address, len(view)):
+            part: memoryview = view[position : position + chunk]
+            page: Union[bytearray, memoryview, None] = self.__pages.get(page_number)
+            if page is None and part == self.__zero_page[:chunk]:
+                continue
+            if page is not None and memoryview(page)[offset : offset + chunk] == part:
+                continue
+            self.__get_page(page_number)[offset : offset + chunk] = part
+            changed = True
+        if changed:
+            self.invalidate(address, len(program))
+
+    def fill(self, address: int, length: int, value: Byte = 0) -> None:
+        if length == 0:
+            return
+        self.__check_bounds(address, length)
+        self.__check_access(address, length, PageProtection.WRITE)
+        filled: bytes = bytes([value]) * min(length, self.page_size)
+        changed: bool = False
+        for page_number, offset, _, chunk in self.__chunks(address, length):
+            page: Union[bytearray, memoryview, None] = self.__pages.get(page_number)
+            if page is None and value == 0:
+                continue
+            if page is not None and page[offset : offset + chunk] == filled[:chunk]:
+                continue
+            self.__get_page(page_number)[offset : offset + chunk] = filled[:chunk]
+            changed = True
+        if changed:
+            self.invalidate(address, length)
+
+    def copy(self, destination: int, source: int, length: int) -> None:
+        # Overlapping ranges are copied like memmove, as if through a temporary buffer
+        if length == 0:
+            return
+        self.__check_bounds(source, length)
+        self.__check_bounds(destination, length)
+        self.__check_access(source, length, PageProtection.READ)
+        self.__check_access(destination, length, PageProtection.WRITE)
+        self.__write_range(destination, bytes(self.__read_range(source, length)))
+        self.invalidate(destination, length)
+
+    def compare(self, address_a: int, address_b: int, length: int) -> bool:
+        if length == 0:
+            return True
+        self.__check_bounds(address_a, length)
+        self.__check_bounds(address_b, length)
+        self.__check_access(address_a, length, PageProtection.READ)
+        self.__check_access(address_b, length, PageProtection.READ)
+        return self.__read_range(address_a, length) == self.__read_range(address_b, length)
+
+    # Typed access (little-endian)
+    def read_byte(self, address: int) -> Byte:
+        if address < 0 or address >= self.__size:
+            raise ValueError(f"Address {address} is out of bounds")
+        self.__check_access(address, 1, PageProtection.READ)
+        page: Union[bytearray, memoryview, None] = self.__pages.get(address >> self.__page_shift) # fmt: skip
+        return 0 if page is None else page[address & self.__offset_mask]
+
+    def read_uint(self, address: int, size_byte: int) -> int:
+        self.__check_bounds(address, size_byte)
+        self.__check_access(address, size_byte, PageProtection.READ)
+        return int.from_bytes(self.__read_range(address, size_byte), byteorder="little")
+
+    def write_uint(self, address: int, data: int, size_byte: Optional[int] = None) -> None:
+        # Without size the value is written with as many bytes as it needs (at least one)
+        if size_byte is None:
+            size_byte = (data.bit_length() + 7) // 8 or 1
+        self.__check_bounds(address, size_byte)
+        self.__check_access(address, size_byte, PageProtection.WRITE)
+        self.__write_range(address, data.to_bytes(size_byte, byteorder="little"))
+        self.invalidate(address, size_byte)
+
+    def get_with_address(self, address: int, register_size: int) -> int:
+        if address < 0 or address + register_size >= self.__size:
+            raise ValueError(f"Address {address} is out of bounds")
+        self.__check_access(address, register_size, PageProtection.READ)
+        return int.from_bytes(self.__read_range(address, register_size), byteorder="little")
+
+    def to_bytes(self) -> bytes:
+        # Untouched pages as zeros
+        return bytes(self.__read_range(0, self.__size)) if self.__size else b""
+
+    def close(self) -> None:
+        super().close()
+        for page in self.__pages.values():
+            if isinstance(page, memoryview):
+                page.release()
+        self.__pages.clear()
+        for mapping in self.__mappings:
+            try:
+                mapping.close()
+            except BufferError:  # Views handed out by read() are still alive, unmapped once they are freed
+                pass
+        self.__mappings.clear()
@@ -1,45 +1,128 @@
-from typing import Union
+from typing import Optional, Union
 
-from data_types import Byte
+from data_types import Buffer, Byte, WriteListener
 
 
 class Ram:
 
-    def __init__(self, memory_size_byte: int):
-        self.memory: bytearray = bytearray(memory_size_byte)
+    def __init__(self, memory_size_byte: int, buffer: Optional[memoryview] = None):
+        # buffer places the memory in an existing block (e.g. shared memory) of memory_size_byte bytes
+        self.memory: Union[bytearray, memoryview] = (
+            bytearray(memory_size_byte) if buffer is None else buffer
+        )
+        self.__view: memoryview = memoryview(self.memory)
+        self.__size: int = memory_size_byte
+        self.__write_listeners: list[WriteListener] = []
 
-    def __set(self, address: int, data: bytearray) -> None:
-        if address < 0 or address >= len(self.memory):
+    def __len__(self) -> int:
+        return self.__size
+
+    def __notify_write(self, address: int, length: int) -> None:
+        for listener in self.__write_listeners:
+            listener(address, length)
+
+    def __check_bounds(self, address: int, length: int) -> None:
+        if address < 0 or address >= self.__size:
             raise ValueError(f"Address {address} is out of bounds")
-        if address + len(data) > len(self.memory):
-            raise ValueError(f"Data {data} is out of bounds")
-        for i in range(len(data)):
-            self.memory[address + i] = data[i]
-
-    def __convert_int_to_bytearray(self, data: int) -> bytearray:
-        if data <= 0xFF:  # If the data fits in a byte, return it
-            return bytearray([data])
-        result: bytearray = bytearray()
-        while data > 0:
-            # Extract the least significant byte and add it to the result
-            byte: Byte = data & 0xFF
-            result.append(byte)
-            # Shift data right by 8 bits (1 byte)
-            data >>= 8
-        return result
+        if address + length > self.__size:
+            raise ValueError(f"Data of {length} bytes at {address} is out of bounds")
+
+    # Bulk access
+    def read(self, address: int, length: int) -> memoryview:
+        # Zero-copy view, only valid until the memory is written again
+        self.__check_bounds(address, length)
+        return self.__view[address : address + length]
+
+    def write(self, address: int, data: Buffer) -> None:
+        length: int = len(data)
+        self.__check_bounds(address, length)
+        self.__view[address : address + length] = data
+        self.__notify_write(address, length)
+
+    def load_program(self, address: int, program: Buffer) -> None:
+        # Copies the whole image with one slice assignment.
+        # Reloading an identical image is skipped so decoded and compiled code stays cached
+        self.__check_bounds(address, len(program))
+        if self.__view[address : address + len(program)] == program:
+            return
+        self.write(address, program)
+
+    def fill(self, address: int, length: int, value: Byte = 0) -> None:
+        if length == 0:
+            return
+        self.__check_bounds(address, length)
+        filled: bytes = bytes([value]) * length
+        if self.__view[address : address + length] == filled:
+            return
+        self.__view[address : address + length] = filled
+        self.__notify_write(address, length)
+
+    def copy(self, destination: int, source: int, length: int) -> None:
+        # Overlapping ranges are copied like memmove, as if through a temporary buffer
+        if length == 0:
+            return
+        self.__check_bounds(source, length)
+        self.__check_bounds(destination, length)
+        self.__view[destination : destination + length] = self.__view[source : source + length] # fmt: skip
+        self.__notify_write(destination, length)
+
+    def compare(self, address_a: int, address_b: int, length: int) -> bool:
+        if length == 0:
+            return True
+        self.__check_bounds(address_a, length)
+        self.__check_bounds(address_b, length)
+        return self.__view[address_a : address_a + length] == self.__view[address_b : address_b + length] # fmt: skip
+
+    # Typed access (little-endian)
+    def read_byte(self, address: int) -> Byte:
+        if address < 0 or address >= self.__size:
+            raise ValueError(f"Address {address} is out of bounds")
+        return self.memory[address]
+
+    def read_uint(self, address: int, size_byte: int) -> int:
+        self.__check_bounds(address, size_byte)
+        return int.from_bytes(
+            self.__view[address : address + size_byte], byteorder="little"
+        )
+
+    def write_uint(self, address: int, data: int, size_byte: Optional[int] = None) -> None:
+        # Without size the value is written with as many bytes as it needs (at least one)
+        if size_byte is None:
+            size_byte = (data.bit_length() + 7) // 8 or 1
+        self.__check_bounds(address, size_byte)
+        self.__view[address : address + size_byte] = data.to_bytes(
+            size_byte, byteorder="little"
+        )
+        self.__notify_write(address, size_byte)
 
     def get_with_address(self, address: int, register_size: int) -> int:
-        if address < 0 or address + register_size >= len(self.memory):
+        if address < 0 or address + register_size >= self.__size:
             raise ValueError(f"Address {address} is out of bounds")
-        result: int = 0
-        for i in range(register_size):
-            # Shift data left by 8 bits (1 byte) per position in register_size and add the next byte
-            result += self.memory[address + i] << (8 * i)
-        return result
+        return int.from_bytes(
+            self.__view[address : address + register_size], byteorder="little"
+        )
 
     def set_with_address(self, address: int, data: Union[int, bytearray]) -> None:
         if isinstance(data, bytearray):
-            data_array: bytearray = data
+            self.write(address, data)
         else:
-            data_array = self.__convert_int_to_bytearray(data)
-        self.__set(address, data_array)
+            self.write_uint(address, data)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.memory)
+
+    def add_write_listener(self, listener: WriteListener) -> None:
+        self.__write_listeners.append(listener)
+
+    def remove_write_listener(self, listener: WriteListener) -> None:
+        self.__write_listeners.remove(listener)
+
+    def invalidate(self, address: int, length: int) -> None:
+        # The memory was written without this Ram (e.g. by another core), listeners drop what they cached
+        self.__notify_write(address, length)
+
+    def close(self) -> None:
+        # Releases the views on the buffer, the Ram can not be used afterwards
+        self.__view.release()
+        if isinstance(self.memory, memoryview):
+            self.memory.release()
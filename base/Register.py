@@ -1,22 +1,32 @@
+from typing import Optional
+from base.RegisterFile import RegisterFile
+
+
 class Register:
-    def __init__(self, size_byte: int, name: str):
-        self.value: bytearray = bytearray(size_byte)
-        self.name: str = name
+    __slots__ = ("name", "size_byte", "mask", "register_file", "index")
 
-    def __set_byte_at_register_address(self, byte_position: int, data: int) -> None:
-        if data < 0 or data > 0xFF:
-            raise ValueError(f"Data {data} is out of bounds")
-        self.value[byte_position] = data
+    def __init__(
+        self,
+        size_byte: int,
+        name: str,
+        register_file: Optional[RegisterFile] = None,
+        index: int = 0,
+    ):
+        if register_file is None:
+            register_file = RegisterFile(1)
+        self.name: str = name
+        self.size_byte: int = size_byte
+        self.mask: int = (1 << (8 * size_byte)) - 1
+        self.register_file: RegisterFile = register_file
+        self.index: int = index
 
-    def __get_byte_from_register_address(self, byte_position: int) -> int:
-        return self.value[byte_position]
+    @property
+    def value(self) -> bytearray:
+        return bytearray(self.get().to_bytes(self.size_byte, byteorder="little"))
 
     def get(self) -> int:
-        result: int = 0
-        for i in range(len(self.value)):
-            result += self.__get_byte_from_register_address(i) << (8 * i)
-        return result
+        return self.register_file.values[self.index]
 
     def set(self, value: int) -> None:
-        for i in range(len(self.value)):
-            self.__set_byte_at_register_address(i, (value >> (8 * i)) & 0xFF)
+        # Values wrap around at the register width (two's complement for negative values)
+        self.register_file.values[self.index] = value & self.mask
@@ -0,0 +1,15 @@
+class RegisterFile:
+    # Holds the values of all registers of a CPU as masked ints in one preallocated list per bank.
+    # values is the active bank, interrupts switch the bank instead of copying every register
+    __slots__ = ("values", "banks")
+
+    def __init__(self, number_of_registers: int, number_of_banks: int = 1):
+        if number_of_banks < 1:
+            raise ValueError("Register file needs at least one bank")
+        self.banks: list[list[int]] = [
+            [0] * number_of_registers for _ in range(number_of_banks)
+        ]
+        self.values: list[int] = self.banks[0]
+
+    def select_bank(self, bank: int) -> None:
+        self.values = self.banks[bank]
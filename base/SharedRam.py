@@ -0,0 +1,24 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+from base.Ram import Ram
+
+
+class SharedRam(Ram):
+    # Ram in a shared memory block, other processes attach to it by name
+    def __init__(self, memory_size_byte: int, name: Optional[str] = None):
+        self.__shared_memory: SharedMemory = SharedMemory(
+            name=name, create=name is None, size=memory_size_byte
+        )
+        # Only the creating process removes the block
+        self.__is_owner: bool = name is None
+        super().__init__(memory_size_byte, self.__shared_memory.buf[:memory_size_byte])
+
+    @property
+    def name(self) -> str:
+        return self.__shared_memory.name
+
+    def close(self) -> None:
+        super().close()
+        self.__shared_memory.close()
+        if self.__is_owner:
+            self.__shared_memory.unlink()
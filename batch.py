@@ -0,0 +1,40 @@
+import argparse
+import json
+import os
+import sys
+from typing import TextIO
+from batch_runner.BatchRunner import BatchRunner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run many programs/inputs on a pool of CPUs and print the results as JSON lines"
+    )
+    parser.add_argument("manifest", help="JSON lines file with one job per line ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Jobs sent to a worker at once")
+    parser.add_argument("--output", default="-", help="Result file ('-' for stdout)")
+    parser.add_argument("--interpreter", action="store_true", help="Disable the block compiler")
+    parser.add_argument("--lockstep", type=int, default=None, metavar="LANES", help="Run up to LANES jobs of the same program at once on the NumPy lockstep engine") # fmt: skip
+    args = parser.parse_args()
+
+    if args.manifest == "-":
+        manifest: TextIO = sys.stdin
+        base_directory: str = "."
+    else:
+        manifest = open(args.manifest, "r", encoding="utf-8")
+        base_directory = os.path.dirname(os.path.abspath(args.manifest))
+    output: TextIO = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8") # fmt: skip
+    runner: BatchRunner = BatchRunner(
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        cpu_options={"use_block_compiler": not args.interpreter},
+        lockstep_lanes=args.lockstep,
+    )
+    with manifest, output:
+        for result in runner.run(BatchRunner.read_manifest(manifest, base_directory)):
+            output.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
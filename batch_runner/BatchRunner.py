@@ -0,0 +1,201 @@
+import json
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional, TextIO
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import BatchJob, RunResult
+from IO_controller.OutputDevice import FileOutput
+from loader.ProgramImage import ProgramImage
+from loader.ProgramLoader import ProgramLoader
+
+if TYPE_CHECKING:
+    from lockstep.LockstepEngine import LockstepEngine
+
+# State of a worker process, reused for all jobs the process runs
+_worker_cpu: Optional[CentralProcessingUnit] = None
+_worker_programs: dict[tuple[str, Optional[int]], ProgramImage] = {}
+
+
+def _init_worker(cpu_options: dict[str, Any]) -> None:
+    global _worker_cpu
+    _worker_cpu = CentralProcessingUnit(**cpu_options)
+    _worker_programs.clear()
+
+
+def _error_result(job_id: str, error: str) -> dict[str, Any]:
+    # A job that could not be loaded or run, the other jobs of the batch go on
+    return {"id": job_id, "status": "error", "error": error}
+
+
+def _run_job(job: BatchJob) -> RunResult:
+    if _worker_cpu is None:
+        raise RuntimeError("Worker process is not initialized")
+    program_key: tuple[str, Optional[int]] = (job.program, job.entry)
+    if program_key not in _worker_programs:
+        _worker_programs[program_key] = ProgramLoader.load_file(job.program, job.entry) # fmt: skip
+    output: Optional[FileOutput] = None if job.output is None else FileOutput(job.output) # fmt: skip
+    try:
+        return _worker_cpu.run(
+            _worker_programs[program_key],
+            max_cycles=job.max_cycles,
+            stdin=job.input,
+            timeout=job.timeout,
+            reset_memory=True,
+            output=output,
+        )
+    finally:
+        if output is not None:
+            output.close()
+
+
+def _run_jobs(jobs: list[BatchJob]) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    for job in jobs:
+        if job.error is not None:
+            results.append(_error_result(job.id, job.error))
+            continue
+        try:
+            result: RunResult = _run_job(job)
+        except Exception as e:
+            results.append(_error_result(job.id, f"{type(e).__name__}: {e}"))
+            continue
+        results.append({"id": job.id, **asdict(result)})
+    return results
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = 64,
+        cpu_options: Optional[dict[str, Any]] = None,
+        lockstep_lanes: Optional[int] = None,
+    ):
+        # With lockstep_lanes jobs run in this process on the NumPy lockstep engine, up to
+        # lockstep_lanes jobs with the same program, entry and budget at once
+        self.__workers: int = workers or os.cpu_count() or 1
+        self.__chunk_size: int = chunk_size
+        self.__cpu_options: dict[str, Any] = cpu_options or {}
+        self.__lockstep_lanes: Optional[int] = lockstep_lanes
+
+    @staticmethod
+    def read_manifest(manifest: TextIO, base_directory: str = ".") -> Iterator[BatchJob]:
+        # One JSON object per line: {"id", "program", "entry", "input", "max_cycles", "timeout", "output"}
+        # Paths are relative to base_directory, entry is only needed for hex text programs.
+        # A line that is no valid job is yielded as job with error, it is answered with an error result
+        for line_number, line in enumerate(manifest, start=1):
+            if not line.strip():
+                continue
+            job_id: str = str(line_number)
+            try:
+                fields: Any = json.loads(line)
+                if not isinstance(fields, dict):
+                    raise ValueError("Job is no JSON object")
+                job_id = str(fields.get("id", line_number))
+                if "program" not in fields:
+                    raise ValueError("Job has no program")
+                job_input: Any = fields.get("input", [])
+                if isinstance(job_input, str):
+                    job_input = job_input.splitlines()
+                yield BatchJob(
+                    id=job_id,
+                    program=os.path.join(base_directory, fields["program"]),
+                    entry=int(str(fields["entry"]), 0) if "entry" in fields else None,
+                    input=[str(line) for line in job_input],
+                    max_cycles=fields.get("max_cycles"),
+                    timeout=fields.get("timeout"),
+                    output=os.path.join(base_directory, fields["output"]) if "output" in fields else None, # fmt: skip
+                )
+            except (ValueError, TypeError) as e:
+                yield BatchJob(id=job_id, program="", entry=None, input=[], error=f"Line {line_number}: {e}") # fmt: skip
+
+    def __chunks(self, jobs: Iterable[BatchJob]) -> Iterator[list[BatchJob]]:
+        chunk: list[BatchJob] = []
+        for job in jobs:
+            chunk.append(job)
+            if len(chunk) == self.__chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, jobs: Iterable[BatchJob]) -> Iterator[dict[str, Any]]:
+        # Yields results as soon as their chunk is done (not in job order).
+        # Only a few chunks per worker are in flight, so the manifest is read lazily.
+        if self.__lockstep_lanes is not None:
+            yield from self.__run_lockstep(jobs, self.__lockstep_lanes)
+            return
+        max_pending: int = self.__workers * 4
+        with ProcessPoolExecutor(
+            max_workers=self.__workers,
+            initializer=_init_worker,
+            initargs=(self.__cpu_options,),
+        ) as executor:
+            pending: set[Future[list[dict[str, Any]]]] = set()
+            for chunk in self.__chunks(jobs):
+                pending.add(executor.submit(_run_jobs, chunk))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            for future in as_completed(pending):
+                yield from future.result()
+
+    def __run_lockstep(self, jobs: Iterable[BatchJob], lanes: int) -> Iterator[dict[str, Any]]:
+        # Jobs are grouped until a group has lanes jobs, the rest runs at the end of the manifest
+        from lockstep.LockstepEngine import LockstepEngine  # NumPy is only needed here
+
+        engine: LockstepEngine = LockstepEngine(**self.__cpu_options)
+        programs: dict[tuple[str, Optional[int]], ProgramImage] = {}
+        groups: dict[tuple[str, Optional[int], Optional[int], Optional[float]], list[BatchJob]] = {} # fmt: skip
+        for job in jobs:
+            if job.error is not None:
+                yield _error_result(job.id, job.error)
+                continue
+            group_key = (job.program, job.entry, job.max_cycles, job.timeout)
+            group: list[BatchJob] = groups.setdefault(group_key, [])
+            group.append(job)
+            if len(group) == lanes:
+                yield from self.__run_group(engine, programs, groups.pop(group_key))
+        for group in groups.values():
+            yield from self.__run_group(engine, programs, group)
+
+    @staticmethod
+    def __run_group(
+        engine: "LockstepEngine",
+        programs: dict[tuple[str, Optional[int]], ProgramImage],
+        group: list[BatchJob],
+    ) -> Iterator[dict[str, Any]]:
+        first: BatchJob = group[0]
+        program_key: tuple[str, Optional[int]] = (first.program, first.entry)
+        try:
+            if program_key not in programs:
+                programs[program_key] = ProgramLoader.load_file(first.program, first.entry) # fmt: skip
+            results: list[RunResult] = engine.run(
+                programs[program_key],
+                [job.input for job in group],
+                max_cycles=first.max_cycles,
+                timeout=first.timeout,
+            )
+        except Exception as e:
+            for job in group:
+                yield _error_result(job.id, f"{type(e).__name__}: {e}")
+            return
+        for job, result in zip(group, results):
+            if job.output is not None:
+                try:
+                    output: FileOutput = FileOutput(job.output)
+                    output.write(result.output)
+                    output.close()
+                except OSError as e:
+                    yield _error_result(job.id, f"{type(e).__name__}: {e}")
+                    continue
+                result.output = ""
+            yield {"id": job.id, **asdict(result)}
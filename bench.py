@@ -0,0 +1,45 @@
+import argparse
+import json
+import sys
+from typing import Any
+from benchmark.BenchmarkSuite import BenchmarkSuite
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the emulator on the example programs and synthetic kernels"
+    )
+    parser.add_argument("benchmarks", nargs="*", help="Benchmarks to run (default: all)")
+    parser.add_argument("--output", default="-", help="Result file ('-' for stdout), can be used as baseline") # fmt: skip
+    parser.add_argument("--baseline", help="Result file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown against the baseline (0.1 = 10%%)") # fmt: skip
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds every measurement runs at least") # fmt: skip
+    parser.add_argument("--rounds", type=int, default=3, help="Measurements per benchmark, the best one counts") # fmt: skip
+    parser.add_argument("--interrupts", type=int, default=2000, help="Interrupts sent by the interrupt benchmark") # fmt: skip
+    args = parser.parse_args()
+
+    suite: BenchmarkSuite = BenchmarkSuite(args.min_time, args.rounds, args.interrupts)
+    results: dict[str, Any] = suite.run(args.benchmarks or None)
+    if args.output == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline: dict[str, Any] = json.load(file)
+        regressions: list[dict[str, Any]] = BenchmarkSuite.compare(results, baseline, args.threshold) # fmt: skip
+        for regression in regressions:
+            print(
+                f"Regression in {regression['benchmark']} {regression['metric']}: "
+                f"{regression['baseline']:.6g} -> {regression['current']:.6g} ({regression['change']:+.1%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import contextlib
+import io
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from typing import Any, Optional
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import BenchmarkCase, Interrupt, InterruptStatus, RunResult
+from loader.ProgramLoader import ProgramLoader
+from machine_host.MachineHost import MachineHost
+from profiler.Profiler import Profiler
+
+EXAMPLES_DIRECTORY: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples") # fmt: skip
+
+# Synthetic kernels, every one runs a loop of 10000 iterations and halts
+ALU_KERNEL: str = """
+    MOV R0, 0
+    MOV R1, 0
+loop:
+    ADD R1, R1, 3
+    MUL R2, R1, 5
+    XOR R2, R2, R1
+    LSL R2, R2, 1
+    AND R2, R2, 0xFF
+    SUB R2, R2, R1
+    ADD R0, R0, 1
+    CMP R0, 10000
+    BNE loop
+    HLT
+"""
+BRANCH_KERNEL: str = """
+    MOV R0, 0
+loop:
+    AND R1, R0, 1
+    CMP R1, 0
+    BEQ even
+    BL odd
+    B next
+even:
+    ADD R2, R2, 1
+next:
+    ADD R0, R0, 1
+    CMP R0, 10000
+    BNE loop
+    HLT
+odd:
+    SUB R2, R2, 1
+    BX
+"""
+MEMORY_KERNEL: str = """
+    MOV R0, 0
+loop:
+    STR R0, [0x300]
+    LDR R1, [0x300]
+    ADD R1, R1, 1
+    STR R1, [0x302]
+    LDR R2, [0x302]
+    ADD R0, R0, 1
+    CMP R0, 10000
+    BNE loop
+    HLT
+"""
+INTERRUPT_HANDLER: str = """
+    MOV R0, 1
+    ADD R0, R0, 1
+    IRET
+"""
+
+
+class BenchmarkSuite:
+    # 1 if a higher value is better, -1 if a lower value is better
+    METRICS: dict[str, int] = {
+        "instructions_per_second": 1,
+        "ns_per_instruction": -1,
+        "ns_per_clock": -1,
+        "decode_ns_per_instruction": -1,
+        "execute_ns_per_instruction": -1,
+        "interrupts_per_second": 1,
+        "latency_mean_ns": -1,
+        "latency_p50_ns": -1,
+        "latency_p99_ns": -1,
+        "peak_memory_byte": -1,
+        "memory_per_machine_byte": -1,
+    }
+    INTERRUPT_BENCHMARK: str = "interrupt"
+    HOST_BENCHMARK: str = "host"
+    HOST_MACHINES: int = 100
+
+    def __init__(
+        self,
+        min_time: float = 0.2,
+        rounds: int = 3,
+        interrupts: int = 2000,
+        cases: Optional[list[BenchmarkCase]] = None,
+    ):
+        # Every measurement repeats the run until min_time seconds are reached, the best of rounds counts
+        if rounds < 1 or interrupts < 1:
+            raise ValueError("Benchmark needs at least one round and one interrupt")
+        self.min_time: float = min_time
+        self.rounds: int = rounds
+        self.interrupts: int = interrupts
+        self.cases: list[BenchmarkCase] = self.get_default_cases() if cases is None else cases # fmt: skip
+
+    @staticmethod
+    def get_default_cases() -> list[BenchmarkCase]:
+        def example(name: str) -> bytes:
+            return bytes(ProgramLoader.read_file(os.path.join(EXAMPLES_DIRECTORY, name)))
+
+        assembler: Assembler = Assembler()
+
+        def kernel(name: str, source: str) -> BenchmarkCase:
+            code: bytes = assembler.assemble(source).code
+            return BenchmarkCase(name, [(0x0A, code)], 0x0A, [])
+
+        return [
+            BenchmarkCase("fibonacci", [(0xA1, example("fibonacci.mem"))], 0xA1, ["30000"]), # fmt: skip
+            BenchmarkCase("add_two_numbers", [(0x0A, example("add_two_numbers.mem"))], 0x0A, []), # fmt: skip
+            BenchmarkCase("hello_world", [(0x0A, example("hello_world.mem"))], 0x0A, []),
+            # Both programs jump to each other forever, b is expected 0x96 after a
+            BenchmarkCase(
+                "cooperative_multitasking",
+                [
+                    (0x0A, example("cooperative_multitasking_a.mem")),
+                    (0xA0, example("cooperative_multitasking_b.mem")),
+                ],
+                0x0A,
+                [],
+                max_cycles=20000,
+            ),
+            kernel("alu", ALU_KERNEL),
+            kernel("branch", BRANCH_KERNEL),
+            kernel("memory", MEMORY_KERNEL),
+        ]
+
+    @staticmethod
+    def __create_cpu(case: BenchmarkCase, **cpu_options: Any) -> CentralProcessingUnit:
+        cpu: CentralProcessingUnit = CentralProcessingUnit(**cpu_options)
+        for address, code in case.programs:
+            cpu.load_program(address, bytearray(code))
+        return cpu
+
+    @staticmethod
+    def __run_case(cpu: CentralProcessingUnit, case: BenchmarkCase) -> RunResult:
+        result: RunResult = cpu.run(None, case.entry, max_cycles=case.max_cycles, stdin=case.input) # fmt: skip
+        if result.status == "error":
+            raise RuntimeError(f"Benchmark {case.name} failed: {result.error}")
+        return result
+
+    def __measure(self, cpu: CentralProcessingUnit, case: BenchmarkCase) -> float:
+        # Best seconds per instruction over all rounds
+        best: float = float("inf")
+        for _ in range(self.rounds):
+            cycles: int = 0
+            start: float = time.perf_counter()
+            elapsed: float = 0.0
+            while elapsed < self.min_time or cycles == 0:
+                cycles += self.__run_case(cpu, case).cycles
+                elapsed = time.perf_counter() - start
+            best = min(best, elapsed / cycles)
+        return best
+
+    def __benchmark_case(self, case: BenchmarkCase) -> dict[str, Any]:
+        # Cold run on a new CPU: peak memory includes decoding and compiling the program
+        cpu: CentralProcessingUnit = self.__create_cpu(case)
+        tracemalloc.start()
+        try:
+            instructions: int = self.__run_case(cpu, case).cycles
+            peak_memory_byte: int = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        seconds_per_instruction: float = self.__measure(cpu, case)
+        # Without block compiler every clock executes one instruction
+        seconds_per_clock: float = self.__measure(self.__create_cpu(case, use_block_compiler=False), case) # fmt: skip
+        # Profiled on the warm CPU, so compiling the blocks does not count as decode time
+        profiler: Profiler = Profiler()
+        cpu.set_profiler(profiler)
+        self.__run_case(cpu, case)
+        return {
+            "instructions": instructions,
+            "instructions_per_second": 1 / seconds_per_instruction,
+            "ns_per_instruction": seconds_per_instruction * 1e9,
+            "ns_per_clock": seconds_per_clock * 1e9,
+            "decode_ns_per_instruction": profiler.decode_time_ns / profiler.instructions,
+            "execute_ns_per_instruction": profiler.execute_time_ns / profiler.instructions,
+            "peak_memory_byte": peak_memory_byte,
+        }
+
+    def __benchmark_interrupts(self) -> dict[str, Any]:
+        # Run interrupts are sent one at a time to a CPU idling in WFI, the latency lasts
+        # from queueing the interrupt until its handler returned with IRET
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        handler: bytes = Assembler().assemble(INTERRUPT_HANDLER).code
+        # HLT of the program at 0x02 jumps to 0x00, IRET there ends the CPU loop
+        cpu.load_program(0x00, bytearray([0xFF, 0x19, 0x01]))
+        cpu.load_program(0x0A, bytearray(handler))
+        completed: threading.Event = threading.Event()
+
+        def on_complete(status: InterruptStatus, payload: bytes) -> None:
+            completed.set()
+
+        def interrupt(address: int) -> int:
+            completed.clear()
+            start: int = time.perf_counter_ns()
+            cpu.queue_interrupt(Interrupt(0x01, address, bytearray(), on_complete))
+            completed.wait()
+            return time.perf_counter_ns() - start
+
+        latencies: list[int] = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            thread: threading.Thread = threading.Thread(target=cpu.start, args=(0x01, "localhost", None), daemon=True) # fmt: skip
+            thread.start()
+            interrupt(0x0A)  # Warm up the decode cache
+            tracemalloc.start()
+            try:
+                start: float = time.perf_counter()
+                for _ in range(self.interrupts):
+                    latencies.append(interrupt(0x0A))
+                elapsed: float = time.perf_counter() - start
+                peak_memory_byte: int = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            interrupt(0x02)
+            thread.join()
+        latencies.sort()
+        instructions: int = self.interrupts * 3  # MOV, ADD and IRET of the handler
+        return {
+            "instructions": instructions,
+            "interrupts": self.interrupts,
+            "interrupts_per_second": self.interrupts / elapsed,
+            "instructions_per_second": instructions / elapsed,
+            "latency_mean_ns": sum(latencies) / len(latencies),
+            "latency_p50_ns": latencies[len(latencies) // 2],
+            "latency_p99_ns": latencies[int(0.99 * (len(latencies) - 1))],
+            "latency_max_ns": latencies[-1],
+            "peak_memory_byte": peak_memory_byte,
+        }
+
+    def __benchmark_host(self) -> dict[str, Any]:
+        # Memory of idle machines of a host (default options), without the host's shared objects
+        MachineHost(1)
+        tracemalloc.start()
+        try:
+            before: int = tracemalloc.get_traced_memory()[0]
+            start: float = time.perf_counter()
+            host: MachineHost = MachineHost(self.HOST_MACHINES)
+            elapsed: float = time.perf_counter() - start
+            memory_byte: int = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        return {
+            "machines": len(host.machines),
+            "memory_per_machine_byte": memory_byte / self.HOST_MACHINES,
+            "ms_per_machine": elapsed * 1e3 / self.HOST_MACHINES,
+        }
+
+    def run(self, names: Optional[list[str]] = None) -> dict[str, Any]:
+        # names selects benchmarks by name, the interrupt benchmark is called "interrupt",
+        # the one of the idle machines of a host "host"
+        benchmarks: dict[str, dict[str, Any]] = {}
+        for case in self.cases:
+            if names is None or case.name in names:
+                benchmarks[case.name] = self.__benchmark_case(case)
+        if names is None or self.INTERRUPT_BENCHMARK in names:
+            benchmarks[self.INTERRUPT_BENCHMARK] = self.__benchmark_interrupts()
+        if names is None or self.HOST_BENCHMARK in names:
+            benchmarks[self.HOST_BENCHMARK] = self.__benchmark_host()
+        return {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "min_time": self.min_time,
+            "rounds": self.rounds,
+            "benchmarks": benchmarks,
+        }
+
+    @classmethod
+    def compare(
+        cls, results: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.1
+    ) -> list[dict[str, Any]]:
+        # Metrics that got worse by more than threshold (0.1 = 10 %) compared to the baseline
+        regressions: list[dict[str, Any]] = []
+        for name, metrics in results["benchmarks"].items():
+            baseline_metrics: dict[str, Any] = baseline["benchmarks"].get(name, {})
+            for metric, direction in cls.METRICS.items():
+                if metric not in metrics or not baseline_metrics.get(metric):
+                    continue
+                change: float = (metrics[metric] - baseline_metrics[metric]) / baseline_metrics[metric] # fmt: skip
+                if change * direction < -threshold:
+                    regressions.append(
+                        {
+                            "benchmark": name,
+                            "metric": metric,
+                            "baseline": baseline_metrics[metric],
+                            "current": metrics[metric],
+                            "change": change,
+                        }
+                    )
+        return regressions
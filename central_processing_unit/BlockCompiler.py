@@ -0,0 +1,313 @@
+from typing import Callable, Optional, Union
+from base.Flag import Flag
+from base.Ram import Ram
+from base.Register import Register
+from base.RegisterFile import RegisterFile
+from memory_controller.MemoryManagementUnit import MemoryManagementUnit
+from tracer.Tracer import Tracer
+from data_types import (
+    CompiledBlock,
+    DecodedInstruction,
+    InstructionSet,
+    Operand,
+    RegisterCode,
+    RegisterSet,
+)
+
+
+class BlockCompiler:
+    # Instructions that end a basic block
+    __BRANCH_MNEMONICS: set[str] = {"B", "BEQ", "BNE", "BL", "BX"}
+    __ALU_EXPRESSIONS: dict[str, str] = {
+        "ADD": "{0} + {1}",
+        "SUB": "{0} - {1}",
+        "MUL": "{0} * {1}",
+        "DIV": "{0} // {1}",
+        "MOD": "{0} % {1}",
+        "AND": "{0} & {1}",
+        "ORR": "{0} | {1}",
+        "XOR": "{0} ^ {1}",
+        "LSL": "{0} << {1}",
+        "LSR": "{0} >> {1}",
+    }
+    __MAX_BLOCK_INSTRUCTIONS: int = 64
+
+    def __init__(
+        self,
+        memory: Ram,
+        instruction_set: InstructionSet,
+        register_set: RegisterSet,
+        zero_flag: Flag,
+        decode: Callable[[int], DecodedInstruction],
+        data_memory: Optional[Union[Ram, MemoryManagementUnit]] = None,
+    ):
+        # LDR and STR go through data_memory if given (e.g. an MMU), code is always read from memory
+        self.__memory: Ram = memory
+        self.__data_memory: Union[Ram, MemoryManagementUnit] = memory if data_memory is None else data_memory # fmt: skip
+        self.__instruction_set: InstructionSet = instruction_set
+        self.__register_set: RegisterSet = register_set
+        self.__register_codes: dict[Register, RegisterCode] = {
+            register: code for code, register in register_set.items()
+        }
+        self.__register_file: RegisterFile = register_set[0x00].register_file
+        self.__Z: Flag = zero_flag
+        self.__decode: Callable[[int], DecodedInstruction] = decode
+        self.__blocks: dict[int, CompiledBlock] = {}
+        # With tracer every compiled instruction records itself into the tracer's ring buffer
+        self.__tracer: Optional[Tracer] = None
+        # Start addresses of the blocks that contain a given memory address
+        self.__block_starts_by_address: dict[int, set[int]] = {}
+        self.__memory.add_write_listener(self.invalidate)
+
+    def set_tracer(self, tracer: Optional[Tracer]) -> None:
+        # Blocks are compiled again with or without records
+        self.__tracer = tracer
+        self.invalidate_all()
+
+    def __get_mask(self, register_code: RegisterCode) -> int:
+        return self.__register_set[register_code].mask
+
+    def __is_compilable(self, instruction: DecodedInstruction) -> bool:
+        mnemonic: str = self.__instruction_set[instruction.opcode].mnemonic
+        if mnemonic in self.__BRANCH_MNEMONICS:
+            return True
+        if mnemonic not in self.__ALU_EXPRESSIONS and mnemonic not in (
+            "NOT",
+            "CMP",
+            "MOV",
+            "LDR",
+            "STR",
+        ):
+            # NOP, HLT, I/O and interrupt instructions stay in the interpreter
+            return False
+        if mnemonic in ("CMP", "STR"):
+            return True
+        # R4 and R5 are owned by the fetch-decode cycle
+        destination_code: RegisterCode = self.__register_codes[instruction.operands[0]]
+        return destination_code not in (0x04, 0x05)
+
+    def __scan_block(self, address: int) -> list[DecodedInstruction]:
+        instructions: list[DecodedInstruction] = []
+        while len(instructions) < self.__MAX_BLOCK_INSTRUCTIONS:
+            try:
+                instruction: DecodedInstruction = self.__decode(address)
+            except ValueError:
+                break  # Let the interpreter report the error when it gets there
+            if not self.__is_compilable(instruction):
+                break
+            instructions.append(instruction)
+            if self.__instruction_set[instruction.opcode].mnemonic in self.__BRANCH_MNEMONICS: # fmt: skip
+                break
+            address = instruction.next_address
+        return instructions
+
+    def __generate_source(self, instructions: list[DecodedInstruction]) -> str:
+        read_registers: set[RegisterCode] = set()
+        written_registers: set[RegisterCode] = set()
+        # Traced blocks record the Z flag after every instruction, so z is always read
+        is_traced: bool = self.__tracer is not None
+        reads_zero_flag: bool = is_traced
+        writes_zero_flag: bool = False
+        body: list[str] = []
+        pc_mask: int = self.__get_mask(0x05)
+
+        def operand(instruction: DecodedInstruction, value: Operand) -> str:
+            if not isinstance(value, Register):
+                return str(value)
+            code: RegisterCode = self.__register_codes[value]
+            if code == 0x04:
+                return str(instruction.memory_byte)
+            if code == 0x05:
+                return str(instruction.next_address)
+            read_registers.add(code)
+            return f"r{code}"
+
+        def destination(value: Operand) -> tuple[str, int]:
+            code: RegisterCode = self.__register_codes[value]
+            written_registers.add(code)
+            return f"r{code}", self.__get_mask(code)
+
+        def spill(instruction: DecodedInstruction) -> list[str]:
+            lines: list[str] = [
+                f"values[{code}] = r{code}" for code in sorted(written_registers)
+            ]
+            if writes_zero_flag:
+                lines.append("Z.isFlagSet = z")
+            lines.append(f"values[4] = {instruction.memory_byte}")
+            return lines
+
+        def exit_to(instruction: DecodedInstruction, next_address: str) -> list[str]:
+            return spill(instruction) + [f"return {next_address}"]
+
+        def trace(instruction: DecodedInstruction, error: bool = False) -> list[str]:
+            # Same record as the interpreter's, with the written register's value
+            if not is_traced:
+                return []
+            arguments: str = f"{instruction.address}, {instruction.code!r}, z"
+            mnemonic: str = self.__instruction_set[instruction.opcode].mnemonic
+            if error:
+                arguments += f", {Tracer.NO_REGISTER}, 0, True"
+            elif mnemonic in Tracer.REGISTER_WRITING_MNEMONICS:
+                code: RegisterCode = self.__register_codes[instruction.operands[0]]
+                arguments += f", {code}, r{code}"
+            return [f"record({arguments})"]
+
+        def guarded(instruction: DecodedInstruction, lines: list[str]) -> list[str]:
+            # On an error, leave registers as the interpreter would have left them and
+            # record the instructions before the failing one as executed
+            return (
+                ["try:"]
+                + ["    " + line for line in lines]
+                + ["except Exception:"]
+                + ["    " + line for line in spill(instruction) + trace(instruction, True)]
+                + [
+                    f"    values[5] = {instruction.next_address}",
+                    f"    block.retired_instructions = {index}",
+                    "    raise",
+                ]
+            )
+
+        for index, instruction in enumerate(instructions):
+            mnemonic: str = self.__instruction_set[instruction.opcode].mnemonic
+            operands = instruction.operands
+            body.append(f"# 0x{instruction.address:04x}: {mnemonic}")
+            if mnemonic in self.__ALU_EXPRESSIONS:
+                expression: str = self.__ALU_EXPRESSIONS[mnemonic].format(
+                    operand(instruction, operands[1]), operand(instruction, operands[2])
+                )
+                if mnemonic in ("DIV", "MOD"):
+                    body += guarded(instruction, [f"t = {expression}"])
+                else:
+                    body.append(f"t = {expression}")
+                target, mask = destination(operands[0])
+                body += ["z = t == 0", f"{target} = t & {mask}"] + trace(instruction)
+                writes_zero_flag = True
+            elif mnemonic == "NOT":
+                source: str = operand(instruction, operands[1])
+                target, mask = destination(operands[0])
+                body += [f"t = ~{source}", "z = t == 0", f"{target} = t & {mask}"]
+                body += trace(instruction)
+                writes_zero_flag = True
+            elif mnemonic == "CMP":
+                first: str = operand(instruction, operands[0])
+                body.append(f"z = {first} - {operand(instruction, operands[1])} == 0")
+                body += trace(instruction)
+                writes_zero_flag = True
+            elif mnemonic == "MOV":
+                source = operand(instruction, operands[1])
+                target, mask = destination(operands[0])
+                body += [f"{target} = {source} & {mask}"] + trace(instruction)
+            elif mnemonic == "LDR":
+                address: str = operand(instruction, operands[1])
+                size: int = operands[0].size_byte
+                body += guarded(instruction, [f"t = ram_get({address}, {size})"])
+                target, mask = destination(operands[0])
+                body += [f"{target} = t & {mask}"] + trace(instruction)
+            elif mnemonic == "STR":
+                source = operand(instruction, operands[0])
+                address = operand(instruction, operands[1])
+                body += guarded(instruction, [f"ram_set({address}, {source})"])
+                body += trace(instruction)
+                # The store may have overwritten this block (self-modifying code)
+                body.append("if not block.is_valid:")
+                body.append(f"    block.retired_instructions = {index + 1}")
+                body += [
+                    "    " + line
+                    for line in exit_to(instruction, str(instruction.next_address))
+                ]
+            elif mnemonic in ("B", "BL", "BEQ", "BNE"):
+                target_address: str = (
+                    f"({operand(instruction, operands[0])} + r6) & {pc_mask}"
+                )
+                read_registers.add(0x06)
+                body += trace(instruction)
+                if mnemonic == "BL":
+                    target, mask = destination(self.__register_set[0x03])
+                    body.append(f"{target} = {instruction.next_address} & {mask}")
+                if mnemonic in ("BEQ", "BNE"):
+                    reads_zero_flag = True
+                    body.append("if z:" if mnemonic == "BEQ" else "if not z:")
+                    body += [
+                        "    " + line for line in exit_to(instruction, target_address)
+                    ]
+                    body += exit_to(instruction, str(instruction.next_address))
+                else:
+                    body += exit_to(instruction, target_address)
+            elif mnemonic == "BX":
+                read_registers.add(0x03)
+                body += trace(instruction)
+                body += exit_to(instruction, f"r3 & {pc_mask}")
+
+        if self.__instruction_set[instructions[-1].opcode].mnemonic not in self.__BRANCH_MNEMONICS: # fmt: skip
+            body += exit_to(instructions[-1], str(instructions[-1].next_address))
+
+        prologue: list[str] = ["values = register_file.values"] + [
+            f"r{code} = values[{code}]"
+            for code in sorted(read_registers | written_registers)
+        ]
+        if reads_zero_flag:
+            prologue.append("z = Z.isFlagSet")
+        return "def compiled_block():\n" + "".join(
+            f"    {line}\n" for line in prologue + body
+        )
+
+    def __compile(self, address: int) -> CompiledBlock:
+        instructions: list[DecodedInstruction] = self.__scan_block(address)
+        block: CompiledBlock = CompiledBlock(
+            start=address,
+            end=address + 1,
+            instruction_count=len(instructions),
+            function=None,
+            instructions=instructions,
+        )
+        if instructions:
+            block.end = max(
+                instruction.address + instruction.length for instruction in instructions
+            )
+            namespace: dict[str, object] = dict(
+                register_file=self.__register_file,
+                Z=self.__Z,
+                ram_get=self.__data_memory.read_uint,
+                ram_set=self.__data_memory.write_uint,
+                block=block,
+                record=None if self.__tracer is None else self.__tracer.record,
+            )
+            exec(self.__generate_source(instructions), namespace)
+            block.function = namespace["compiled_block"]
+        self.__blocks[address] = block
+        for block_address in range(block.start, block.end):
+            self.__block_starts_by_address.setdefault(block_address, set()).add(address)
+        return block
+
+    def get_block(self, address: int) -> CompiledBlock:
+        # A block without function starts with an instruction the interpreter has to execute
+        block: Optional[CompiledBlock] = self.__blocks.get(address)
+        if block is None:
+            block = self.__compile(address)
+        return block
+
+    def invalidate_all(self) -> None:
+        for block in self.__blocks.values():
+            block.is_valid = False
+        self.__blocks.clear()
+        self.__block_starts_by_address.clear()
+
+    def invalidate(self, address: int, length: int) -> None:
+        if not self.__blocks:
+            return
+        block_starts: set[int] = set()
+        if length > len(self.__block_starts_by_address):
+            for block_address, starts in self.__block_starts_by_address.items():
+                if address <= block_address < address + length:
+                    block_starts |= starts
+        else:
+            for block_address in range(address, address + length):
+                block_starts |= self.__block_starts_by_address.get(block_address, set())
+        for block_start in block_starts:
+            block: CompiledBlock = self.__blocks.pop(block_start)
+            block.is_valid = False
+            for block_address in range(block.start, block.end):
+                starts: set[int] = self.__block_starts_by_address[block_address]
+                starts.discard(block_start)
+                if not starts:
+                    del self.__block_starts_by_address[block_address]
@@ -1,8 +1,17 @@
+import time
+from typing import Optional, Union, cast
+from base.Flag import Flag
 from base.Register import Register
 from base.Ram import Ram
+from central_processing_unit.BlockCompiler import BlockCompiler
+from memory_controller.MemoryManagementUnit import MemoryManagementUnit
+from profiler.Profiler import Profiler
+from tracer.Tracer import Tracer
 from data_types import (
     Byte,
-    Instruction,
+    CompiledBlock,
+    DecodedInstruction,
+    ExecutionStatus,
     InstructionSet,
     OperandTypeSet,
     Operands,
@@ -18,95 +27,320 @@ class ControlUnit:
         instruction_set: InstructionSet,
         register_set: RegisterSet,
         operand_type_set: OperandTypeSet,
+        zero_flag: Flag,
+        use_block_compiler: bool = True,
+        data_memory: Optional[Union[Ram, MemoryManagementUnit]] = None,
     ):
         self.__memory: Ram = memory
+        self.__Z: Flag = zero_flag
         self.__register_set: RegisterSet = register_set
         self.__R4: Register = self.__register_set[0x04]
         self.__R5: Register = self.__register_set[0x05]
+        self.__R6: Register = self.__register_set[0x06]
         self.__instruction_set: InstructionSet = instruction_set
+        # Set by HLT, IRET and WFI, whoever drives the clock resets it to RUNNING
+        self.status: ExecutionStatus = ExecutionStatus.RUNNING
         self.__operand_type_set: OperandTypeSet = operand_type_set
+        # Decoded instructions keyed by their address (PC)
+        self.__decode_cache: dict[int, DecodedInstruction] = {}
+        self.__max_instruction_length: int = self.__get_max_instruction_length()
+        self.__memory.add_write_listener(self.invalidate_decode_cache)
+        # Without block compiler every instruction runs through the reference interpreter
+        self.__block_compiler: Optional[BlockCompiler] = None
+        if use_block_compiler:
+            self.__block_compiler = BlockCompiler(
+                memory,
+                instruction_set,
+                register_set,
+                zero_flag,
+                self.__get_decoded_instruction,
+                data_memory,
+            )
+        self.profiler: Optional[Profiler] = None
+        self.tracer: Optional[Tracer] = None
+        # Instructions a clock executed before one of them raised, e.g. at the start of a compiled block
+        self.retired_instructions: int = 0
+        # Opcodes whose first operand is the register they write, indexed by opcode (1 byte each)
+        self.__writes_register: bytearray = bytearray(256)
+        for opcode, meta_instruction in instruction_set.items():
+            self.__writes_register[opcode] = meta_instruction.mnemonic in Tracer.REGISTER_WRITING_MNEMONICS # fmt: skip
 
-    def __load_to_mbr(self) -> None:
-        data: int = self.__memory.get_with_address(
-            self.__R5.get(), len(self.__R4.value)
+    def __get_max_instruction_length(self) -> int:
+        max_number_of_operands: int = max(
+            meta_instruction.number_of_operands
+            for meta_instruction in self.__instruction_set.values()
         )
-        self.__R4.set(data)
-
-    def __increment_pc(self) -> None:
-        self.__R5.set(self.__R5.get() + 1)
+        max_operand_size: int = max(
+            operand_type.operand_size_byte
+            for operand_type in self.__operand_type_set.values()
+        )
+        # Opcode, last operand type, register operands and the last operand
+        return 2 + max(max_number_of_operands - 1, 0) + max_operand_size
 
-    def __get_register_operand(self) -> Register:
-        self.__increment_pc()
-        self.__load_to_mbr()
-        register_code = self.__R4.get()
+    def __get_register(self, address: int) -> Register:
+        register_code: Byte = self.__memory.read_byte(address)
         if register_code not in self.__register_set:
             raise ValueError(f"Unknown register code: {register_code}")
         return self.__register_set[register_code]
 
-    def __get_value_operand(self) -> int:
-        self.__increment_pc()
-        self.__load_to_mbr()
-        value = self.__memory.get_with_address(
-            self.__R5.get(), self.__operand_type_set[0x01].operand_size_byte
-        )
-        for _ in range(self.__operand_type_set[0x01].operand_size_byte):
-            self.__increment_pc()
-        return value
+    def __decode_instruction(self, address: int) -> DecodedInstruction:
+        # Decodes the instruction at address without touching R4 and R5.
+        # memory_byte and next_address are the values the fetch-decode cycle leaves in R4 and R5
+        opcode: Byte = self.__memory.read_byte(address)
+        if opcode not in self.__instruction_set:
+            raise ValueError(f"Unknown opcode: {opcode}")
 
-    def __get_operands(self, number_of_operands: int) -> Operands:
+        number_of_operands: int = self.__instruction_set[opcode].number_of_operands
+        method: InstructionMethod = self.__instruction_set[opcode].method
         operands: Operands = []
+        if number_of_operands == 0:
+            # Instructions without operands do not advance the program counter
+            return DecodedInstruction(
+                opcode=opcode,
+                method=method,
+                operands=operands,
+                address=address,
+                length=1,
+                next_address=address,
+                memory_byte=opcode,
+                code=bytes([opcode]),
+            )
+
         # Get the last operand type
-        self.__increment_pc()
-        self.__load_to_mbr()
-        last_operand_type_code: Byte = self.__R4.get()
+        current_address: int = address + 1
+        last_operand_type_code: Byte = self.__memory.read_byte(current_address)
 
-        # For each operand except (-1) the last one (handle them as register)
+        # Operands that are not the last one are always registers
         for _ in range(number_of_operands - 1):
-            operands.append(self.__get_register_operand())
+            current_address += 1
+            operands.append(self.__get_register(current_address))
 
         # Handle the last operand based on its type
         if last_operand_type_code not in self.__operand_type_set:
             raise ValueError(f"Unknown operand type code: {last_operand_type_code}")
+        current_address += 1
+        memory_byte: Byte = self.__memory.read_byte(current_address)
         if last_operand_type_code == 0x00:  # Register
-            operands.append(self.__get_register_operand())
-            self.__increment_pc()
-        elif last_operand_type_code == 0x01:  # Value
-            operands.append(self.__get_value_operand())
-        return operands
+            operands.append(self.__get_register(current_address))
+            current_address += 1
+        else:  # Value
+            operand_size_byte: int = self.__operand_type_set[last_operand_type_code].operand_size_byte # fmt: skip
+            operands.append(
+                self.__memory.read_uint(current_address, operand_size_byte)
+            )
+            current_address += operand_size_byte
+        return DecodedInstruction(
+            opcode=opcode,
+            method=method,
+            operands=operands,
+            address=address,
+            length=current_address - address,
+            next_address=current_address,
+            memory_byte=memory_byte,
+            code=bytes(self.__memory.read(address, current_address - address)),
+        )
 
-    def __decode_instruction(self) -> Instruction:
-        # Operands that are not the last one are always registers
-        opcode: Byte = self.__R4.get()
+    def __get_decoded_instruction(self, address: int) -> DecodedInstruction:
+        instruction: Optional[DecodedInstruction] = self.__decode_cache.get(address)
+        if instruction is None:
+            instruction = self.__decode_instruction(address)
+            self.__decode_cache[address] = instruction
+        return instruction
 
-        if opcode not in self.__instruction_set:
-            raise ValueError(f"Unknown opcode: {opcode}")
+    def decode(self, address: int) -> DecodedInstruction:
+        # The instruction at address as the fetch-decode cycle sees it, e.g. for other execution engines
+        return self.__get_decoded_instruction(address)
 
-        number_of_operands: int = self.__instruction_set[opcode].number_of_operands
-        operands: Operands = []
-        if number_of_operands > 0:
-            operands = self.__get_operands(number_of_operands)
-        method: InstructionMethod = self.__instruction_set[opcode].method
-        return Instruction(method, operands)
+    @property
+    def max_instruction_length(self) -> int:
+        return self.__max_instruction_length
 
-    def __execute_instruction(self, instruction: Instruction) -> None:
-        method: InstructionMethod = instruction.method
-        operands: Operands = instruction.operands
-        try:
-            method(*operands)
-            return
-        except StopIteration as e:
-            raise e
+    def invalidate_decode_cache(self, address: int, length: int) -> None:
+        decode_cache: dict[int, DecodedInstruction] = self.__decode_cache
+        if length > len(decode_cache):
+            overlapping: list[int] = [
+                instruction_address
+                for instruction_address, instruction in decode_cache.items()
+                if instruction_address < address + length
+                and instruction_address + instruction.length > address
+            ]
+        else:
+            overlapping = [
+                instruction_address
+                for instruction_address in range(
+                    address - self.__max_instruction_length + 1, address + length
+                )
+                if instruction_address in decode_cache
+                and instruction_address + decode_cache[instruction_address].length
+                > address
+            ]
+        for instruction_address in overlapping:
+            del decode_cache[instruction_address]
 
     def set_program_counter(self, address: int) -> None:
         self.__R5.set(address)
 
-    def clock(self) -> None:
-        # Fetch
-        self.__load_to_mbr()
-        # Decode
-        instruction: Instruction = self.__decode_instruction()
-        # Execute
+    def __select_clock(self) -> None:
+        # The profiled or traced clock shadows clock on the instance, without both clock is untouched.
+        # The profiler takes precedence, nothing is traced while it is attached
+        if self.profiler is not None:
+            self.clock = self.__clock_profiled  # type: ignore[method-assign]
+        elif self.tracer is not None:
+            self.clock = self.__clock_traced  # type: ignore[method-assign]
+        else:
+            self.__dict__.pop("clock", None)
+
+    def set_profiler(self, profiler: Optional[Profiler]) -> None:
+        self.profiler = profiler
+        self.__select_clock()
+
+    def set_tracer(self, tracer: Optional[Tracer]) -> None:
+        if self.tracer is not None:
+            self.__memory.remove_write_listener(self.tracer.on_memory_write)
+        self.tracer = tracer
+        if tracer is not None:
+            value_size_byte: int = max(register.size_byte for register in self.__register_set.values()) # fmt: skip
+            tracer.set_layout(self.__max_instruction_length, value_size_byte)
+            self.__memory.add_write_listener(tracer.on_memory_write)
+        if self.__block_compiler is not None:
+            self.__block_compiler.set_tracer(tracer)
+        self.__select_clock()
+
+    def __clock_traced(self, max_instructions: Optional[int] = None) -> int:
+        # Like clock, compiled blocks record their instructions into the tracer's ring buffer themselves,
+        # instructions of the interpreter are recorded here
+        tracer: Tracer = cast(Tracer, self.tracer)
+        address: int = self.__R5.get()
+        tracer.memory_length = 0
+        if self.__block_compiler is not None:
+            block: CompiledBlock = self.__block_compiler.get_block(address)
+            if block.function is not None and (
+                max_instructions is None or block.instruction_count <= max_instructions
+            ):
+                try:
+                    self.__R5.set(block.function())
+                except Exception:
+                    self.retired_instructions = block.retired_instructions
+                    tracer.failed()
+                    raise
+                if block.is_valid:
+                    return block.instruction_count
+                return block.retired_instructions
+        self.retired_instructions = 0
+        instruction: Optional[DecodedInstruction] = None
         try:
-            self.__execute_instruction(instruction)
-        except StopIteration as e:
-            raise e
+            instruction = self.__get_decoded_instruction(address)
+            self.__R4.set(instruction.memory_byte)
+            self.__R5.set(instruction.next_address)
+            status: Optional[ExecutionStatus] = instruction.method(*instruction.operands)
+        except Exception:
+            code: bytes = b"" if instruction is None else instruction.code
+            tracer.record(address, code, self.__Z.isFlagSet, error=True)
+            tracer.failed()
+            raise
+        if self.__writes_register[instruction.opcode]:
+            register: Register = cast(Register, instruction.operands[0])
+            tracer.record(address, instruction.code, self.__Z.isFlagSet, register.index, register.get()) # fmt: skip
+        else:
+            tracer.record(address, instruction.code, self.__Z.isFlagSet)
+        if status is not None:
+            self.status = status
+            if status == ExecutionStatus.HALTED:
+                tracer.halted()
+        return 1
+
+    def __clock_profiled(self, max_instructions: Optional[int] = None) -> int:
+        # Like clock, compiled blocks are timed as a whole (looking up or compiling the block counts as
+        # decoding), the instructions of the interpreter one by one
+        profiler: Profiler = cast(Profiler, self.profiler)
+        address: int = self.__R5.get()
+        base: int = self.__R6.get()
+        if self.__block_compiler is not None:
+            start: int = time.perf_counter_ns()
+            block: CompiledBlock = self.__block_compiler.get_block(address)
+            if block.function is not None and (
+                max_instructions is None or block.instruction_count <= max_instructions
+            ):
+                decoded: int = time.perf_counter_ns()
+                try:
+                    next_address: int = block.function()
+                except Exception:
+                    self.retired_instructions = block.retired_instructions
+                    self.__record_block(block, block.retired_instructions, base, decoded - start, time.perf_counter_ns() - decoded, None) # fmt: skip
+                    raise
+                executed: int = time.perf_counter_ns()
+                self.__R5.set(next_address)
+                retired: int = block.instruction_count if block.is_valid else block.retired_instructions # fmt: skip
+                self.__record_block(block, retired, base, decoded - start, executed - decoded, next_address) # fmt: skip
+                return retired
+        self.retired_instructions = 0
+        start = time.perf_counter_ns()
+        instruction: DecodedInstruction = self.__get_decoded_instruction(address)
+        decoded = time.perf_counter_ns()
+        self.__R4.set(instruction.memory_byte)
+        self.__R5.set(instruction.next_address)
+        status: Optional[ExecutionStatus] = instruction.method(*instruction.operands)
+        executed = time.perf_counter_ns()
+        if status is not None:
+            self.status = status
+        mnemonic: str = self.__instruction_set[instruction.opcode].mnemonic
+        taken: Optional[bool] = None
+        if mnemonic in profiler.BRANCH_MNEMONICS:
+            taken = self.__R5.get() != instruction.next_address
+        profiler.record_instruction(mnemonic, address, base, decoded - start, executed - decoded, taken) # fmt: skip
+        return 1
+
+    def __record_block(
+        self,
+        block: CompiledBlock,
+        retired: int,
+        base: int,
+        decode_time_ns: int,
+        execute_time_ns: int,
+        next_address: Optional[int],
+    ) -> None:
+        # A block only branches at its last instruction, next_address is None after an error
+        profiler: Profiler = cast(Profiler, self.profiler)
+        instructions: list[DecodedInstruction] = block.instructions[:retired]
+        if not instructions:
+            return
+        mnemonics: list[str] = [self.__instruction_set[instruction.opcode].mnemonic for instruction in instructions] # fmt: skip
+        taken: Optional[bool] = None
+        if next_address is not None and retired == block.instruction_count and mnemonics[-1] in profiler.BRANCH_MNEMONICS: # fmt: skip
+            taken = next_address != instructions[-1].next_address
+        profiler.record_block(
+            mnemonics,
+            [instruction.address for instruction in instructions],
+            base,
+            decode_time_ns,
+            execute_time_ns,
+            taken,
+        )
+
+    def clock(self, max_instructions: Optional[int] = None) -> int:
+        # Returns the number of executed instructions, if one raises see retired_instructions
+        address: int = self.__R5.get()
+        if self.__block_compiler is not None:
+            block: CompiledBlock = self.__block_compiler.get_block(address)
+            if block.function is not None and (
+                max_instructions is None or block.instruction_count <= max_instructions
+            ):
+                try:
+                    self.__R5.set(block.function())
+                except Exception:
+                    self.retired_instructions = block.retired_instructions
+                    raise
+                if block.is_valid:
+                    return block.instruction_count
+                # A store overwrote the block and ended it early
+                return block.retired_instructions
+        self.retired_instructions = 0
+        # Fetch and decode (once per address, until the memory at the address is written)
+        instruction: DecodedInstruction = self.__get_decoded_instruction(address)
+        self.__R4.set(instruction.memory_byte)
+        self.__R5.set(instruction.next_address)
+        # Execute
+        status: Optional[ExecutionStatus] = instruction.method(*instruction.operands)
+        if status is not None:
+            self.status = status
+        return 1
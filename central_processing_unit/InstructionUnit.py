@@ -2,7 +2,7 @@ from typing import Union
 from base.Register import Register
 from base.Flag import Flag
 from base.Ram import Ram
-from data_types import RegisterSet
+from data_types import ExecutionStatus, RegisterSet
 
 
 class InstructionUnit:
@@ -50,8 +50,8 @@ class InstructionUnit:
     def asm_BX(self) -> None:
         self.__jump_to_address(self.R3)
 
-    def asm_HLT(self) -> None:
-        raise StopIteration("HLT instruction executed")
+    def asm_HLT(self) -> ExecutionStatus:
+        return ExecutionStatus.HALTED
 
     def asm_NOP(self) -> None:
         pass
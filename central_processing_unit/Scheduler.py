@@ -0,0 +1,60 @@
+from collections import deque
+from typing import Optional
+from data_types import Byte, CPUContext, Interrupt, Task
+
+
+class Scheduler:
+    # Round-robin over the registered tasks, each one runs for a quantum of cycles
+    def __init__(self, quantum: int = 10000):
+        if quantum < 1:
+            raise ValueError("Scheduler quantum has to be at least 1 cycle")
+        self.quantum: int = quantum
+        self.current: Optional[Task] = None
+        self.__ready: deque[Task] = deque()
+        self.__next_task_id: int = 0
+        # Set while tasks wait for the CPU, read by the CPU loop on every clock
+        self.has_ready_tasks: bool = False
+
+    def add_task(
+        self, entry: Byte, base: Optional[Byte] = None, interrupt: Optional[Interrupt] = None
+    ) -> Task:
+        # Branches of the task are relative to base (R6), by default the entry address
+        base = entry if base is None else base
+        task: Task = Task(
+            id=self.__next_task_id,
+            context=CPUContext(R0=0, R1=0, R2=0, R3=0, R4=0, R5=entry, R6=base),
+            interrupt=interrupt,
+        )
+        self.__next_task_id += 1
+        self.__ready.append(task)
+        self.has_ready_tasks = True
+        return task
+
+    def add_running_program(self) -> Task:
+        # The program that ran before the first task becomes the running task,
+        # the next switch saves its context and queues it behind the other tasks
+        task: Task = Task(
+            id=self.__next_task_id,
+            context=CPUContext(R0=0, R1=0, R2=0, R3=0, R4=0, R5=0, R6=0),
+        )
+        self.__next_task_id += 1
+        self.current = task
+        return task
+
+    def get_tasks(self) -> list[Task]:
+        tasks: list[Task] = list(self.__ready)
+        if self.current is not None:
+            tasks.insert(0, self.current)
+        return tasks
+
+    def switch(self, context: Optional[CPUContext]) -> Optional[Task]:
+        # Timer interrupt: the running task gets context and goes to the back of the queue.
+        # Without context the running task is finished and dropped
+        if self.current is not None and context is not None:
+            self.current.context = context
+            self.__ready.append(self.current)
+        self.current = self.__ready.popleft() if self.__ready else None
+        self.has_ready_tasks = bool(self.__ready)
+        if self.current is not None:
+            self.current.slices += 1
+        return self.current
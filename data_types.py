@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from typing import Union, Protocol
+from dataclasses import dataclass, field
+from enum import IntEnum, IntFlag
+from typing import Callable, Optional, Union, Protocol
 from base.Register import Register
 
 type Byte = int
@@ -9,13 +10,41 @@ type RegisterCode = Byte
 type RegisterSet = dict[RegisterCode, Register]
 
 
+# Memory
+type Buffer = Union[bytes, bytearray, memoryview]
+type WriteListener = Callable[[int, int], None]  # (address, length)
+
+
+class PageProtection(IntFlag):
+    NONE = 0x00
+    READ = 0x01
+    WRITE = 0x02
+    READ_WRITE = 0x03
+
+
+class MemoryFault(ValueError):
+    # Access to protected memory or beyond the limit of the program's address space
+    def __init__(self, address: int, access: PageProtection):
+        super().__init__(f"{str(access.name).capitalize()} access to address {address} is not allowed") # fmt: skip
+        self.address: int = address
+        self.access: PageProtection = access
+
+
 # Instructions
+class ExecutionStatus(IntEnum):
+    RUNNING = 0x00
+    HALTED = 0x01  # HLT
+    RETURNED = 0x02  # IRET
+    IDLE = 0x03  # WFI without pending interrupt
+
+
 type Operand = Union[Register, int, None]
 type Operands = list[Operand]
 
 
 class Instruction_ZeroOperands(Protocol):
-    def __call__(self) -> None:
+    # Instructions that stop the current program report it with their status
+    def __call__(self) -> Optional[ExecutionStatus]:
         pass
 
 
@@ -51,14 +80,32 @@ class MetaInstruction:
     number_of_operands: int
 
 
+type Opcode = Byte
+type InstructionSet = dict[Opcode, MetaInstruction]
+
+
 @dataclass
-class Instruction:
+class DecodedInstruction:
+    opcode: Opcode
     method: InstructionMethod
     operands: Operands
+    address: int
+    length: int
+    next_address: int
+    memory_byte: Byte  # Last byte loaded into the memory byte register (R4)
+    code: bytes = b""  # Encoded instruction, recorded by the tracer
 
 
-type Opcode = Byte
-type InstructionSet = dict[Opcode, MetaInstruction]
+@dataclass
+class CompiledBlock:
+    start: int
+    end: int
+    instruction_count: int
+    function: Optional[Callable[[], int]]  # Runs the block and returns the next PC
+    is_valid: bool = True
+    # Instructions the last run executed if it ended early, on an error or a store into the block
+    retired_instructions: int = 0
+    instructions: list[DecodedInstruction] = field(default_factory=list)  # For the profiler
 
 
 # Operand types
@@ -73,11 +120,23 @@ type OperandTypeSet = dict[OperandTypeCode, OperandType]
 
 
 # Interrupts
+class InterruptStatus(IntEnum):
+    OK = 0x00
+    ERROR = 0x01
+    BUSY = 0x02
+    UNKNOWN_COMMAND = 0x03
+
+
+type InterruptCallback = Callable[[InterruptStatus, bytes], None]  # (status, payload)
+
+
 @dataclass
 class Interrupt:
     interrupt_command: Byte
     memory_address: Byte
     arguments: bytearray
+    on_complete: Optional[InterruptCallback] = None  # Called once the interrupt is serviced
+    queued_at: float = 0.0  # perf_counter() when it was queued, for the latency metrics
 
 
 # CPU context
@@ -90,3 +149,74 @@ class CPUContext:
     R4: int
     R5: int
     R6: int
+    Z: bool = False
+    interrupt: Optional[Interrupt] = None  # Interrupt that caused the context switch
+
+
+# Scheduler
+@dataclass
+class Task:
+    id: int
+    context: CPUContext  # Registers while the task is not running
+    interrupt: Optional[Interrupt] = None  # Interrupt that started the task
+    cycles: int = 0  # Executed instructions
+    slices: int = 0  # Quanta the task was scheduled for
+
+
+# Execution trace
+@dataclass
+class TraceRecord:
+    cycle: int
+    address: int  # PC of the instruction
+    code: bytes  # Encoded instruction, zero padded
+    zero_flag: bool  # After the instruction
+    register: Optional[RegisterCode]  # Written register
+    register_value: int
+    memory_address: Optional[int]  # Start of the written memory
+    memory_length: int
+    error: bool  # The instruction raised an exception
+
+
+# Headless run
+@dataclass
+class RunResult:
+    status: str  # "halted", "returned", "idle", "cycle_limit", "timeout" or "error"
+    registers: dict[str, int]
+    zero_flag: bool
+    cycles: int
+    wall_time: float  # Seconds
+    output: str
+    error: Optional[str] = None
+
+
+# Lockstep engine
+@dataclass
+class LockstepInstruction:
+    mnemonic: str
+    operands: list[tuple[bool, int]]  # (is register, register code or value)
+    length: int
+    next_address: int
+    memory_byte: Byte
+
+
+# Batch runs
+@dataclass
+class BatchJob:
+    id: str
+    program: str  # Path of the program file (hex text, assembly or program image)
+    entry: Optional[int]  # Load and start address of hex text programs
+    input: list[str]
+    max_cycles: Optional[int] = None
+    timeout: Optional[float] = None  # Seconds
+    output: Optional[str] = None  # File for the program output instead of the result
+    error: Optional[str] = None  # Why the manifest line is no valid job, such jobs are not run
+
+
+# Benchmarks
+@dataclass
+class BenchmarkCase:
+    name: str
+    programs: list[tuple[int, bytes]]  # (load address, code), all loaded before the run
+    entry: int  # Start address, also the program base (R6)
+    input: list[str]
+    max_cycles: Optional[int] = None
@@ -0,0 +1,27 @@
+import argparse
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import TraceRecord
+from tracer.TraceDecoder import TraceDecoder
+from tracer.Tracer import Tracer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print a binary execution trace as assembly")
+    parser.add_argument("trace", help="Trace file written by the CPU's tracer")
+    parser.add_argument("--last", type=int, default=None, help="Only print the last N records")
+    args = parser.parse_args()
+
+    decoder: TraceDecoder = TraceDecoder(
+        CentralProcessingUnit.INSTRUCTIONS,
+        CentralProcessingUnit.REGISTER_NAMES,
+        CentralProcessingUnit.OPERAND_TYPES,
+    )
+    records: list[TraceRecord] = Tracer.read_file(args.trace)
+    if args.last is not None:
+        records = records[-args.last :]
+    for line in decoder.format(records):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+; Output all Fibonacci numbers up to a user defined limit
+; Same bytecode as fibonacci.mem (labels are offsets from the program start)
+.load 0xA1
+
+set_limit:
+    INP R0
+    STR R0, [0x80]          ; store the limit in memory
+store_first_two_numbers:
+    MOV R0, 0
+    STR R0, [0x82]          ; store the first number in memory
+    BL is_current_number_greater_than_limit
+    LDR R0, [0x82]
+    OUT R0
+    MOV R0, 1
+    STR R0, [0x84]          ; store the second number in memory
+    B print_fibonacci_loop
+
+is_current_number_greater_than_limit:
+    LDR R1, [0x80]          ; load the limit from memory
+    SUB R0, R0, R1          ; current_number - limit
+    AND R0, R0, 0x8000      ; extract the most significant bit (sign)
+    CMP R0, 0
+    BNE jmp_back            ; current number is not greater than the limit
+    IRET
+jmp_back:
+    BX
+
+print_fibonacci_loop:
+    LDR R0, [0x82]          ; load the first number from memory
+    LDR R1, [0x84]          ; load the second number from memory
+    STR R0, [0x84]          ; store the first number in memory
+    ADD R0, R0, R1          ; current_number = first_number + second_number
+    STR R0, [0x82]          ; store the current number in memory
+    BL is_current_number_greater_than_limit
+    LDR R0, [0x82]
+    OUT R0
+    B print_fibonacci_loop
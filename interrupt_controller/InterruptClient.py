@@ -0,0 +1,54 @@
+import socket
+from typing import Optional
+from data_types import InterruptStatus
+from interrupt_controller.InterruptServer import InterruptServer
+
+
+class InterruptClient:
+    # Blocking client for the framed interrupt protocol, one connection for many requests.
+    # With machine the requests go to that machine of a host
+    def __init__(
+        self, host: str = "localhost", port: int = 9999, machine: Optional[int] = None
+    ):
+        self.__socket: socket.socket = socket.create_connection((host, port))
+        self.machine: Optional[int] = machine
+
+    def __read_exactly(self, length: int) -> bytes:
+        data: bytearray = bytearray()
+        while len(data) < length:
+            chunk: bytes = self.__socket.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the interrupt server")
+            data += chunk
+        return bytes(data)
+
+    def request(
+        self, interrupt_command: int, address: int, payload: bytes = b""
+    ) -> tuple[InterruptStatus, bytes]:
+        if self.machine is None:
+            header: bytes = InterruptServer.REQUEST_HEADER.pack(
+                InterruptServer.REQUEST_MAGIC, interrupt_command, address, len(payload)
+            )
+        else:
+            header = InterruptServer.MACHINE_REQUEST_HEADER.pack(InterruptServer.MACHINE_REQUEST_MAGIC, interrupt_command, self.machine, address, len(payload)) # fmt: skip
+        self.__socket.sendall(header)
+        self.__socket.sendall(payload)
+        magic, status, length = InterruptServer.RESPONSE_HEADER.unpack(
+            self.__read_exactly(InterruptServer.RESPONSE_HEADER.size)
+        )
+        if magic != InterruptServer.RESPONSE_MAGIC:
+            raise ValueError("Invalid response from the interrupt server")
+        return InterruptStatus(status), self.__read_exactly(length)
+
+    def load(self, address: int, program: bytes) -> tuple[InterruptStatus, bytes]:
+        return self.request(0x00, address, program)
+
+    def run(self, address: int) -> tuple[InterruptStatus, bytes]:
+        return self.request(0x01, address)
+
+    def metrics(self, text: bool = False) -> tuple[InterruptStatus, bytes]:
+        # JSON or the text exposition format
+        return self.request(0x03, 0x01 if text else 0x00)
+
+    def close(self) -> None:
+        self.__socket.close()
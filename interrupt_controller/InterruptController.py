@@ -1,45 +1,61 @@
-import socket
-import threading
-from data_types import Byte, CPUContext, Interrupt, RegisterSet
+import json
+import time
+from typing import Callable, Optional
+from base.Flag import Flag
+from base.RegisterFile import RegisterFile
+from data_types import (
+    Byte,
+    CPUContext,
+    ExecutionStatus,
+    Interrupt,
+    InterruptStatus,
+    RegisterSet,
+)
+from interrupt_controller.InterruptQueue import InterruptQueue
+from loader.ProgramLoader import ProgramLoader
+from metrics.Metrics import Metrics
 
 
 class InterruptController:
-    def __init__(self, register_set: RegisterSet):
-        self.has_interrupt: bool = False
-        self.__interrupt_vector_table: list[Interrupt] = []
+    def __init__(
+        self,
+        register_set: RegisterSet,
+        zero_flag: Flag,
+        max_pending_interrupts: int = 1024,
+        interrupt_priorities: Optional[dict[Byte, int]] = None,
+        max_interrupt_depth: int = 64,
+    ):
+        self.__interrupt_queue: InterruptQueue = InterruptQueue(max_pending_interrupts, interrupt_priorities) # fmt: skip
         self.__register_set: RegisterSet = register_set
+        self.__Z: Flag = zero_flag
+        # Interrupted programs keep their registers in the banks of the register file, entering an
+        # interrupt selects the next bank. Only deeper nesting spills contexts to the context memory
+        self.__register_file: RegisterFile = (
+            register_set[0x00].register_file if register_set else RegisterFile(0)
+        )
+        self.__number_of_banks: int = len(self.__register_file.banks)
+        self.__bank_zero_flags: list[bool] = []
         self.__interrupt_context_memory: list[CPUContext] = []
+        # Interrupts of all saved contexts, banked and spilled, the innermost last
+        self.__saved_interrupts: list[Optional[Interrupt]] = []
+        # Number of saved contexts (nested run interrupts) before run interrupts are refused
+        self.max_interrupt_depth: int = max_interrupt_depth
+        # Seconds WFI waits for an interrupt, None waits until one arrives
+        self.idle_timeout: Optional[float] = None
+        # Counters reported by interrupt command 0x03, instructions are counted by the CPU loop
+        self.metrics: Metrics = Metrics()
+        # Called after an interrupt was queued, from the thread that queued it
+        self.on_interrupt_queued: Optional[Callable[[], None]] = None
 
     def __recreate_last_context(self) -> None:
-        last_context: CPUContext = self.__interrupt_context_memory.pop()
-        self.__register_set[0x00].set(last_context.R0)
-        self.__register_set[0x01].set(last_context.R1)
-        self.__register_set[0x02].set(last_context.R2)
-        self.__register_set[0x03].set(last_context.R3)
-        self.__register_set[0x04].set(last_context.R4)
-        self.__register_set[0x05].set(last_context.R5)
-        self.__register_set[0x06].set(last_context.R6)
-
-    def __interrupt_listener_thread(self) -> None:
-        server: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server.bind(("localhost", 9999))
-        server.listen(5)
-        print(
-            """
-CPU running
-Waiting for instructions
-
-"""
-        )
-
-        while True:
-            client_socket: socket.socket = server.accept()[0]
-            data: str = client_socket.recv(1024).decode("utf-8")
-            self.__process_interrupt(data)
-            client_socket.close()
+        self.__saved_interrupts.pop()
+        if self.__interrupt_context_memory:
+            self.restore_context(self.__interrupt_context_memory.pop())
+            return
+        self.__register_file.select_bank(len(self.__bank_zero_flags) - 1)
+        self.__Z.isFlagSet = self.__bank_zero_flags.pop()
 
-    def __process_interrupt(self, interrupt_message: str) -> None:
+    def __process_interrupt(self, interrupt_message: str) -> Optional[Interrupt]:
         interrupt_message_lines: list[str] = interrupt_message.split("\n")
         interrupt_message_bytes: list[str] = []
         for line in interrupt_message_lines:
@@ -51,42 +67,154 @@ Waiting for instructions
             interrupt_command: Byte = int(interrupt_message_bytes[0], 0)
         except ValueError as e:
             print(f"Error in interrupt command, try again: {e}")
-            return
+            return None
         try:
             address: Byte = int(interrupt_message_bytes[1], 0)
         except ValueError as e:
             print(f"Error in address, try again: {e}")
-            return
+            return None
         if (interrupt_command == 0x00) and (address < 0x0A):
             print("Error in address, LOAD address has to by at least 0x0A")
         try:
-            arguments: bytearray = bytearray(
-                [int(x, 0) for x in interrupt_message_bytes[2:]]
+            arguments: bytearray = ProgramLoader.parse_text(
+                " ".join(interrupt_message_bytes[2:])
             )
         except ValueError as e:
             print(f"Error ein program, try again: {e}")
-            return
-        pending_interrupt: Interrupt = Interrupt(
+            return None
+        return Interrupt(
             interrupt_command=interrupt_command,
             memory_address=address,
             arguments=arguments,
         )
-        self.__interrupt_vector_table.append(pending_interrupt)
-        self.has_interrupt = True
 
-    def start_interrupt_listener(self) -> None:
-        t: threading.Thread = threading.Thread(target=self.__interrupt_listener_thread)
-        t.daemon = True
-        t.start()
+    def complete(
+        self,
+        interrupt: Optional[Interrupt],
+        status: str,
+        details: Optional[dict[str, object]] = None,
+    ) -> None:
+        # Reports the result of a run interrupt with the registers before they are restored
+        if interrupt is None or interrupt.on_complete is None:
+            return
+        result: dict[str, object] = {
+            "status": status,
+            "registers": {
+                register.name: register.get()
+                for register in self.__register_set.values()
+            },
+            "zero_flag": self.__Z.isFlagSet,
+            **(details or {}),
+        }
+        interrupt.on_complete(InterruptStatus.OK, json.dumps(result).encode("utf-8"))
+        interrupt.on_complete = None
+
+    def start_interrupt_listener(self, host: str = "localhost", port: int = 9999) -> None:
+        # Imported here, the server is only needed when the CPU listens for interrupts
+        from interrupt_controller.InterruptServer import InterruptServer
+
+        InterruptServer(self, host, port).start()
+
+    @property
+    def has_interrupt(self) -> bool:
+        return self.__interrupt_queue.has_interrupt
+
+    def queue_interrupt(
+        self, interrupt: Interrupt, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        # Blocks while the queue is full, False if it stayed full (non-blocking or timed out)
+        if not self.__interrupt_queue.put(interrupt, block, timeout):
+            return False
+        if self.on_interrupt_queued is not None:
+            self.on_interrupt_queued()
+        return True
+
+    def parse_text_message(self, interrupt_message: str) -> Optional[Interrupt]:
+        # Legacy text protocol: "<command> <address> [<byte> ...]", None if the message is invalid
+        return self.__process_interrupt(interrupt_message)
+
+    def receive_text_message(self, interrupt_message: str) -> bool:
+        interrupt: Optional[Interrupt] = self.__process_interrupt(interrupt_message)
+        return interrupt is not None and self.queue_interrupt(interrupt)
 
     def get_next_interrupt(self) -> Interrupt:
-        interrupt: Interrupt = self.__interrupt_vector_table.pop(0)
-        if len(self.__interrupt_vector_table) == 0:
-            self.has_interrupt = False
-        return interrupt
+        return self.get_next_interrupts()[0]
+
+    def get_next_interrupts(self, max_loads: int = 1) -> list[Interrupt]:
+        # The next interrupt, a load comes with up to max_loads - 1 pending loads behind it
+        interrupts: list[Interrupt] = self.__interrupt_queue.get(max_loads)
+        now: float = time.perf_counter()
+        for interrupt in interrupts:
+            self.metrics.record_interrupt(now - interrupt.queued_at)
+        return interrupts
 
-    def save_current_context(self) -> None:
-        context: CPUContext = CPUContext(
+    def wait_for_interrupt(self, timeout: Optional[float] = None) -> bool:
+        if timeout == 0:
+            return self.__interrupt_queue.has_interrupt
+        start: float = time.perf_counter()
+        try:
+            return self.__interrupt_queue.wait(timeout)
+        finally:
+            self.metrics.idle_time += time.perf_counter() - start
+
+    @property
+    def pending_interrupts(self) -> int:
+        return len(self.__interrupt_queue)
+
+    def report_metrics(self, interrupt: Interrupt) -> None:
+        # Interrupt command 0x03, the address selects the format: 0x00 JSON, 0x01 text exposition
+        metrics: dict[str, object] = self.metrics.to_dict(self.pending_interrupts, self.context_depth) # fmt: skip
+        if interrupt.memory_address == 0x00:
+            payload: str = Metrics.to_json(metrics)
+        elif interrupt.memory_address == 0x01:
+            payload = Metrics.to_text(metrics)
+        else:
+            print(f"Unknown metrics format: {interrupt.memory_address}")
+            if interrupt.on_complete is not None:
+                interrupt.on_complete(InterruptStatus.ERROR, b"Unknown metrics format")
+            return
+        if interrupt.on_complete is None:
+            print(payload)
+            return
+        interrupt.on_complete(InterruptStatus.OK, payload.encode("utf-8"))
+
+    def get_pending_interrupts(self) -> list[Interrupt]:
+        return self.__interrupt_queue.peek_all()
+
+    def set_pending_interrupts(self, interrupts: list[Interrupt]) -> None:
+        # Replaces the pending interrupts, e.g. when a snapshot is restored
+        self.__interrupt_queue.clear()
+        for interrupt in interrupts:
+            if not self.__interrupt_queue.put(interrupt, block=False):
+                raise ValueError("More pending interrupts than the interrupt queue holds")
+
+    def get_contexts(self) -> list[CPUContext]:
+        # Saved contexts from the outermost to the innermost
+        banks: list[list[int]] = self.__register_file.banks
+        contexts: list[CPUContext] = [
+            CPUContext(*banks[bank], Z=zero_flag, interrupt=self.__saved_interrupts[bank])
+            for bank, zero_flag in enumerate(self.__bank_zero_flags)
+        ]
+        return contexts + self.__interrupt_context_memory
+
+    def set_contexts(self, contexts: list[CPUContext]) -> None:
+        # Replaces the saved contexts, the registers of the running program have to be set afterwards
+        if len(contexts) > self.max_interrupt_depth:
+            raise ValueError("More saved contexts than the interrupt nesting limit")
+        number_of_banked: int = min(len(contexts), self.__number_of_banks - 1)
+        for bank, context in enumerate(contexts[:number_of_banked]):
+            self.__register_file.banks[bank][:] = [context.R0, context.R1, context.R2, context.R3, context.R4, context.R5, context.R6] # fmt: skip
+        self.__bank_zero_flags = [context.Z for context in contexts[:number_of_banked]]
+        self.__interrupt_context_memory = list(contexts[number_of_banked:])
+        self.__saved_interrupts = [context.interrupt for context in contexts]
+        self.__register_file.select_bank(number_of_banked)
+
+    @property
+    def context_depth(self) -> int:
+        return len(self.__saved_interrupts)
+
+    def capture_context(self, interrupt: Optional[Interrupt] = None) -> CPUContext:
+        return CPUContext(
             R0=self.__register_set[0x00].get(),
             R1=self.__register_set[0x01].get(),
             R2=self.__register_set[0x02].get(),
@@ -94,9 +222,56 @@ Waiting for instructions
             R4=self.__register_set[0x04].get(),
             R5=self.__register_set[0x05].get(),
             R6=self.__register_set[0x06].get(),
+            Z=self.__Z.isFlagSet,
+            interrupt=interrupt,
         )
-        self.__interrupt_context_memory.append(context)
 
-    def asm_IRET(self) -> None:
-        self.__recreate_last_context()
-        raise StopAsyncIteration("IRET called")
+    def restore_context(self, context: CPUContext) -> None:
+        self.__register_set[0x00].set(context.R0)
+        self.__register_set[0x01].set(context.R1)
+        self.__register_set[0x02].set(context.R2)
+        self.__register_set[0x03].set(context.R3)
+        self.__register_set[0x04].set(context.R4)
+        self.__register_set[0x05].set(context.R5)
+        self.__register_set[0x06].set(context.R6)
+        self.__Z.isFlagSet = context.Z
+
+    def save_current_context(self, interrupt: Optional[Interrupt] = None) -> bool:
+        # False if the nesting limit is reached, nothing is saved then
+        depth: int = len(self.__saved_interrupts)
+        if depth >= self.max_interrupt_depth:
+            return False
+        if depth + 1 < self.__number_of_banks:
+            # The interrupting program starts with the registers of the interrupted one
+            register_file: RegisterFile = self.__register_file
+            register_file.banks[depth + 1][:] = register_file.values
+            register_file.select_bank(depth + 1)
+            self.__bank_zero_flags.append(self.__Z.isFlagSet)
+        else:
+            self.__interrupt_context_memory.append(self.capture_context(interrupt))
+        self.__saved_interrupts.append(interrupt)
+        return True
+
+    def halt(self, status: str = "halted", details: Optional[dict[str, object]] = None) -> None: # fmt: skip
+        # HLT ends the running program and every program it interrupted, none of them resumes
+        while self.__saved_interrupts:
+            self.complete(self.__saved_interrupts.pop(), status, details)
+        self.__interrupt_context_memory.clear()
+        self.__bank_zero_flags.clear()
+        # The registers stay as HLT left them
+        register_file: RegisterFile = self.__register_file
+        register_file.banks[0][:] = register_file.values
+        register_file.select_bank(0)
+
+    def asm_WFI(self) -> Optional[ExecutionStatus]:
+        # The program counter stays on WFI, the CPU idles here again after the interrupt is serviced
+        if not self.wait_for_interrupt(self.idle_timeout):
+            return ExecutionStatus.IDLE
+        return None
+
+    def asm_IRET(self) -> ExecutionStatus:
+        # Without saved context (program started by CentralProcessingUnit.run) registers stay as they are
+        if self.__saved_interrupts:
+            self.complete(self.__saved_interrupts[-1], "returned")
+            self.__recreate_last_context()
+        return ExecutionStatus.RETURNED
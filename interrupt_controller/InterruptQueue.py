@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+from typing import Optional, cast
+from data_types import Byte, Interrupt
+
+
+class InterruptQueue:
+    # Commands that start the program at their address, a load must not overtake them and they
+    # must not overtake a load, if the loaded program covers the address
+    __PROGRAM_COMMANDS: tuple[Byte, ...] = (0x01, 0x02)
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        priorities: Optional[dict[Byte, int]] = None,
+    ):
+        # Without priorities all interrupts are served in the order they were queued. With priorities
+        # (level per command, 0 is served first) commands without level are served after all others
+        if max_size < 1:
+            raise ValueError("Interrupt queue size has to be at least 1")
+        self.max_size: int = max_size
+        self.__priorities: dict[Byte, int] = {
+            interrupt_command: max(priority, 0)
+            for interrupt_command, priority in (priorities or {}).items()
+        }
+        self.__default_priority: int = max(self.__priorities.values(), default=-1) + 1
+        # Created on the first interrupt of their level, an idle CPU keeps only the list
+        self.__levels: list[Optional[deque[Interrupt]]] = [None] * (self.__default_priority + 1) # fmt: skip
+        self.__size: int = 0
+        self.__lock: threading.Lock = threading.Lock()
+        # Notified when an interrupt is queued (idle CPU) and when one is taken (waiting senders)
+        self.__not_empty: threading.Condition = threading.Condition(self.__lock)
+        self.__not_full: threading.Condition = threading.Condition(self.__lock)
+        # Only changed while holding the lock, read without it by the CPU loop
+        self.has_interrupt: bool = False
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __depends_on(self, interrupt: Interrupt, earlier: Interrupt) -> bool:
+        # True if interrupt loads a program earlier starts or starts a program earlier loads
+        if interrupt.interrupt_command == 0x00:
+            load, start = interrupt, earlier
+        elif earlier.interrupt_command == 0x00:
+            load, start = earlier, interrupt
+        else:
+            return False
+        return (
+            start.interrupt_command in self.__PROGRAM_COMMANDS
+            and load.memory_address <= start.memory_address < load.memory_address + len(load.arguments) # fmt: skip
+        )
+
+    def __get_level(self, interrupt: Interrupt) -> deque[Interrupt]:
+        index: int = self.__priorities.get(interrupt.interrupt_command, self.__default_priority) # fmt: skip
+        # Queued behind the last pending interrupt it depends on, if that one is served later
+        for later_index in range(len(self.__levels) - 1, index, -1):
+            level: Optional[deque[Interrupt]] = self.__levels[later_index]
+            if level and any(self.__depends_on(interrupt, earlier) for earlier in level):
+                index = later_index
+                break
+        level = self.__levels[index]
+        if level is None:
+            level = self.__levels[index] = deque()
+        return level
+
+    def put(
+        self, interrupt: Interrupt, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        # Returns False if the queue stayed full, the sender has to retry or report busy
+        with self.__not_full:
+            if self.__size >= self.max_size:
+                if not block or not self.__not_full.wait_for(
+                    lambda: self.__size < self.max_size, timeout
+                ):
+                    return False
+            interrupt.queued_at = time.perf_counter()
+            self.__get_level(interrupt).append(interrupt)
+            self.__size += 1
+            self.has_interrupt = True
+            self.__not_empty.notify_all()
+        return True
+
+    def get(self, max_loads: int = 1) -> list[Interrupt]:
+        # Takes the next interrupt by priority. If it is a load, up to max_loads
+        # directly following loads are taken with it to be serviced in one pass
+        with self.__lock:
+            for level in self.__levels:
+                if level:
+                    break
+            else:
+                raise IndexError("No pending interrupt")
+            level = cast(deque[Interrupt], level)
+            interrupts: list[Interrupt] = [level.popleft()]
+            if interrupts[0].interrupt_command == 0x00:
+                while (
+                    level
+                    and len(interrupts) < max_loads
+                    and level[0].interrupt_command == 0x00
+                ):
+                    interrupts.append(level.popleft())
+            self.__size -= len(interrupts)
+            self.has_interrupt = self.__size > 0
+            self.__not_full.notify(len(interrupts))
+        return interrupts
+
+    def peek_all(self) -> list[Interrupt]:
+        # Pending interrupts in the order they would be taken, the queue is not changed
+        with self.__lock:
+            return [interrupt for level in self.__levels if level for interrupt in level]
+
+    def clear(self) -> None:
+        with self.__lock:
+            for level in self.__levels:
+                if level is not None:
+                    level.clear()
+            self.__size = 0
+            self.has_interrupt = False
+            self.__not_full.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self.__not_empty:
+            return self.__not_empty.wait_for(lambda: self.__size > 0, timeout)
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import struct
+import threading
+from typing import TYPE_CHECKING, Any, Coroutine, Optional, Union
+from data_types import Interrupt, InterruptCallback, InterruptStatus
+from loader.ProgramImage import ProgramImage
+from metrics.Metrics import Metrics
+
+if TYPE_CHECKING:
+    from interrupt_controller.InterruptController import InterruptController
+
+
+class InterruptServer:
+    # Framed request: magic, command, address, payload length, followed by the payload
+    REQUEST_MAGIC: bytes = b"VI"
+    REQUEST_HEADER: struct.Struct = struct.Struct("<2sBxII")
+    # Framed request to one machine of a host: magic, command, machine ID, address, payload length
+    MACHINE_REQUEST_MAGIC: bytes = b"VM"
+    MACHINE_REQUEST_HEADER: struct.Struct = struct.Struct("<2sBxIII")
+    # Framed response: magic, status, payload length, followed by the payload
+    RESPONSE_MAGIC: bytes = b"VR"
+    RESPONSE_HEADER: struct.Struct = struct.Struct("<2sBxI")
+    # Payloads are read in chunks, a load is queued as one interrupt once it is complete,
+    # so a run from another connection never sees a program half loaded
+    CHUNK_SIZE: int = 64 * 1024
+    # The legacy text protocol has no length, a message ends on EOF or when the client goes quiet
+    TEXT_IDLE_TIMEOUT: float = 0.2
+    # Scrapers fetch the metrics in the text exposition format with GET /metrics
+    HTTP_PREFIX: bytes = b"GE"
+    METRICS_PATH: bytes = b"/metrics"
+    # Seconds a request waits for room in a full interrupt queue before it is answered busy
+    QUEUE_TIMEOUT: float = 10.0
+    BUSY_RESPONSE: tuple[InterruptStatus, bytes] = (InterruptStatus.BUSY, b"Interrupt queue is full") # fmt: skip
+
+    def __init__(
+        self,
+        interrupt_controller: Union["InterruptController", list["InterruptController"]],
+        host: str = "localhost",
+        port: int = 9999,
+    ):
+        # With a list of interrupt controllers (machines of a host) requests name the machine by its
+        # index, requests without machine ID and the text and image protocols go to the first one
+        self.__interrupt_controllers: list["InterruptController"] = (
+            interrupt_controller
+            if isinstance(interrupt_controller, list)
+            else [interrupt_controller]
+        )
+        self.__interrupt_controller: "InterruptController" = self.__interrupt_controllers[0]
+        self.__host: str = host
+        self.__port: int = port
+        self.__loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+
+    def __complete_future(
+        self, future: "asyncio.Future[tuple[InterruptStatus, bytes]]"
+    ) -> InterruptCallback:
+        # Interrupts complete on the CPU thread, the result is handed over to the event loop
+        def on_complete(status: InterruptStatus, payload: bytes) -> None:
+            def set_result() -> None:
+                if not future.done():
+                    future.set_result((status, payload))
+
+            self.__loop.call_soon_threadsafe(set_result)
+
+        return on_complete
+
+    async def __put(
+        self,
+        interrupt: Interrupt,
+        interrupt_controller: Optional["InterruptController"] = None,
+    ) -> bool:
+        # A full queue is waited on in a worker thread, the connection stops reading meanwhile
+        interrupt_controller = interrupt_controller or self.__interrupt_controller
+        if interrupt_controller.queue_interrupt(interrupt, block=False):
+            return True
+        return await self.__loop.run_in_executor(
+            None,
+            interrupt_controller.queue_interrupt,
+            interrupt,
+            True,
+            self.QUEUE_TIMEOUT,
+        )
+
+    async def __queue(
+        self,
+        interrupt_command: int,
+        address: int,
+        arguments: bytearray,
+        interrupt_controller: Optional["InterruptController"] = None,
+    ) -> "Optional[asyncio.Future[tuple[InterruptStatus, bytes]]]":
+        # None if the interrupt queue stayed full
+        future: asyncio.Future[tuple[InterruptStatus, bytes]] = self.__loop.create_future() # fmt: skip
+        interrupt: Interrupt = Interrupt(
+            interrupt_command=interrupt_command,
+            memory_address=address,
+            arguments=arguments,
+            on_complete=self.__complete_future(future),
+        )
+        if not await self.__put(interrupt, interrupt_controller):
+            return None
+        return future
+
+    async def __load(
+        self,
+        reader: asyncio.StreamReader,
+        address: int,
+        length: int,
+        interrupt_controller: "InterruptController",
+    ) -> tuple[InterruptStatus, bytes]:
+        program: bytearray = bytearray()
+        while len(program) < length:
+            program += await reader.readexactly(min(self.CHUNK_SIZE, length - len(program)))
+        future = await self.__queue(0x00, address, program, interrupt_controller)
+        if future is None:
+            return self.BUSY_RESPONSE
+        status, payload = await future
+        if status != InterruptStatus.OK:
+            return status, payload
+        result: dict[str, int] = {"address": address, "length": length}
+        return InterruptStatus.OK, json.dumps(result).encode("utf-8")
+
+    async def __handle_frames(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, header: bytes
+    ) -> None:
+        # A connection carries any number of requests, each one is answered in order
+        while header:
+            header += await reader.readexactly(len(self.REQUEST_MAGIC) - len(header))
+            machine: int = 0
+            if header == self.REQUEST_MAGIC:
+                header += await reader.readexactly(self.REQUEST_HEADER.size - len(header)) # fmt: skip
+                _, command, address, length = self.REQUEST_HEADER.unpack(header)
+            elif header == self.MACHINE_REQUEST_MAGIC:
+                header += await reader.readexactly(self.MACHINE_REQUEST_HEADER.size - len(header)) # fmt: skip
+                _, command, machine, address, length = self.MACHINE_REQUEST_HEADER.unpack(header) # fmt: skip
+            else:
+                self.__respond(writer, InterruptStatus.ERROR, b"Invalid frame magic")
+                break
+            if machine >= len(self.__interrupt_controllers):
+                # The payload is skipped to keep the connection in sync
+                while length > 0:
+                    length -= len(await reader.readexactly(min(self.CHUNK_SIZE, length)))
+                status, payload = InterruptStatus.ERROR, f"Unknown machine {machine}".encode("utf-8") # fmt: skip
+            elif command == 0x00:
+                status, payload = await self.__load(reader, address, length, self.__interrupt_controllers[machine]) # fmt: skip
+            else:
+                arguments: bytearray = bytearray(await reader.readexactly(length))
+                future = await self.__queue(command, address, arguments, self.__interrupt_controllers[machine]) # fmt: skip
+                status, payload = self.BUSY_RESPONSE if future is None else await future
+            self.__respond(writer, status, payload)
+            await writer.drain()
+            header = await reader.read(1)
+
+    def __respond(
+        self, writer: asyncio.StreamWriter, status: InterruptStatus, payload: bytes
+    ) -> None:
+        writer.write(self.RESPONSE_HEADER.pack(self.RESPONSE_MAGIC, status, len(payload))) # fmt: skip
+        writer.write(payload)
+
+    async def __handle_image(self, reader: asyncio.StreamReader, data: bytes) -> None:
+        # Binary program images are loaded to their load address, the client closes after sending
+        data += await reader.read()
+        try:
+            image: ProgramImage = ProgramImage.from_bytes(data)
+        except ValueError as e:
+            print(f"Error in program image, try again: {e}")
+            return
+        interrupt: Interrupt = Interrupt(
+            interrupt_command=0x00,
+            memory_address=image.load_address,
+            arguments=bytearray(image.code),
+        )
+        if not await self.__put(interrupt):
+            print("Interrupt queue is full, program image dropped")
+
+    async def __handle_text(self, reader: asyncio.StreamReader, data: bytes) -> None:
+        chunks: list[bytes] = [data]
+        try:
+            while chunk := await asyncio.wait_for(
+                reader.read(self.CHUNK_SIZE), self.TEXT_IDLE_TIMEOUT
+            ):
+                chunks.append(chunk)
+        except asyncio.TimeoutError:
+            pass
+        interrupt: Optional[Interrupt] = self.__interrupt_controller.parse_text_message(
+            b"".join(chunks).decode("utf-8")
+        )
+        if interrupt is not None and not await self.__put(interrupt):
+            print("Interrupt queue is full, interrupt dropped")
+
+    async def __metrics_text(self) -> tuple[InterruptStatus, bytes]:
+        # Every machine reports its metrics, those of a host are labeled with the machine ID
+        if len(self.__interrupt_controllers) == 1:
+            future = await self.__queue(0x03, 0x01, bytearray())
+            return self.BUSY_RESPONSE if future is None else await future
+        futures: list[asyncio.Future[tuple[InterruptStatus, bytes]]] = []
+        for interrupt_controller in self.__interrupt_controllers:
+            future = await self.__queue(0x03, 0x00, bytearray(), interrupt_controller)
+            if future is None:
+                return self.BUSY_RESPONSE
+            futures.append(future)
+        metrics: dict[str, dict[str, Any]] = {}
+        for machine, (status, payload) in enumerate(await asyncio.gather(*futures)):
+            if status != InterruptStatus.OK:
+                return status, payload
+            metrics[str(machine)] = json.loads(payload)
+        return InterruptStatus.OK, Metrics.to_labeled_text(metrics, "machine").encode("utf-8") # fmt: skip
+
+    async def __handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, data: bytes
+    ) -> None:
+        data += await reader.readuntil(b"\r\n\r\n")
+        request_line: list[bytes] = data.split(b"\r\n", 1)[0].split(b" ")
+        if len(request_line) < 2 or request_line[0] != b"GET" or request_line[1].split(b"?")[0] != self.METRICS_PATH: # fmt: skip
+            writer.write(b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            return
+        status, payload = await self.__metrics_text()
+        reason: bytes = b"200 OK" if status == InterruptStatus.OK else b"503 Service Unavailable" # fmt: skip
+        writer.write(b"HTTP/1.0 %s\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: %d\r\n\r\n" % (reason, len(payload))) # fmt: skip
+        writer.write(payload)
+        await writer.drain()
+
+    async def __handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            prefix: bytes = await reader.read(len(self.REQUEST_MAGIC))
+            if len(prefix) == 1:
+                prefix += await reader.read(1)
+            if prefix in (self.REQUEST_MAGIC, self.MACHINE_REQUEST_MAGIC):
+                await self.__handle_frames(reader, writer, prefix)
+            elif prefix == self.HTTP_PREFIX:
+                await self.__handle_http(reader, writer, prefix)
+            elif ProgramImage.MAGIC.startswith(prefix) and prefix:
+                await self.__handle_image(reader, prefix)
+            elif prefix:
+                await self.__handle_text(reader, prefix)
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ) as e:
+            print(f"Interrupt connection closed: {e}")
+        finally:
+            writer.close()
+
+    async def __serve(self, ready: Optional[threading.Event] = None) -> None:
+        server: asyncio.Server = await asyncio.start_server(
+            self.__handle_connection, self.__host, self.__port, reuse_address=True
+        )
+        print(
+            """
+CPU running
+Waiting for instructions
+
+"""
+        )
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def __run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.__loop)
+        try:
+            self.__loop.run_until_complete(self.__serve(ready))
+        except OSError as e:
+            print(f"Interrupt listener could not start: {e}")
+            ready.set()
+
+    def run(self, *coroutines: Coroutine[Any, Any, None]) -> None:
+        # Serves in the calling thread together with the coroutines (e.g. the machines of a host),
+        # they share the event loop of the server
+        async def serve() -> None:
+            await asyncio.gather(self.__serve(), *coroutines)
+
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_until_complete(serve())
+
+    def start(self) -> None:
+        ready: threading.Event = threading.Event()
+        t: threading.Thread = threading.Thread(target=self.__run, args=(ready,))
+        t.daemon = True
+        t.start()
+        ready.wait()
@@ -0,0 +1,145 @@
+import mmap
+import struct
+from typing import Optional
+from data_types import Buffer, CPUContext, Interrupt
+
+
+class MachineSnapshot:
+    # Binary format: header, registers, interrupt context stack and pending interrupts,
+    # then the memory at a page aligned offset, so the file can be mapped and copied in one piece.
+    # Register values take the size of their register, in the registers and in every context
+    MAGIC: bytes = b"VSNP"
+    VERSION: int = 2
+    # magic, version, flags, number of registers, memory size, memory offset, contexts, interrupts
+    HEADER: struct.Struct = struct.Struct("<4sBBHQQII")
+    REGISTER: struct.Struct = struct.Struct("<B")  # size, followed by the value
+    CONTEXT: struct.Struct = struct.Struct("<BB")  # Z, has interrupt, after the values of R0-R6
+    INTERRUPT: struct.Struct = struct.Struct("<BII")  # command, address, length of the arguments
+    ZERO_FLAG: int = 0x01
+    ALIGNMENT: int = 4096
+
+    def __init__(
+        self,
+        memory: Buffer,
+        register_sizes: list[int],
+        registers: list[int],
+        zero_flag: bool,
+        contexts: list[CPUContext],
+        interrupts: list[Interrupt],
+    ):
+        # Callbacks of interrupts are not part of the snapshot
+        self.memory: Buffer = memory
+        self.register_sizes: list[int] = register_sizes
+        self.registers: list[int] = registers
+        self.zero_flag: bool = zero_flag
+        self.contexts: list[CPUContext] = contexts
+        self.interrupts: list[Interrupt] = interrupts
+        self.__mapping: Optional[mmap.mmap] = None
+
+    @classmethod
+    def __pack_interrupt(cls, interrupt: Interrupt) -> bytes:
+        return cls.INTERRUPT.pack(interrupt.interrupt_command, interrupt.memory_address, len(interrupt.arguments)) + interrupt.arguments # fmt: skip
+
+    @classmethod
+    def __unpack_interrupt(cls, data: Buffer, offset: int) -> tuple[Interrupt, int]:
+        interrupt_command, memory_address, length = cls.INTERRUPT.unpack_from(data, offset)
+        offset += cls.INTERRUPT.size
+        arguments: bytearray = bytearray(data[offset : offset + length])
+        return Interrupt(interrupt_command, memory_address, arguments), offset + length
+
+    def to_bytes(self) -> bytes:
+        parts: list[bytes] = []
+        for size_byte, value in zip(self.register_sizes, self.registers):
+            parts.append(self.REGISTER.pack(size_byte) + value.to_bytes(size_byte, "little"))
+        for context in self.contexts:
+            values: list[int] = [context.R0, context.R1, context.R2, context.R3, context.R4, context.R5, context.R6] # fmt: skip
+            parts += [value.to_bytes(size_byte, "little") for size_byte, value in zip(self.register_sizes, values)] # fmt: skip
+            parts.append(self.CONTEXT.pack(context.Z, context.interrupt is not None))
+            if context.interrupt is not None:
+                parts.append(self.__pack_interrupt(context.interrupt))
+        for interrupt in self.interrupts:
+            parts.append(self.__pack_interrupt(interrupt))
+        metadata: bytes = b"".join(parts)
+        memory_offset: int = -(-(self.HEADER.size + len(metadata)) // self.ALIGNMENT) * self.ALIGNMENT # fmt: skip
+        header: bytes = self.HEADER.pack(
+            self.MAGIC,
+            self.VERSION,
+            self.ZERO_FLAG if self.zero_flag else 0,
+            len(self.registers),
+            len(self.memory),
+            memory_offset,
+            len(self.contexts),
+            len(self.interrupts),
+        )
+        padding: bytes = bytes(memory_offset - len(header) - len(metadata))
+        return b"".join((header, metadata, padding, self.memory))
+
+    @classmethod
+    def from_buffer(cls, data: Buffer) -> "MachineSnapshot":
+        # The memory of the snapshot is a view into data, nothing is copied
+        if len(data) < cls.HEADER.size:
+            raise ValueError("Snapshot is too short")
+        magic, version, flags, number_of_registers, memory_size, memory_offset, number_of_contexts, number_of_interrupts = cls.HEADER.unpack_from(data) # fmt: skip
+        if magic != cls.MAGIC:
+            raise ValueError("Not a machine snapshot")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        if len(data) != memory_offset + memory_size:
+            raise ValueError("Snapshot is truncated")
+        offset: int = cls.HEADER.size
+        register_sizes: list[int] = []
+        registers: list[int] = []
+        for _ in range(number_of_registers):
+            (size_byte,) = cls.REGISTER.unpack_from(data, offset)
+            offset += cls.REGISTER.size
+            register_sizes.append(size_byte)
+            registers.append(int.from_bytes(data[offset : offset + size_byte], "little"))
+            offset += size_byte
+        contexts: list[CPUContext] = []
+        for _ in range(number_of_contexts):
+            values: list[int] = []
+            for size_byte in register_sizes:
+                values.append(int.from_bytes(data[offset : offset + size_byte], "little"))
+                offset += size_byte
+            zero_flag, has_interrupt = cls.CONTEXT.unpack_from(data, offset)
+            offset += cls.CONTEXT.size
+            interrupt: Optional[Interrupt] = None
+            if has_interrupt:
+                interrupt, offset = cls.__unpack_interrupt(data, offset)
+            contexts.append(CPUContext(*values, Z=bool(zero_flag), interrupt=interrupt))
+        interrupts: list[Interrupt] = []
+        for _ in range(number_of_interrupts):
+            interrupt, offset = cls.__unpack_interrupt(data, offset)
+            interrupts.append(interrupt)
+        return cls(
+            memoryview(data)[memory_offset : memory_offset + memory_size],
+            register_sizes,
+            registers,
+            bool(flags & cls.ZERO_FLAG),
+            contexts,
+            interrupts,
+        )
+
+    def write_file(self, path: str) -> None:
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def read_file(cls, path: str) -> "MachineSnapshot":
+        # The file is mapped, its memory is only read when it is restored. close() unmaps it
+        with open(path, "rb") as file:
+            mapping: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            snapshot: MachineSnapshot = cls.from_buffer(mapping)
+        except ValueError:
+            mapping.close()
+            raise
+        snapshot.__mapping = mapping
+        return snapshot
+
+    def close(self) -> None:
+        if self.__mapping is not None:
+            if isinstance(self.memory, memoryview):
+                self.memory.release()
+            self.__mapping.close()
+            self.__mapping = None
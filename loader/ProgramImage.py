@@ -0,0 +1,53 @@
+import struct
+import zlib
+from data_types import Buffer
+
+
+class ProgramImage:
+    # Binary program format: header (magic, version, load address, entry, code length, CRC32) + code
+    MAGIC: bytes = b"VCPU"
+    VERSION: int = 1
+    HEADER: struct.Struct = struct.Struct("<4sB3xIIII")
+
+    def __init__(self, load_address: int, entry: int, code: bytes):
+        self.load_address: int = load_address
+        self.entry: int = entry
+        self.code: bytes = code
+
+    @staticmethod
+    def is_image(data: Buffer) -> bool:
+        return bytes(data[: len(ProgramImage.MAGIC)]) == ProgramImage.MAGIC
+
+    @classmethod
+    def from_bytes(cls, data: Buffer) -> "ProgramImage":
+        if len(data) < cls.HEADER.size or not cls.is_image(data):
+            raise ValueError("Not a program image")
+        _, version, load_address, entry, length, checksum = cls.HEADER.unpack_from(data) # fmt: skip
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported program image version: {version}")
+        code: bytes = bytes(data[cls.HEADER.size : cls.HEADER.size + length])
+        if len(code) != length:
+            raise ValueError(f"Program image truncated: {len(code)} of {length} bytes")
+        if zlib.crc32(code) != checksum:
+            raise ValueError("Program image checksum mismatch")
+        return cls(load_address, entry, code)
+
+    def to_bytes(self) -> bytes:
+        header: bytes = self.HEADER.pack(
+            self.MAGIC,
+            self.VERSION,
+            self.load_address,
+            self.entry,
+            len(self.code),
+            zlib.crc32(self.code),
+        )
+        return header + self.code
+
+    @classmethod
+    def read_file(cls, path: str) -> "ProgramImage":
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+    def write_file(self, path: str) -> None:
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
@@ -0,0 +1,32 @@
+import os
+from typing import Optional
+from loader.ProgramImage import ProgramImage
+
+
+class ProgramLoader:
+    # Reads programs as hex text (.mem files: bytes separated by spaces and/or new lines),
+    # assembly source (.asm files, assembled with cache) or binary program images
+
+    @staticmethod
+    def parse_text(text: str) -> bytearray:
+        return bytearray(int(byte, 0) for byte in text.split())
+
+    @staticmethod
+    def read_file(path: str) -> bytearray:
+        with open(path, "r", encoding="utf-8") as file:
+            return ProgramLoader.parse_text(file.read())
+
+    @staticmethod
+    def load_file(path: str, address: Optional[int] = None) -> ProgramImage:
+        # address is the load address of hex text programs, images and assembly bring their own
+        if os.path.splitext(path)[1].lower() in (".asm", ".s"):
+            from assembler.Assembler import Assembler
+
+            return Assembler().assemble_file(path)
+        with open(path, "rb") as file:
+            data: bytes = file.read()
+        if ProgramImage.is_image(data):
+            return ProgramImage.from_bytes(data)
+        if address is None:
+            raise ValueError(f"Load address is required for hex text program {path}")
+        return ProgramImage(address, address, bytes(ProgramLoader.parse_text(data.decode("utf-8")))) # fmt: skip
@@ -0,0 +1,437 @@
+import time
+from typing import Any, Callable, Iterable, Optional, Union
+from base.Ram import Ram
+from base.Register import Register
+from CentralProcessingUnit import CentralProcessingUnit
+from central_processing_unit.ControlUnit import ControlUnit
+from data_types import DecodedInstruction, LockstepInstruction, RunResult
+from loader.ProgramImage import ProgramImage
+
+try:
+    import numpy as np
+except ImportError as e:  # Optional dependency, only needed for lockstep runs
+    raise ImportError("The lockstep engine needs NumPy (pip install numpy)") from e
+
+
+class LockstepEngine:
+    # Runs one program for many inputs at once. Every lane is a virtual machine with its own
+    # registers, Z flag and memory, stored as NumPy arrays (registers x lanes, lanes x memory).
+    # Each step executes the instruction at the lowest PC for all lanes at that PC as one array
+    # operation, lanes that branched elsewhere wait until the others reach them.
+    # Instructions are decoded once for all lanes that share them
+    __ALU_OPERATIONS: dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+        "ADD": lambda a, b: a + b,
+        "SUB": lambda a, b: a - b,
+        "MUL": lambda a, b: a * b,
+        "AND": lambda a, b: a & b,
+        "ORR": lambda a, b: a | b,
+        "XOR": lambda a, b: a ^ b,
+    }
+    __RUNNING: int = 0
+    __STATUS_NAMES: list[str] = ["running", "halted", "returned", "idle", "cycle_limit", "timeout", "error"] # fmt: skip
+
+    def __init__(self, memory_size_byte: int = 1024, **cpu_options: Any):
+        # Instruction set, operand types and register widths are the ones of a CPU with cpu_options
+        if cpu_options.get("program_limit") is not None:
+            raise ValueError("The lockstep engine does not support an MMU (program_limit)")
+        cpu: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte, **{**cpu_options, "use_block_compiler": False}) # fmt: skip
+        self.memory_size_byte: int = memory_size_byte
+        # Instructions are decoded by the CPU's control unit from a copy of the code in its memory
+        self.__control_unit: ControlUnit = cpu.get_control_unit()
+        self.__decode_memory: Ram = cpu.get_memory()
+        registers: list[Register] = list(cpu.get_register_set().values())
+        if any(register.size_byte > 4 for register in registers):
+            raise ValueError("The lockstep engine supports registers of up to 4 bytes")
+        self.__register_codes: dict[Register, int] = {
+            register: code for code, register in cpu.get_register_set().items()
+        }
+        self.__register_names: list[str] = [register.name for register in registers]
+        self.__register_sizes: list[int] = [register.size_byte for register in registers]
+        self.__masks: list[int] = [register.mask for register in registers]
+        self.__max_instruction_length: int = self.__control_unit.max_instruction_length
+        # Messages of the exceptions the CPU raises, they differ between Python versions
+        self.__zero_division_errors: dict[str, str] = {
+            "DIV": self.__error_message(lambda: 1 // 0),
+            "MOD": self.__error_message(lambda: 1 % 0),
+        }
+        self.__handlers: dict[str, Callable[[LockstepInstruction, np.ndarray], None]] = {
+            **{mnemonic: self.__execute_alu for mnemonic in self.__ALU_OPERATIONS},
+            "DIV": self.__execute_division,
+            "MOD": self.__execute_division,
+            "LSL": self.__execute_shift,
+            "LSR": self.__execute_shift,
+            "NOT": self.__execute_not,
+            "CMP": self.__execute_compare,
+            "MOV": self.__execute_move,
+            "B": self.__execute_branch,
+            "BEQ": self.__execute_branch,
+            "BNE": self.__execute_branch,
+            "BL": self.__execute_branch,
+            "BX": self.__execute_branch_exchange,
+            "LDR": self.__execute_load,
+            "STR": self.__execute_store,
+            "CAS": self.__execute_compare_and_swap,
+            "SWP": self.__execute_swap,
+            "LDADD": self.__execute_load_add,
+            "MCPY": self.__execute_block,
+            "MSET": self.__execute_block,
+            "MCMP": self.__execute_block,
+            "INP": self.__execute_input,
+            "OUT": self.__execute_output,
+            "OUTC": self.__execute_output,
+            "NOP": lambda instruction, lanes: None,
+            "HLT": lambda instruction, lanes: self.__stop(lanes, "halted"),
+            "IRET": lambda instruction, lanes: self.__stop(lanes, "returned"),
+            "WFI": lambda instruction, lanes: self.__stop(lanes, "idle"),
+        }
+
+    @staticmethod
+    def __error_message(operation: Callable[[], object]) -> str:
+        try:
+            operation()
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        raise ValueError("Operation did not raise an exception")
+
+    def __decode(self, window: bytes, address: int) -> LockstepInstruction:
+        # Same decoding and errors as the ControlUnit, window holds the memory from address on
+        self.__decode_memory.write(address, window)
+        instruction: DecodedInstruction = self.__control_unit.decode(address)
+        operands: list[tuple[bool, int]] = [
+            (True, self.__register_codes[operand]) if isinstance(operand, Register) else (False, operand) # fmt: skip
+            for operand in instruction.operands
+        ]
+        mnemonic: str = CentralProcessingUnit.INSTRUCTIONS[instruction.opcode][0]
+        return LockstepInstruction(mnemonic, operands, instruction.length, instruction.next_address, instruction.memory_byte) # fmt: skip
+
+    # State of the current run
+    def __value(self, operand: tuple[bool, int], lanes: np.ndarray) -> np.ndarray:
+        is_register, value = operand
+        if is_register:
+            return self.__registers[value, lanes]
+        return np.full(len(lanes), value, dtype=np.int64)
+
+    def __set_register(self, code: int, lanes: np.ndarray, values: np.ndarray) -> None:
+        self.__registers[code, lanes] = values & self.__masks[code]
+
+    def __stop(self, lanes: np.ndarray, status: str) -> None:
+        self.__status[lanes] = self.__STATUS_NAMES.index(status)
+
+    def __fail(self, lanes: np.ndarray, messages: Union[str, Iterable[str]]) -> None:
+        # Failed lanes do not count the instruction, like an instruction that raises in the CPU
+        self.__status[lanes] = self.__STATUS_NAMES.index("error")
+        self.__cycles[lanes] -= 1
+        if isinstance(messages, str):
+            messages = [messages] * len(lanes)
+        for lane, message in zip(lanes.tolist(), messages):
+            self.__errors[lane] = message
+
+    def __execute_alu(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        destination, operand1, operand2 = instruction.operands
+        result = self.__ALU_OPERATIONS[instruction.mnemonic](self.__value(operand1, lanes), self.__value(operand2, lanes)) # fmt: skip
+        self.__set_register(destination[1], lanes, result)
+        self.__zero_flags[lanes] = result == 0
+
+    def __execute_division(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        destination, operand1, operand2 = instruction.operands
+        divisor = self.__value(operand2, lanes)
+        by_zero = divisor == 0
+        if by_zero.any():
+            self.__fail(lanes[by_zero], self.__zero_division_errors[instruction.mnemonic])
+            lanes, divisor = lanes[~by_zero], divisor[~by_zero]
+        dividend = self.__value(operand1, lanes)
+        result = dividend // divisor if instruction.mnemonic == "DIV" else dividend % divisor # fmt: skip
+        self.__set_register(destination[1], lanes, result)
+        self.__zero_flags[lanes] = result == 0
+
+    def __execute_shift(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        # Shifts of 64 bits or more are not defined for NumPy integers, their result is known
+        destination, operand, shift = instruction.operands
+        value = self.__value(operand, lanes)
+        distance = self.__value(shift, lanes)
+        limited = np.minimum(distance, 63)
+        if instruction.mnemonic == "LSL":
+            result = np.where(distance < 64, value << limited, 0)
+            is_zero = value == 0  # Python ints do not overflow
+        else:
+            result = np.where(distance < 64, value >> limited, 0)
+            is_zero = result == 0
+        self.__set_register(destination[1], lanes, result)
+        self.__zero_flags[lanes] = is_zero
+
+    def __execute_not(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        destination, operand = instruction.operands
+        self.__set_register(destination[1], lanes, ~self.__value(operand, lanes))
+        self.__zero_flags[lanes] = False  # ~x of a non-negative x is negative
+
+    def __execute_compare(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        operand1, operand2 = instruction.operands
+        self.__zero_flags[lanes] = self.__value(operand1, lanes) == self.__value(operand2, lanes) # fmt: skip
+
+    def __execute_move(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        destination, value = instruction.operands
+        self.__set_register(destination[1], lanes, self.__value(value, lanes))
+
+    def __execute_branch(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        if instruction.mnemonic == "BEQ":
+            lanes = lanes[self.__zero_flags[lanes]]
+        elif instruction.mnemonic == "BNE":
+            lanes = lanes[~self.__zero_flags[lanes]]
+        elif instruction.mnemonic == "BL":
+            self.__set_register(0x03, lanes, self.__registers[0x05, lanes])
+        target = self.__value(instruction.operands[0], lanes) + self.__registers[0x06, lanes] # fmt: skip
+        self.__set_register(0x05, lanes, target)
+
+    def __execute_branch_exchange(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        self.__set_register(0x05, lanes, self.__registers[0x03, lanes])
+
+    def __check_bounds(self, lanes: np.ndarray, addresses: np.ndarray, lengths: np.ndarray) -> np.ndarray: # fmt: skip
+        # Fails lanes that access memory out of bounds, returns the mask of the others
+        size: int = self.memory_size_byte
+        outside = (addresses >= size) | (addresses + lengths > size)
+        if outside.any():
+            self.__fail(
+                lanes[outside],
+                [
+                    f"ValueError: Address {address} is out of bounds" if address >= size
+                    else f"ValueError: Data of {length} bytes at {address} is out of bounds"
+                    for address, length in zip(addresses[outside].tolist(), lengths[outside].tolist())
+                ],
+            )  # fmt: skip
+        return ~outside
+
+    def __read_uint(self, lanes: np.ndarray, addresses: np.ndarray, size_byte: int) -> np.ndarray: # fmt: skip
+        value = np.zeros(len(lanes), dtype=np.int64)
+        for index in range(size_byte):
+            value |= self.__memory[lanes, addresses + index].astype(np.int64) << (8 * index)
+        return value
+
+    def __write_uint(self, lanes: np.ndarray, addresses: np.ndarray, values: np.ndarray, lengths: np.ndarray) -> None: # fmt: skip
+        for index in range(int(lengths.max(initial=0))):
+            selected = lengths > index
+            self.__memory[lanes[selected], addresses[selected] + index] = (values[selected] >> (8 * index)) & 0xFF # fmt: skip
+
+    def __execute_load(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        destination, address = instruction.operands
+        size_byte: int = self.__register_sizes[destination[1]]
+        addresses = self.__value(address, lanes)
+        inside = self.__check_bounds(lanes, addresses, np.full(len(lanes), size_byte))
+        lanes, addresses = lanes[inside], addresses[inside]
+        self.__set_register(destination[1], lanes, self.__read_uint(lanes, addresses, size_byte)) # fmt: skip
+
+    def __execute_store(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        # Values are stored with as many bytes as they need, like Ram.write_uint without size
+        source, address = instruction.operands
+        value = self.__value(source, lanes)
+        addresses = self.__value(address, lanes)
+        lengths = 1 + (value > 0xFF) + (value > 0xFFFF) + (value > 0xFFFFFF)
+        inside = self.__check_bounds(lanes, addresses, lengths)
+        self.__write_uint(lanes[inside], addresses[inside], value[inside], lengths[inside])
+
+    # Atomic operations, every lane has its own memory so they are plain memory accesses
+    def __execute_compare_and_swap(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        expected, new, address = instruction.operands
+        size_byte: int = self.__register_sizes[expected[1]]
+        addresses = self.__value(address, lanes)
+        inside = self.__check_bounds(lanes, addresses, np.full(len(lanes), size_byte))
+        lanes, addresses = lanes[inside], addresses[inside]
+        current = self.__read_uint(lanes, addresses, size_byte)
+        equal = current == self.__value(expected, lanes)
+        new_value = self.__value(new, lanes)
+        too_wide = equal & (new_value >> (8 * size_byte) != 0)
+        if too_wide.any():
+            self.__fail(lanes[too_wide], self.__error_message(lambda: (256).to_bytes(1, byteorder="little"))) # fmt: skip
+        swapped = equal & ~too_wide
+        self.__write_uint(lanes[swapped], addresses[swapped], new_value[swapped], np.full(int(swapped.sum()), size_byte)) # fmt: skip
+        self.__zero_flags[lanes[swapped]] = True
+        self.__set_register(expected[1], lanes[~equal], current[~equal])
+        self.__zero_flags[lanes[~equal]] = False
+
+    def __execute_swap(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        register, address = instruction.operands
+        size_byte: int = self.__register_sizes[register[1]]
+        addresses = self.__value(address, lanes)
+        inside = self.__check_bounds(lanes, addresses, np.full(len(lanes), size_byte))
+        lanes, addresses = lanes[inside], addresses[inside]
+        current = self.__read_uint(lanes, addresses, size_byte)
+        self.__write_uint(lanes, addresses, self.__value(register, lanes), np.full(len(lanes), size_byte)) # fmt: skip
+        self.__set_register(register[1], lanes, current)
+
+    def __execute_load_add(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        destination, value, address = instruction.operands
+        size_byte: int = self.__register_sizes[destination[1]]
+        addresses = self.__value(address, lanes)
+        inside = self.__check_bounds(lanes, addresses, np.full(len(lanes), size_byte))
+        lanes, addresses = lanes[inside], addresses[inside]
+        current = self.__read_uint(lanes, addresses, size_byte)
+        new_value = (current + self.__value(value, lanes)) & self.__masks[destination[1]]
+        self.__write_uint(lanes, addresses, new_value, np.full(len(lanes), size_byte))
+        self.__set_register(destination[1], lanes, current)
+        self.__zero_flags[lanes] = new_value == 0
+
+    # Block operations, lengths differ between lanes so each lane is one slice operation
+    def __execute_block(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        first, second, length = instruction.operands
+        lengths = self.__value(length, lanes)
+        if instruction.mnemonic == "MCMP":
+            self.__zero_flags[lanes[lengths == 0]] = True
+        lanes, lengths = lanes[lengths > 0], lengths[lengths > 0]  # Empty ranges are not checked
+        first_addresses = self.__value(first, lanes)
+        second_addresses = self.__value(second, lanes)
+        if instruction.mnemonic == "MCPY":  # Source is checked before the destination
+            inside = self.__check_bounds(lanes, second_addresses, lengths)
+            lanes, lengths, first_addresses, second_addresses = lanes[inside], lengths[inside], first_addresses[inside], second_addresses[inside] # fmt: skip
+        inside = self.__check_bounds(lanes, first_addresses, lengths)
+        lanes, lengths, first_addresses, second_addresses = lanes[inside], lengths[inside], first_addresses[inside], second_addresses[inside] # fmt: skip
+        if instruction.mnemonic == "MCMP":
+            inside = self.__check_bounds(lanes, second_addresses, lengths)
+            lanes, lengths, first_addresses, second_addresses = lanes[inside], lengths[inside], first_addresses[inside], second_addresses[inside] # fmt: skip
+        memory = self.__memory
+        for lane, a, b, n in zip(lanes.tolist(), first_addresses.tolist(), second_addresses.tolist(), lengths.tolist()): # fmt: skip
+            if instruction.mnemonic == "MCPY":
+                memory[lane, a : a + n] = memory[lane, b : b + n]  # NumPy copies overlapping ranges like memmove
+            elif instruction.mnemonic == "MSET":
+                memory[lane, a : a + n] = b & 0xFF
+            else:
+                self.__zero_flags[lane] = np.array_equal(memory[lane, a : a + n], memory[lane, b : b + n]) # fmt: skip
+
+    def __execute_input(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None:
+        destination = instruction.operands[0]
+        positions = self.__input_positions[lanes]
+        exhausted = positions >= self.__input_counts[lanes]
+        if exhausted.any():
+            self.__fail(lanes[exhausted], "EOFError: No more input for INP")
+            lanes, positions = lanes[~exhausted], positions[~exhausted]
+        self.__input_positions[lanes] += 1
+        if not destination[0]:  # The CPU reads the line before it fails on the value
+            self.__fail(lanes, "AttributeError: 'int' object has no attribute 'set'")
+            return
+        self.__set_register(destination[1], lanes, self.__inputs[lanes, positions])
+
+    def __execute_output(self, instruction: LockstepInstruction, lanes: np.ndarray) -> None: # fmt: skip
+        if not instruction.operands[0][0]:
+            self.__fail(lanes, "AttributeError: 'int' object has no attribute 'get'")
+            return
+        value = self.__value(instruction.operands[0], lanes)
+        self.__set_register(0x02, lanes, value)
+        if instruction.mnemonic == "OUTC":
+            invalid = value > 0x10FFFF
+            if invalid.any():
+                self.__fail(lanes[invalid], self.__error_message(lambda: chr(0x110000)))
+                lanes, value = lanes[~invalid], value[~invalid]
+        # Output is put together per lane after the run
+        self.__outputs.append((instruction.mnemonic == "OUTC", lanes, value))
+
+    @staticmethod
+    def __parse_input(text: str) -> int:
+        # Like INP: an integer or the text as big-endian ASCII bytes, cut to 4 bytes (the widest register)
+        try:
+            value: int = int(text)
+        except ValueError:
+            value = int.from_bytes(text.encode("ascii"), byteorder="big")
+        return value & 0xFFFFFFFF
+
+    def run(
+        self,
+        program: Union[bytearray, ProgramImage],
+        inputs: list[list[str]],
+        entry: Optional[int] = None,
+        max_cycles: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> list[RunResult]:
+        # One lane per input list, each result is what CentralProcessingUnit.run returns for that
+        # input on a CPU with zeroed memory. wall_time is the time of the whole run
+        if isinstance(program, ProgramImage):
+            load_address: int = program.load_address
+            code: bytes = program.code
+            entry = program.entry if entry is None else entry
+        else:
+            if entry is None:
+                raise ValueError("Entry address is required unless a program image is run")
+            load_address, code = entry, bytes(program)
+        if load_address + len(code) > self.memory_size_byte:
+            raise ValueError("Program does not fit into the memory")
+        number_of_lanes: int = len(inputs)
+        self.__memory: np.ndarray = np.zeros((number_of_lanes, self.memory_size_byte), dtype=np.uint8) # fmt: skip
+        self.__memory[:, load_address : load_address + len(code)] = np.frombuffer(code, dtype=np.uint8) # fmt: skip
+        self.__registers: np.ndarray = np.zeros((len(self.__register_names), number_of_lanes), dtype=np.int64) # fmt: skip
+        self.__registers[0x05] = entry
+        self.__registers[0x06] = load_address
+        self.__zero_flags: np.ndarray = np.zeros(number_of_lanes, dtype=bool)
+        self.__status: np.ndarray = np.zeros(number_of_lanes, dtype=np.int8)
+        self.__cycles: np.ndarray = np.zeros(number_of_lanes, dtype=np.int64)
+        self.__errors: dict[int, str] = {}
+        self.__outputs: list[tuple[bool, np.ndarray, np.ndarray]] = []
+        self.__input_counts: np.ndarray = np.array([len(lines) for lines in inputs], dtype=np.int64) # fmt: skip
+        self.__inputs: np.ndarray = np.zeros((number_of_lanes, max(self.__input_counts, default=0) + 1), dtype=np.int64) # fmt: skip
+        for lane, lines in enumerate(inputs):
+            self.__inputs[lane, : len(lines)] = [self.__parse_input(line) for line in lines]
+        self.__input_positions: np.ndarray = np.zeros(number_of_lanes, dtype=np.int64)
+
+        # Decoded instructions by address and memory at the address, errors as their message
+        decoded: dict[tuple[int, bytes], Union[LockstepInstruction, str]] = {}
+        no_lane: int = np.iinfo(np.int64).max
+        start_time: float = time.perf_counter()
+        deadline: Optional[float] = None if timeout is None else start_time + timeout
+        if max_cycles is not None and max_cycles <= 0:
+            self.__stop(np.arange(number_of_lanes), "cycle_limit")
+        while True:
+            running = self.__status == self.__RUNNING
+            if not running.any():
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                self.__stop(np.flatnonzero(running), "timeout")
+                break
+            program_counters = np.where(running, self.__registers[0x05], no_lane)
+            address: int = int(program_counters.min())
+            lanes = np.flatnonzero(program_counters == address)
+            # The instruction is decoded from the memory of the first lane, lanes whose memory
+            # differs there (self-modifying code) wait for the next step
+            window: bytes = self.__memory[lanes[0], address : address + self.__max_instruction_length].tobytes() # fmt: skip
+            instruction: Union[LockstepInstruction, str, None] = decoded.get((address, window))
+            if instruction is None:
+                try:
+                    instruction = self.__decode(window, address)
+                except ValueError as e:
+                    instruction = f"ValueError: {e}"
+                decoded[(address, window)] = instruction
+            length: int = len(window) if isinstance(instruction, str) else instruction.length
+            if len(lanes) > 1:
+                code_bytes = np.frombuffer(window[:length], dtype=np.uint8)
+                lanes = lanes[(self.__memory[lanes, address : address + length] == code_bytes).all(axis=1)] # fmt: skip
+            self.__cycles[lanes] += 1
+            if isinstance(instruction, str):
+                self.__fail(lanes, instruction)
+                continue
+            self.__registers[0x04, lanes] = instruction.memory_byte
+            self.__registers[0x05, lanes] = instruction.next_address & self.__masks[0x05]
+            handler = self.__handlers.get(instruction.mnemonic)
+            if handler is None:
+                self.__fail(lanes, f"ValueError: {instruction.mnemonic} is not supported by the lockstep engine") # fmt: skip
+                continue
+            handler(instruction, lanes)
+            if max_cycles is not None:
+                self.__stop(lanes[(self.__cycles[lanes] >= max_cycles) & (self.__status[lanes] == self.__RUNNING)], "cycle_limit") # fmt: skip
+        wall_time: float = time.perf_counter() - start_time
+        return self.__collect_results(number_of_lanes, wall_time)
+
+    def __collect_results(self, number_of_lanes: int, wall_time: float) -> list[RunResult]:
+        outputs: list[list[str]] = [[] for _ in range(number_of_lanes)]
+        for is_character, lanes, values in self.__outputs:
+            for lane, value in zip(lanes.tolist(), values.tolist()):
+                outputs[lane].append(chr(value) if is_character else f"{value}\n")
+        registers: list[list[int]] = self.__registers.T.tolist()
+        zero_flags: list[bool] = self.__zero_flags.tolist()
+        cycles: list[int] = self.__cycles.tolist()
+        return [
+            RunResult(
+                status=self.__STATUS_NAMES[status],
+                registers=dict(zip(self.__register_names, registers[lane])),
+                zero_flag=zero_flags[lane],
+                cycles=cycles[lane],
+                wall_time=wall_time,
+                output="".join(outputs[lane]),
+                error=self.__errors.get(lane),
+            )
+            for lane, status in enumerate(self.__status.tolist())
+        ]
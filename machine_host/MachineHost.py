@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from collections import deque
+from functools import partial
+from typing import Any, Optional
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import ExecutionStatus
+from interrupt_controller.InterruptController import InterruptController
+from interrupt_controller.InterruptServer import InterruptServer
+from IO_controller.InputDevice import IteratorInput
+
+
+class MachineHost:
+    # Many independent machines in one process, each one a CPU with its own memory, registers and
+    # interrupt queue. They take turns of quantum instructions on the event loop of one interrupt server
+    # that addresses them by machine ID. Idle machines are not scheduled until an interrupt arrives
+    SYSTEM_LOOP: bytes = bytes([0x19])  # WFI at 0x0000
+
+    def __init__(self, number_of_machines: int, quantum: int = 10000, **cpu_options: Any):
+        # cpu_options are passed to every CPU, machines without input device get no input (INP fails)
+        if number_of_machines < 1:
+            raise ValueError("A host needs at least one machine")
+        if quantum < 1:
+            raise ValueError("Host quantum has to be at least 1 instruction")
+        self.quantum: int = quantum
+        self.machines: list[CentralProcessingUnit] = []
+        self.__interrupt_controllers: list[InterruptController] = []
+        # Machines with work in the order they run next, a machine is in it at most once
+        self.__ready: deque[int] = deque()
+        self.__is_ready: list[bool] = [False] * number_of_machines
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__loop_thread: Optional[int] = None
+        self.__wake: Optional[asyncio.Event] = None
+        for machine_id in range(number_of_machines):
+            options: dict[str, Any] = {"input_device": IteratorInput(()), **cpu_options}
+            machine: CentralProcessingUnit = CentralProcessingUnit(**options)
+            machine.load_program(0x00, bytearray(self.SYSTEM_LOOP))
+            machine.start_sliced(0x00)
+            interrupt_controller: InterruptController = machine.get_interrupt_controller()
+            interrupt_controller.on_interrupt_queued = partial(self.__notify, machine_id)
+            self.machines.append(machine)
+            self.__interrupt_controllers.append(interrupt_controller)
+
+    def __notify(self, machine_id: int) -> None:
+        # An interrupt was queued for the machine, from any thread
+        if self.__loop is None:
+            return  # Before start every machine runs once anyway
+        if threading.get_ident() == self.__loop_thread:
+            self.__make_ready(machine_id)
+        else:
+            self.__loop.call_soon_threadsafe(self.__make_ready, machine_id)
+
+    def __make_ready(self, machine_id: int) -> None:
+        if self.__is_ready[machine_id]:
+            return
+        self.__is_ready[machine_id] = True
+        self.__ready.append(machine_id)
+        if self.__wake is not None:
+            self.__wake.set()
+
+    def __run_slice(self, machine_id: int) -> None:
+        machine: CentralProcessingUnit = self.machines[machine_id]
+        try:
+            status: Optional[ExecutionStatus] = machine.run_slice(self.quantum)
+        except Exception as e:
+            # Only the failing machine stops its programs, the others keep running
+            error: str = f"{type(e).__name__}: {e}"
+            print(f"Machine {machine_id}: {error}")
+            machine.abort(error)
+            status = None
+        if status == ExecutionStatus.RETURNED:
+            machine.start_sliced(0x00)  # IRET of the system loop, the machine starts over
+        if status is not None and not self.__interrupt_controllers[machine_id].has_interrupt:
+            self.__is_ready[machine_id] = False
+        else:
+            self.__ready.append(machine_id)
+
+    async def __run_machines(self) -> None:
+        # Round robin over the machines with work, the server handles requests between the slices
+        self.__loop = asyncio.get_running_loop()
+        self.__loop_thread = threading.get_ident()
+        self.__wake = asyncio.Event()
+        for machine_id in range(len(self.machines)):
+            self.__make_ready(machine_id)
+        while True:
+            if not self.__ready:
+                self.__wake.clear()
+                await self.__wake.wait()
+                continue
+            self.__run_slice(self.__ready.popleft())
+            await asyncio.sleep(0)
+
+    @property
+    def ready_machines(self) -> int:
+        return len(self.__ready)
+
+    def start(self, host: str = "localhost", port: int = 9999) -> None:
+        # Serves until the process ends
+        print(f"Hosting {len(self.machines)} machines")
+        InterruptServer(self.__interrupt_controllers, host, port).run(self.__run_machines()) # fmt: skip
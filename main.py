@@ -1,19 +1,49 @@
+import argparse
 from CentralProcessingUnit import CentralProcessingUnit
+from loader.MachineSnapshot import MachineSnapshot
+from machine_host.MachineHost import MachineHost
+from multi_core.MultiCoreSystem import MultiCoreSystem
 
 
 def main() -> None:
-    cpu: CentralProcessingUnit = CentralProcessingUnit()
+    parser = argparse.ArgumentParser(description="Start the CPU and wait for interrupts")
+    parser.add_argument("--cores", type=int, default=1, help="Number of cores sharing the memory, each in its own process") # fmt: skip
+    parser.add_argument("--machines", type=int, help="Host this many independent machines in this process, addressed by machine ID") # fmt: skip
+    parser.add_argument("--quantum", type=int, default=10000, help="Instructions a machine of a host runs before the next one") # fmt: skip
+    parser.add_argument("--port", type=int, default=9999, help="Port of the interrupt listener") # fmt: skip
+    parser.add_argument("--memory", type=lambda value: int(value, 0), default=1024, help="Memory size in bytes") # fmt: skip
+    parser.add_argument("--page-size", type=lambda value: int(value, 0), help="Allocate the memory in pages of this size when they are first written") # fmt: skip
+    parser.add_argument("--memory-file", help="Map the memory from this file, shared with every process that maps it") # fmt: skip
+    parser.add_argument("--rom", action="append", default=[], metavar="ADDRESS:FILE", help="Map a binary file read-only at a page aligned address (requires --page-size)") # fmt: skip
+    parser.add_argument("--snapshot", help="Boot from a machine snapshot (memory size from the snapshot)") # fmt: skip
+    args = parser.parse_args()
+
+    if args.machines is not None:
+        MachineHost(args.machines, args.quantum, memory_size_byte=args.memory, page_size=args.page_size).start(port=args.port) # fmt: skip
+        return
+    if args.cores > 1:
+        for option, value in (("--page-size", args.page_size), ("--memory-file", args.memory_file), ("--rom", args.rom), ("--snapshot", args.snapshot)): # fmt: skip
+            if value:
+                parser.error(f"{option} is not supported with --cores")
+        MultiCoreSystem(args.cores, memory_size_byte=args.memory).start(port=args.port)
+        return
+    if args.snapshot is not None:
+        snapshot: MachineSnapshot = MachineSnapshot.read_file(args.snapshot)
+        cpu: CentralProcessingUnit = CentralProcessingUnit.from_snapshot(snapshot)
+        snapshot.close()
+    else:
+        cpu = CentralProcessingUnit(memory_size_byte=args.memory, page_size=args.page_size, memory_file=args.memory_file) # fmt: skip
+    for rom in args.rom:
+        address, path = rom.split(":", 1)
+        cpu.map_image(int(address, 0), path)
     system_loop = bytearray(
         [
-            # System loop
-            0x05,  # PC: 0x0000: B
-            0x01,  # PC: 0x0001: last_operand_type (value)
-            0x00,  # PC: 0x0002: second byte of address (system_loop)
-            0x00,  # PC: 0x0003: first byte of address (system_loop)
+            # System loop, the CPU idles until an interrupt arrives
+            0x19,  # PC: 0x0000: WFI
         ]
     )
     cpu.load_program(0x00, system_loop)
-    cpu.start()
+    cpu.start(port=args.port)
 
 
 if __name__ == "__main__":
@@ -1,21 +1,112 @@
-from typing import Union
+import threading
+from contextlib import AbstractContextManager
+from typing import Optional, Union
 from base.Flag import Flag
 from base.Register import Register
 from base.Ram import Ram
+from memory_controller.MemoryManagementUnit import MemoryManagementUnit
 
 
 class MemoryController:
-    def __init__(self, zero_flag: Flag, memory: Ram):
-        self.memory: Ram = memory
+    def __init__(
+        self,
+        zero_flag: Flag,
+        memory: Union[Ram, MemoryManagementUnit],
+        atomic_lock: Optional[AbstractContextManager] = None,
+    ):
+        # With an MMU data addresses are relative to the program base
+        self.memory: Union[Ram, MemoryManagementUnit] = memory
         self.Z: Flag = zero_flag
+        # Held by the atomic instructions, shared by all cores that share the memory
+        self.atomic_lock: AbstractContextManager = atomic_lock or threading.Lock()
 
     def asm_LDR(self, to_register: Register, address: Union[Register, int]) -> None:
         if isinstance(address, Register):
             address = address.get()
-        data: int = self.memory.get_with_address(address, len(to_register.value))
+        data: int = self.memory.read_uint(address, to_register.size_byte)
         to_register.set(data)
 
     def asm_STR(self, from_register: Register, address: Union[Register, int]) -> None:
         if isinstance(address, Register):
             address = address.get()
-        self.memory.set_with_address(address, from_register.get())
+        self.memory.write_uint(address, from_register.get())
+
+    # Block operations, each one is a single slice operation on the memory
+    def asm_MCPY(
+        self,
+        destination_register: Register,
+        source_register: Register,
+        length: Union[Register, int],
+    ) -> None:
+        if isinstance(length, Register):
+            length = length.get()
+        self.memory.copy(destination_register.get(), source_register.get(), length)
+
+    def asm_MSET(
+        self,
+        destination_register: Register,
+        value_register: Register,
+        length: Union[Register, int],
+    ) -> None:
+        # Fills length bytes with the lowest byte of value_register
+        if isinstance(length, Register):
+            length = length.get()
+        self.memory.fill(destination_register.get(), length, value_register.get() & 0xFF) # fmt: skip
+
+    def asm_MCMP(
+        self,
+        address_a_register: Register,
+        address_b_register: Register,
+        length: Union[Register, int],
+    ) -> None:
+        # Z is set if both ranges are equal
+        if isinstance(length, Register):
+            length = length.get()
+        self.Z.isFlagSet = self.memory.compare(address_a_register.get(), address_b_register.get(), length) # fmt: skip
+
+    # Atomic operations, they access the memory with the width of the register
+    def asm_CAS(
+        self,
+        expected_register: Register,
+        new_register: Register,
+        address: Union[Register, int],
+    ) -> None:
+        # Stores new_register if the memory holds expected_register (Z set),
+        # otherwise loads the current value into expected_register (Z cleared)
+        if isinstance(address, Register):
+            address = address.get()
+        size_byte: int = expected_register.size_byte
+        with self.atomic_lock:
+            current: int = self.memory.read_uint(address, size_byte)
+            if current == expected_register.get():
+                self.memory.write_uint(address, new_register.get(), size_byte)
+                self.Z.isFlagSet = True
+                return
+        expected_register.set(current)
+        self.Z.isFlagSet = False
+
+    def asm_SWP(self, register: Register, address: Union[Register, int]) -> None:
+        if isinstance(address, Register):
+            address = address.get()
+        size_byte: int = register.size_byte
+        with self.atomic_lock:
+            current: int = self.memory.read_uint(address, size_byte)
+            self.memory.write_uint(address, register.get(), size_byte)
+        register.set(current)
+
+    def asm_LDADD(
+        self,
+        to_register: Register,
+        value_register: Register,
+        address: Union[Register, int],
+    ) -> None:
+        # Loads the old value and adds value_register to the memory, Z if the new value is zero
+        if isinstance(address, Register):
+            address = address.get()
+        size_byte: int = to_register.size_byte
+        with self.atomic_lock:
+            current: int = self.memory.read_uint(address, size_byte)
+            new_value: int = (current + value_register.get()) & to_register.mask
+            self.memory.write_uint(address, new_value, size_byte)
+        to_register.set(current)
+        self.Z.set_is_zero(new_value)
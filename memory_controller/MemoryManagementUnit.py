@@ -0,0 +1,43 @@
+from typing import Optional
+from base.Ram import Ram
+from base.Register import Register
+from data_types import MemoryFault, PageProtection
+
+
+class MemoryManagementUnit:
+    # Base/limit translation of data accesses (LDR, STR, atomic and block instructions): addresses
+    # are relative to the program base (R6) and the accessed range has to end within the limit.
+    # Programs are isolated from each other and can be loaded anywhere, branches are relative to R6 already
+    def __init__(self, memory: Ram, base_register: Register, limit: int):
+        self.memory: Ram = memory
+        self.__base_register: Register = base_register
+        self.limit: int = limit
+
+    def translate(self, address: int, length: int, access: PageProtection) -> int:
+        if address + length > self.limit:
+            raise MemoryFault(address, access)
+        return self.__base_register.get() + address
+
+    def read_uint(self, address: int, size_byte: int) -> int:
+        return self.memory.read_uint(self.translate(address, size_byte, PageProtection.READ), size_byte) # fmt: skip
+
+    def write_uint(self, address: int, data: int, size_byte: Optional[int] = None) -> None:
+        length: int = size_byte or (data.bit_length() + 7) // 8 or 1
+        self.memory.write_uint(self.translate(address, length, PageProtection.WRITE), data, size_byte) # fmt: skip
+
+    def fill(self, address: int, length: int, value: int = 0) -> None:
+        if length == 0:
+            return
+        self.memory.fill(self.translate(address, length, PageProtection.WRITE), length, value) # fmt: skip
+
+    def copy(self, destination: int, source: int, length: int) -> None:
+        if length == 0:
+            return
+        source = self.translate(source, length, PageProtection.READ)
+        self.memory.copy(self.translate(destination, length, PageProtection.WRITE), source, length) # fmt: skip
+
+    def compare(self, address_a: int, address_b: int, length: int) -> bool:
+        if length == 0:
+            return True
+        address_a = self.translate(address_a, length, PageProtection.READ)
+        return self.memory.compare(address_a, self.translate(address_b, length, PageProtection.READ), length) # fmt: skip
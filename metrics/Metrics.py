@@ -0,0 +1,91 @@
+import json
+import math
+import time
+from collections import deque
+from typing import Any
+
+
+class Metrics:
+    # Counters of a running CPU, cheap enough to be always on. Reported by interrupt command 0x03,
+    # reports do not change the metrics, every reader sees the same values.
+    # Interrupt latency is the time from being queued until the CPU takes the interrupt,
+    # percentiles are over the last LATENCY_SAMPLES interrupts
+    LATENCY_SAMPLES: int = 1024
+    PERCENTILES: tuple[int, ...] = (50, 90, 99)
+    PREFIX: str = "vcpu_"
+
+    def __init__(self):
+        self.start_time: float = time.perf_counter()
+        self.instructions: int = 0
+        self.interrupts: int = 0
+        self.latency_sum: float = 0.0
+        self.idle_time: float = 0.0  # Seconds spent waiting for interrupts
+        self.__latencies: deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+
+    def record_interrupt(self, latency: float) -> None:
+        self.interrupts += 1
+        self.latency_sum += latency
+        self.__latencies.append(latency)
+
+    def to_dict(self, pending_interrupts: int, context_depth: int) -> dict[str, Any]:
+        now: float = time.perf_counter()
+        uptime: float = now - self.start_time
+        latencies: list[float] = sorted(self.__latencies)
+        return {
+            "uptime_seconds": uptime,
+            "instructions_retired": self.instructions,
+            # Average since the start, scrapers get the current rate from the counter
+            "instructions_per_second": self.instructions / uptime if uptime > 0 else 0.0,
+            "interrupts_serviced": self.interrupts,
+            "pending_interrupts": pending_interrupts,
+            "interrupt_latency_seconds": {
+                # Nearest rank, 0 without samples
+                f"p{percentile}": latencies[max(math.ceil(percentile / 100 * len(latencies)) - 1, 0)] if latencies else 0.0 # fmt: skip
+                for percentile in self.PERCENTILES
+            },
+            "interrupt_latency_seconds_sum": self.latency_sum,
+            "context_depth": context_depth,
+            "idle_ratio": min(self.idle_time / uptime, 1.0) if uptime > 0 else 0.0,
+        }
+
+    @classmethod
+    def to_json(cls, metrics: dict[str, Any]) -> str:
+        return json.dumps(metrics)
+
+    @classmethod
+    def to_text(cls, metrics: dict[str, Any]) -> str:
+        # Text exposition format read by Prometheus and compatible scrapers
+        return cls.to_labeled_text({"": metrics}, "")
+
+    @classmethod
+    def to_labeled_text(cls, metrics: dict[str, dict[str, Any]], label: str) -> str:
+        # Metrics of several CPUs in one exposition, each sample is labeled with label="<key>"
+        prefix: str = cls.PREFIX
+        lines: list[str] = []
+
+        def labels(key: str, extra: str = "") -> str:
+            pairs: list[str] = ([f'{label}="{key}"'] if key else []) + ([extra] if extra else []) # fmt: skip
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        def add(name: str, kind: str, description: str, key: str) -> None:
+            lines.append(f"# HELP {prefix}{name} {description}")
+            lines.append(f"# TYPE {prefix}{name} {kind}")
+            for label_value, values in metrics.items():
+                lines.append(f"{prefix}{name}{labels(label_value)} {values[key]}")
+
+        add("uptime_seconds", "gauge", "Seconds since the CPU started", "uptime_seconds") # fmt: skip
+        add("instructions_retired_total", "counter", "Executed instructions", "instructions_retired") # fmt: skip
+        add("instructions_per_second", "gauge", "Average instructions per second since the CPU started", "instructions_per_second") # fmt: skip
+        add("interrupts_serviced_total", "counter", "Interrupts taken from the interrupt queue", "interrupts_serviced") # fmt: skip
+        add("pending_interrupts", "gauge", "Interrupts waiting in the interrupt queue", "pending_interrupts") # fmt: skip
+        lines.append(f"# HELP {prefix}interrupt_latency_seconds Time from queueing an interrupt until it is taken") # fmt: skip
+        lines.append(f"# TYPE {prefix}interrupt_latency_seconds summary")
+        for label_value, values in metrics.items():
+            for percentile in cls.PERCENTILES:
+                quantile: str = f'quantile="{percentile / 100}"'
+                lines.append(f"{prefix}interrupt_latency_seconds{labels(label_value, quantile)} {values['interrupt_latency_seconds'][f'p{percentile}']}") # fmt: skip
+            lines.append(f"{prefix}interrupt_latency_seconds_sum{labels(label_value)} {values['interrupt_latency_seconds_sum']}") # fmt: skip
+            lines.append(f"{prefix}interrupt_latency_seconds_count{labels(label_value)} {values['interrupts_serviced']}") # fmt: skip
+        add("context_depth", "gauge", "Saved contexts of interrupted programs", "context_depth") # fmt: skip
+        add("idle_ratio", "gauge", "Share of the uptime spent waiting for interrupts", "idle_ratio") # fmt: skip
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,228 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import AbstractContextManager
+from dataclasses import asdict
+from multiprocessing.connection import Connection
+from typing import Any, Iterable, Optional, Union
+from base.Flag import Flag
+from base.SharedRam import SharedRam
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import Byte, Interrupt, InterruptCallback, InterruptStatus, RunResult
+from interrupt_controller.InterruptController import InterruptController
+
+
+def _core_main(
+    core_index: int,
+    memory_name: str,
+    memory_size_byte: int,
+    atomic_lock: AbstractContextManager,
+    commands: Connection,
+    results: Any,
+    cpu_options: dict[str, Any],
+) -> None:
+    # Runs in the core's process until it receives "stop"
+    memory: SharedRam = SharedRam(memory_size_byte, memory_name)
+    cpu: CentralProcessingUnit = CentralProcessingUnit(
+        memory=memory, atomic_lock=atomic_lock, **cpu_options
+    )
+    try:
+        while True:
+            command: tuple[Any, ...] = commands.recv()
+            if command[0] == "run":
+                _, request_id, address, stdin, max_cycles, timeout = command
+                result: RunResult = cpu.run(
+                    None, entry=address, stdin=stdin, max_cycles=max_cycles, timeout=timeout # fmt: skip
+                )
+                results.put((core_index, request_id, asdict(result)))
+            elif command[0] == "invalidate":
+                # Another process wrote the memory, decoded and compiled code may be stale
+                memory.invalidate(command[1], command[2])
+            elif command[0] == "stop":
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass  # Ctrl+C in the terminal or the system is gone
+    finally:
+        memory.close()
+
+
+class MultiCoreSystem:
+    # N cores in separate processes sharing one Ram in shared memory. Each core has its
+    # own registers, Z flag and ControlUnit, run requests go to the next idle core.
+    # Programs have to be loaded through the system so every core drops its cached code,
+    # stores of one core into code another core is running are not detected.
+    def __init__(
+        self,
+        number_of_cores: Optional[int] = None,
+        memory_size_byte: int = 1024,
+        cpu_options: Optional[dict[str, Any]] = None,
+        max_pending_interrupts: int = 1024,
+    ):
+        self.number_of_cores: int = number_of_cores or os.cpu_count() or 1
+        self.__memory: SharedRam = SharedRam(memory_size_byte)
+        self.__cpu_options: dict[str, Any] = cpu_options or {}
+        # Cores start in fresh interpreters, forking a process with threads is not safe
+        self.__context = multiprocessing.get_context("spawn")
+        self.__atomic_lock: AbstractContextManager = self.__context.Lock()
+        self.__results: Any = self.__context.Queue()
+        self.__connections: list[Connection] = []
+        self.__processes: list[Any] = []
+        self.__lock: threading.Lock = threading.Lock()
+        self.__idle_cores: deque[int] = deque()
+        # Run requests waiting for an idle core and runs in flight by request id
+        self.__pending_runs: deque[tuple[int, tuple[Any, ...]]] = deque()
+        self.__running: dict[int, Future[RunResult]] = {}
+        self.__next_request_id: int = 0
+        self.__core_available: threading.Condition = threading.Condition(self.__lock)
+        # Interrupts from the listener, serviced by the dispatcher thread of the system
+        self.__interrupt_controller: InterruptController = InterruptController({}, Flag(), max_pending_interrupts) # fmt: skip
+        self.__start_cores()
+
+    def __start_cores(self) -> None:
+        for core_index in range(self.number_of_cores):
+            receiver, sender = self.__context.Pipe(duplex=False)
+            process = self.__context.Process(
+                target=_core_main,
+                args=(
+                    core_index,
+                    self.__memory.name,
+                    len(self.__memory),
+                    self.__atomic_lock,
+                    receiver,
+                    self.__results,
+                    self.__cpu_options,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.__connections.append(sender)
+            self.__processes.append(process)
+            self.__idle_cores.append(core_index)
+        threading.Thread(target=self.__collect_results, daemon=True).start()
+
+    def __dispatch(self) -> None:
+        # Called with the lock held
+        while self.__pending_runs and self.__idle_cores:
+            core_index: int = self.__idle_cores.popleft()
+            request_id, command = self.__pending_runs.popleft()
+            self.__connections[core_index].send(command)
+
+    def __collect_results(self) -> None:
+        while True:
+            item: Optional[tuple[int, int, dict[str, Any]]] = self.__results.get()
+            if item is None:
+                return
+            core_index, request_id, result = item
+            with self.__lock:
+                future: Future[RunResult] = self.__running.pop(request_id)
+                self.__idle_cores.append(core_index)
+                self.__dispatch()
+                self.__core_available.notify_all()
+            self.__interrupt_controller.metrics.instructions += result["cycles"]
+            future.set_result(RunResult(**result))
+
+    def __service_interrupts(self) -> None:
+        interrupt_controller: InterruptController = self.__interrupt_controller
+        while True:
+            # Runs wait here while every core is busy, the full interrupt queue holds back the senders
+            with self.__lock:
+                self.__core_available.wait_for(
+                    lambda: len(self.__pending_runs) < self.number_of_cores
+                )
+            interrupt_controller.wait_for_interrupt()
+            for interrupt in interrupt_controller.get_next_interrupts(16):
+                self.__service_interrupt(interrupt)
+
+    @staticmethod
+    def __report_run(on_complete: Optional[InterruptCallback], result: RunResult) -> None:
+        # Cores run headless, their output goes to the console of the system
+        print(result.output, end="")
+        if on_complete is None:
+            return
+        report: dict[str, object] = {
+            "status": result.status,
+            "registers": result.registers,
+            "zero_flag": result.zero_flag,
+            "cycles": result.cycles,
+            "output": result.output,
+        }
+        on_complete(InterruptStatus.OK, json.dumps(report).encode("utf-8"))
+
+    def __service_interrupt(self, interrupt: Interrupt) -> None:
+        on_complete = interrupt.on_complete
+        if interrupt.interrupt_command == 0x00:
+            try:
+                self.load_program(interrupt.memory_address, interrupt.arguments)
+            except ValueError as e:
+                print(f"Error in load, try again: {e}")
+                if on_complete is not None:
+                    on_complete(InterruptStatus.ERROR, str(e).encode("utf-8"))
+                return
+            if on_complete is not None:
+                result: dict[str, int] = {
+                    "address": interrupt.memory_address,
+                    "length": len(interrupt.arguments),
+                }
+                on_complete(InterruptStatus.OK, json.dumps(result).encode("utf-8"))
+        elif interrupt.interrupt_command == 0x01:
+            future: Future[RunResult] = self.run(interrupt.memory_address)
+            future.add_done_callback(
+                lambda done: self.__report_run(on_complete, done.result())
+            )
+        elif interrupt.interrupt_command == 0x03:
+            self.__interrupt_controller.report_metrics(interrupt)
+        else:
+            print(f"Unknown command: {interrupt.interrupt_command}")
+            if on_complete is not None:
+                on_complete(InterruptStatus.UNKNOWN_COMMAND, b"")
+
+    def load_program(self, address: Byte, program: Union[bytes, bytearray]) -> None:
+        self.__memory.load_program(address, program)
+        with self.__lock:
+            for connection in self.__connections:
+                connection.send(("invalidate", address, len(program)))
+
+    def run(
+        self,
+        address: Byte,
+        stdin: Union[str, Iterable[str], None] = None,
+        max_cycles: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> "Future[RunResult]":
+        # Headless run of the program at address on the next idle core, registers start at zero
+        if isinstance(stdin, str):
+            stdin = stdin.splitlines()
+        future: Future[RunResult] = Future()
+        with self.__lock:
+            request_id: int = self.__next_request_id
+            self.__next_request_id += 1
+            self.__running[request_id] = future
+            command: tuple[Any, ...] = ("run", request_id, address, None if stdin is None else list(stdin), max_cycles, timeout) # fmt: skip
+            self.__pending_runs.append((request_id, command))
+            self.__dispatch()
+        return future
+
+    def start(self, host: str = "localhost", port: int = 9999) -> None:
+        # Services load (0x00), run (0x01) and metrics (0x03) interrupts until the process ends
+        self.__interrupt_controller.start_interrupt_listener(host, port)
+        try:
+            self.__service_interrupts()
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        with self.__lock:
+            for connection in self.__connections:
+                try:
+                    connection.send(("stop",))
+                except OSError:
+                    pass  # The core already ended
+        for process in self.__processes:
+            process.join()
+        self.__results.put(None)
+        self.__processes.clear()
+        self.__connections.clear()
+        self.__memory.close()
@@ -0,0 +1,159 @@
+import json
+import time
+from typing import Any, Optional
+
+
+class Profiler:
+    # Collects statistics of the instructions the ControlUnit executes while it is attached, in the
+    # engine that runs them. Without profiler nothing is recorded
+    BRANCH_MNEMONICS: set[str] = {"B", "BEQ", "BNE", "BL", "BX"}
+
+    def __init__(self):
+        self.instructions: int = 0
+        self.compiled_instructions: int = 0  # Executed in compiled blocks
+        self.decode_time_ns: int = 0
+        self.execute_time_ns: int = 0
+        self.mnemonic_counts: dict[str, int] = {}
+        self.mnemonic_time_ns: dict[str, int] = {}
+        # (R6, PC - R6) -> executed instructions
+        self.hot_addresses: dict[tuple[int, int], int] = {}
+        # mnemonic -> [taken, not taken]
+        self.branches: dict[str, list[int]] = {}
+        # interrupt command -> [count, total ns, max ns]
+        self.interrupt_service_times: dict[int, list[int]] = {}
+        # Interrupts being serviced: (command, frame name, start ns)
+        self.__interrupt_stack: list[tuple[int, str, int]] = []
+        self.__frames: tuple[str, ...] = ()
+        # (interrupt frames, R6, mnemonic) -> ns
+        self.__stack_time_ns: dict[tuple[tuple[str, ...], int, str], int] = {}
+
+    def record_instruction(
+        self,
+        mnemonic: str,
+        address: int,
+        base: int,
+        decode_time_ns: int,
+        execute_time_ns: int,
+        taken: Optional[bool] = None,
+    ) -> None:
+        self.instructions += 1
+        self.decode_time_ns += decode_time_ns
+        self.execute_time_ns += execute_time_ns
+        self.mnemonic_counts[mnemonic] = self.mnemonic_counts.get(mnemonic, 0) + 1
+        self.mnemonic_time_ns[mnemonic] = self.mnemonic_time_ns.get(mnemonic, 0) + execute_time_ns # fmt: skip
+        hot_address: tuple[int, int] = (base, address - base)
+        self.hot_addresses[hot_address] = self.hot_addresses.get(hot_address, 0) + 1
+        if taken is not None:
+            branch: list[int] = self.branches.setdefault(mnemonic, [0, 0])
+            branch[0 if taken else 1] += 1
+        stack: tuple[tuple[str, ...], int, str] = (self.__frames, base, mnemonic)
+        self.__stack_time_ns[stack] = self.__stack_time_ns.get(stack, 0) + decode_time_ns + execute_time_ns # fmt: skip
+
+    def record_block(
+        self,
+        mnemonics: list[str],
+        addresses: list[int],
+        base: int,
+        decode_time_ns: int,
+        execute_time_ns: int,
+        taken: Optional[bool] = None,
+    ) -> None:
+        # A compiled block is timed as a whole, its time is split evenly among its instructions.
+        # taken is the branch at the end of the block
+        count: int = len(mnemonics)
+        self.compiled_instructions += count
+        for index, (mnemonic, address) in enumerate(zip(mnemonics, addresses)):
+            # The first instruction gets the remainder of the division
+            first: bool = index == 0
+            self.record_instruction(
+                mnemonic,
+                address,
+                base,
+                decode_time_ns // count + (decode_time_ns % count if first else 0),
+                execute_time_ns // count + (execute_time_ns % count if first else 0),
+                taken if index == count - 1 else None,
+            )
+
+    def record_interrupt(self, interrupt_command: int, service_time_ns: int) -> None:
+        times: list[int] = self.interrupt_service_times.setdefault(interrupt_command, [0, 0, 0]) # fmt: skip
+        times[0] += 1
+        times[1] += service_time_ns
+        times[2] = max(times[2], service_time_ns)
+
+    def enter_interrupt(self, interrupt_command: int, address: int) -> None:
+        # A program started by an interrupt, serviced until exit_interrupt
+        frame: str = f"interrupt_0x{interrupt_command:02x}@0x{address:04x}"
+        self.__interrupt_stack.append((interrupt_command, frame, time.perf_counter_ns()))
+        self.__frames = self.__frames + (frame,)
+
+    def exit_interrupt(self) -> None:
+        if not self.__interrupt_stack:
+            return
+        interrupt_command, _, start = self.__interrupt_stack.pop()
+        self.__frames = self.__frames[:-1]
+        self.record_interrupt(interrupt_command, time.perf_counter_ns() - start)
+
+    def exit_all_interrupts(self) -> None:
+        while self.__interrupt_stack:
+            self.exit_interrupt()
+
+    def to_dict(self) -> dict[str, Any]:
+        bases: dict[str, dict[str, int]] = {}
+        for (base, offset), count in sorted(self.hot_addresses.items()):
+            bases.setdefault(f"0x{base:04x}", {})[f"0x{offset:04x}"] = count
+        return {
+            "instructions": self.instructions,
+            "compiled_instructions": self.compiled_instructions,
+            "decode_time_ns": self.decode_time_ns,
+            "execute_time_ns": self.execute_time_ns,
+            "mnemonics": {
+                mnemonic: {
+                    "count": count,
+                    "time_ns": self.mnemonic_time_ns[mnemonic],
+                    "ns_per_instruction": self.mnemonic_time_ns[mnemonic] / count,
+                }
+                for mnemonic, count in sorted(
+                    self.mnemonic_counts.items(), key=lambda item: -item[1]
+                )
+            },
+            "hot_addresses": bases,  # R6 -> offset from R6 -> count
+            "branches": {
+                mnemonic: {
+                    "taken": taken,
+                    "not_taken": not_taken,
+                    "taken_ratio": taken / (taken + not_taken),
+                }
+                for mnemonic, (taken, not_taken) in self.branches.items()
+            },
+            "interrupts": {
+                f"0x{command:02x}": {
+                    "count": count,
+                    "total_ns": total,
+                    "mean_ns": total / count,
+                    "max_ns": maximum,
+                }
+                for command, (count, total, maximum) in self.interrupt_service_times.items() # fmt: skip
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_collapsed_stacks(self) -> str:
+        # One "frame;frame;...;mnemonic nanoseconds" line per stack, as read by flamegraph.pl
+        lines: list[str] = []
+        for (frames, base, mnemonic), time_ns in sorted(self.__stack_time_ns.items()):
+            stack: str = ";".join(frames + (f"program@0x{base:04x}", mnemonic))
+            lines.append(f"{stack} {time_ns}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_json())
+
+    def write_collapsed_stacks(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.to_collapsed_stacks())
+
+    def reset(self) -> None:
+        self.__init__()
@@ -4,7 +4,12 @@ function program_loader() {
   local filepath="$1"
   local address="$2"
   if [ -f "$filepath" ]; then
-    (echo -n "0x00 $address " && cat $filepath) | nc localhost 9999
+    if [ "$(head -c 4 "$filepath")" == "VCPU" ]; then
+      # Binary program image, the load address is part of the image
+      nc -N localhost 9999 < "$filepath"
+    else
+      (echo -n "0x00 $address " && cat $filepath) | nc localhost 9999
+    fi
     return 0
   else
     echo "The file does not exist"
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from loader.ProgramImage import ProgramImage
+from data_types import RunResult
+
+EXAMPLES: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples") # fmt: skip
+
+
+def read_mem_file(path: str) -> bytes:
+    with open(path) as file:
+        return bytes(int(token, 0) for token in file.read().split())
+
+
+class AssemblerTest(unittest.TestCase):
+    def setUp(self):
+        self.assembler: Assembler = Assembler()
+
+    def test_fibonacci_assembles_to_the_mem_file(self):
+        with open(os.path.join(EXAMPLES, "fibonacci.asm")) as file:
+            image: ProgramImage = self.assembler.assemble(file.read())
+        self.assertEqual(image.code, read_mem_file(os.path.join(EXAMPLES, "fibonacci.mem")))
+        self.assertEqual(image.load_address, 0xA1)
+        self.assertEqual(image.entry, 0xA1)
+
+    def test_assembled_fibonacci_runs(self):
+        with open(os.path.join(EXAMPLES, "fibonacci.asm")) as file:
+            image: ProgramImage = self.assembler.assemble(file.read())
+        result: RunResult = CentralProcessingUnit().run(image, stdin=["100"], max_cycles=100000) # fmt: skip
+        self.assertEqual(result.output.split(), ["0", "1", "1", "2", "3", "5", "8", "13", "21", "34", "55", "89"]) # fmt: skip
+
+    def test_image_round_trip(self):
+        image: ProgramImage = self.assembler.assemble(".load 0x20\n.entry start\n.byte 1, 2\nstart: HLT\n") # fmt: skip
+        copy: ProgramImage = ProgramImage.from_bytes(image.to_bytes())
+        self.assertEqual((copy.load_address, copy.entry, copy.code), (0x20, 0x22, b"\x01\x02\x01")) # fmt: skip
+
+    def test_instruction_encoding(self):
+        image: ProgramImage = self.assembler.assemble(
+            "MOV R0, 7\nADD R0, R0, R1\nLDR R2, [0x80]\nMOV R1, 0x12345\nloop: B loop\nHLT\n"
+        )
+        expected: bytes = bytes.fromhex("020100 0700 08000000 01 140102 8000 020201 45230100 0501 1600 01") # fmt: skip
+        self.assertEqual(image.code, expected)
+
+    def test_registers_in_brackets(self):
+        image: ProgramImage = self.assembler.assemble("MOV R1, 0x40\nMOV R0, 7\nSTR R0, [R1]\nLDR R2, [ r1 ]\nHLT\n") # fmt: skip
+        self.assertEqual(image.code[10:], bytes.fromhex("15000001 14000201 01"))
+        result: RunResult = CentralProcessingUnit().run(image)
+        self.assertEqual(result.registers["R2"], 7)
+
+    def test_character_literals_with_separators(self):
+        image: ProgramImage = self.assembler.assemble(".byte ':', ';', ',' ; comment: with a colon, and a comma\n") # fmt: skip
+        self.assertEqual(image.code, b":;,")
+
+    def test_labels_only_at_the_start_of_a_line(self):
+        image: ProgramImage = self.assembler.assemble("first: second: MOV R0, ':'\nB second ; go: back\n") # fmt: skip
+        self.assertEqual(image.code, bytes.fromhex("020100 3a00 0501 0000"))
+
+    def test_errors_name_the_line(self):
+        for source, message in (
+            ("HLT\n.load\n", "Line 2: .load expects 1 operand, got 0"),
+            (".entry a, b\n", "Line 1: .entry expects 1 operand, got 2"),
+            ("\n.byte\n", "Line 2: .byte expects at least 1 operand"),
+            ("FOO R0\n", "Line 1: Unknown mnemonic: FOO"),
+            ("MOV R0\n", "Line 1: MOV expects 2 operands, got 1"),
+            ("B nowhere\n", "Line 1: Unknown value or label: nowhere"),
+            ("a: HLT\na: HLT\n", "Line 2: Duplicate label: a"),
+            (".byte 255, 300\n", "Line 1: Value 300 does not fit into 1 byte(s)"),
+            (".byte -129\n", "Line 1: Value -129 does not fit into 1 byte(s)"),
+            ("\n.word 70000\n", "Line 2: Value 70000 does not fit into 2 byte(s)"),
+            ("MOV R0, 0x100000000\n", "Line 1: Value 4294967296 does not fit into 4 byte(s)"),
+            ("LDR R0, [R9]\n", "Line 1: Unknown value or label: R9"),
+        ):
+            with self.subTest(source=source):
+                with self.assertRaises(ValueError) as context:
+                    self.assembler.assemble(source)
+                self.assertEqual(str(context.exception), message)
+
+    def test_assembled_files_are_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "program.asm")
+            with open(path, "w") as file:
+                file.write("MOV R0, 1\nHLT\n")
+            cache_directory: str = os.path.join(directory, "cache")
+            image: ProgramImage = self.assembler.assemble_file(path, cache_directory)
+            self.assertEqual(len(os.listdir(cache_directory)), 1)
+            cached: ProgramImage = self.assembler.assemble_file(path, cache_directory)
+            self.assertEqual(cached.code, image.code)
+
+
+if __name__ == "__main__":
+    unittest.main()
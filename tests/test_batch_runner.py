@@ -0,0 +1,65 @@
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from typing import Any
+from batch_runner.BatchRunner import BatchRunner
+from data_types import BatchJob
+
+# INP R0; OUT R0; HLT
+PROGRAM: str = "0x16 0x00 0x00 0x17 0x00 0x00 0x01"
+MANIFEST: list[str] = [
+    '{"id": "first", "program": "echo.mem", "entry": "0x0A", "input": ["5"]}',
+    '{"id": "missing", "program": "missing.mem", "entry": "0x0A"}',
+    '{"id": "broken", "program": ',
+    '{"id": "no program"}',
+    '["not", "a", "job"]',
+    '{"id": "no entry", "program": "echo.mem"}',
+    '{"id": "last", "program": "echo.mem", "entry": "0x0A", "input": "7"}',
+]
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def setUp(self):
+        directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory: str = directory.name
+        with open(os.path.join(self.directory, "echo.mem"), "w") as file:
+            file.write(PROGRAM)
+
+    def read_manifest(self) -> list[BatchJob]:
+        return list(BatchRunner.read_manifest(io.StringIO("\n".join(MANIFEST) + "\n"), self.directory)) # fmt: skip
+
+    def check_results(self, results: list[dict[str, Any]]) -> None:
+        by_id: dict[str, dict[str, Any]] = {result["id"]: result for result in results}
+        self.assertEqual(len(results), len(MANIFEST))
+        self.assertEqual((by_id["first"]["status"], by_id["first"]["output"]), ("halted", "5\n")) # fmt: skip
+        self.assertEqual((by_id["last"]["status"], by_id["last"]["output"]), ("halted", "7\n")) # fmt: skip
+        self.assertTrue(by_id["missing"]["error"].startswith("FileNotFoundError"))
+        self.assertTrue(by_id["3"]["error"].startswith("Line 3: Expecting value"))
+        self.assertEqual(by_id["no program"]["error"], "Line 4: Job has no program")
+        self.assertEqual(by_id["5"]["error"], "Line 5: Job is no JSON object")
+        self.assertTrue(by_id["no entry"]["error"].startswith("ValueError: Load address is required")) # fmt: skip
+        for job_id in ("missing", "3", "no program", "5", "no entry"):
+            self.assertEqual(by_id[job_id]["status"], "error")
+
+    def test_manifest_errors_become_jobs(self):
+        jobs: list[BatchJob] = self.read_manifest()
+        self.assertEqual([job.id for job in jobs], ["first", "missing", "3", "no program", "5", "no entry", "last"]) # fmt: skip
+        self.assertEqual([job.error is None for job in jobs], [True, True, False, False, False, True, True]) # fmt: skip
+
+    def test_failing_jobs_do_not_stop_the_batch(self):
+        results: list[dict[str, Any]] = list(BatchRunner(workers=2, chunk_size=2).run(self.read_manifest())) # fmt: skip
+        self.check_results(results)
+        json.dumps(results)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy is not installed")
+    def test_failing_jobs_do_not_stop_a_lockstep_batch(self):
+        results: list[dict[str, Any]] = list(BatchRunner(lockstep_lanes=4).run(self.read_manifest())) # fmt: skip
+        self.check_results(results)
+
+
+if __name__ == "__main__":
+    unittest.main()
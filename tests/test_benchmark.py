@@ -0,0 +1,58 @@
+import contextlib
+import io
+import unittest
+from typing import Any
+from assembler.Assembler import Assembler
+from benchmark.BenchmarkSuite import BenchmarkSuite
+from data_types import BenchmarkCase
+
+CASE_METRICS: set[str] = {"instructions", "instructions_per_second", "ns_per_instruction", "ns_per_clock", "decode_ns_per_instruction", "execute_ns_per_instruction", "peak_memory_byte"} # fmt: skip
+
+
+def results(**metrics: Any) -> dict[str, Any]:
+    return {"benchmarks": {"alu": metrics}}
+
+
+class BenchmarkSuiteTest(unittest.TestCase):
+    def test_every_benchmark_reports_its_metrics(self):
+        suite: BenchmarkSuite = BenchmarkSuite(min_time=0, rounds=1, interrupts=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report: dict[str, Any] = suite.run()
+        benchmarks: dict[str, dict[str, Any]] = report["benchmarks"]
+        self.assertEqual(list(benchmarks), [case.name for case in suite.cases] + ["interrupt", "host"]) # fmt: skip
+        for case in suite.cases:
+            with self.subTest(case=case.name):
+                self.assertEqual(set(benchmarks[case.name]), CASE_METRICS)
+                self.assertGreater(benchmarks[case.name]["instructions_per_second"], 0)
+        self.assertEqual(benchmarks["alu"]["instructions"], 90003)
+        self.assertEqual(benchmarks["interrupt"]["interrupts"], 10)
+        self.assertGreater(benchmarks["host"]["memory_per_machine_byte"], 0)
+
+    def test_benchmarks_are_selected_by_name(self):
+        suite: BenchmarkSuite = BenchmarkSuite(min_time=0, rounds=1)
+        self.assertEqual(list(suite.run(["alu", "memory"])["benchmarks"]), ["alu", "memory"])
+
+    def test_failing_case(self):
+        code: bytes = Assembler().assemble("LDR R0, [0xFFF0]\nHLT\n").code
+        suite: BenchmarkSuite = BenchmarkSuite(min_time=0, rounds=1, cases=[BenchmarkCase("failing", [(0x0A, code)], 0x0A, [])]) # fmt: skip
+        with self.assertRaises(RuntimeError):
+            suite.run(["failing"])
+
+    def test_compare_with_the_baseline(self):
+        baseline: dict[str, Any] = results(instructions_per_second=1000, ns_per_instruction=100, peak_memory_byte=0) # fmt: skip
+        current: dict[str, Any] = results(instructions_per_second=800, ns_per_instruction=105, peak_memory_byte=50) # fmt: skip
+        regressions: list[dict[str, Any]] = BenchmarkSuite.compare(current, baseline, 0.1)
+        self.assertEqual([(regression["metric"], regression["change"]) for regression in regressions], [("instructions_per_second", -0.2)]) # fmt: skip
+        self.assertEqual(BenchmarkSuite.compare(current, baseline, 0.25), [])
+        # Slower ns per instruction is a regression, faster is not
+        self.assertEqual(len(BenchmarkSuite.compare(results(ns_per_instruction=150), baseline)), 1)
+        self.assertEqual(BenchmarkSuite.compare(results(ns_per_instruction=50), baseline), [])
+        self.assertEqual(BenchmarkSuite.compare(results(ns_per_instruction=150), {"benchmarks": {}}), []) # fmt: skip
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            BenchmarkSuite(rounds=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import random
+import unittest
+from typing import Optional
+from CentralProcessingUnit import CentralProcessingUnit
+from central_processing_unit.ControlUnit import ControlUnit
+from data_types import ExecutionStatus
+
+# Opcodes of the three operand arithmetic, logical and shift instructions
+ALU_OPCODES: list[int] = [0x08, 0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x0E, 0x0F, 0x11, 0x12]
+PROGRAM_ADDRESS: int = 0x0A
+DATA_ADDRESS: int = 0x300
+
+
+def generate_program(rng: random.Random) -> bytearray:
+    # Random straight-line code with forward branches, ending with HLT. Registers may be zero
+    # (DIV and MOD by zero) and some loads and stores are out of bounds, so programs may fail
+    instructions: list[list] = []
+    for _ in range(rng.randint(1, 30)):
+        kind: float = rng.random()
+        source: int = rng.choice([0, 1, 2, 3, 4, 5, 6])
+        destination: int = rng.choice([0, 1, 2, 3])
+        value: int = rng.randint(0, 0xFFFF)
+        address: int = rng.choice([rng.randint(DATA_ADDRESS, DATA_ADDRESS + 0xF0), rng.randint(PROGRAM_ADDRESS, PROGRAM_ADDRESS + 60), 0xFFF0]) # fmt: skip
+        if kind < 0.45:
+            opcode: int = rng.choice(ALU_OPCODES)
+            if opcode in (0x11, 0x12):
+                value = rng.randint(0, 20)
+            if rng.random() < 0.5:
+                instructions.append([opcode, 0x01, destination, source, value & 0xFF, value >> 8]) # fmt: skip
+            else:
+                instructions.append([opcode, 0x00, destination, source, rng.choice([0, 1, 2, 3, 6])]) # fmt: skip
+        elif kind < 0.55:
+            instructions.append([0x02, 0x01, destination, value & 0xFF, value >> 8])
+        elif kind < 0.6:
+            instructions.append([0x10, 0x00, destination, source])
+        elif kind < 0.7:
+            instructions.append([0x13, 0x01, source, value & 0xFF, value >> 8])
+        elif kind < 0.8:
+            instructions.append([0x14, 0x01, destination, address & 0xFF, address >> 8])
+        elif kind < 0.9:
+            instructions.append([0x15, 0x01, source, address & 0xFF, address >> 8])
+        else:
+            instructions.append(["branch", rng.choice([0x03, 0x04, 0x05, 0x06])])
+    instructions.append([0x01])
+    addresses: list[int] = []
+    length: int = 0
+    for instruction in instructions:
+        addresses.append(length)
+        length += 4 if instruction[0] == "branch" else len(instruction)
+    program: bytearray = bytearray()
+    for index, instruction in enumerate(instructions):
+        if instruction[0] == "branch":
+            target: int = addresses[rng.randint(index + 1, len(instructions) - 1)]
+            program += bytes([instruction[1], 0x01, target & 0xFF, target >> 8])
+        else:
+            program += bytes(instruction)
+    return program
+
+
+def run_clocked(program: bytearray, data: bytes, use_block_compiler: bool) -> tuple:
+    # Clocks the control unit until HLT, an error or the budget is used up
+    cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=use_block_compiler) # fmt: skip
+    cpu.load_program(DATA_ADDRESS, bytearray(data))
+    cpu.load_program(PROGRAM_ADDRESS, program)
+    cpu.get_register_set()[0x06].set(PROGRAM_ADDRESS)
+    control_unit: ControlUnit = cpu.get_control_unit()
+    control_unit.set_program_counter(PROGRAM_ADDRESS)
+    cycles: int = 0
+    error: Optional[str] = None
+    try:
+        while control_unit.status == ExecutionStatus.RUNNING and cycles < 10000:
+            cycles += control_unit.clock()
+    except Exception as e:
+        cycles += control_unit.retired_instructions
+        error = type(e).__name__
+    registers: list[int] = [register.get() for register in cpu.get_register_set().values()] # fmt: skip
+    return registers, cpu.snapshot().zero_flag, cpu.get_memory().to_bytes(), error, cycles # fmt: skip
+
+
+class BlockCompilerTest(unittest.TestCase):
+    def assert_same_as_interpreter(self, program: bytearray, data: bytes = bytes(0xF8)) -> tuple: # fmt: skip
+        interpreted: tuple = run_clocked(program, data, use_block_compiler=False)
+        compiled: tuple = run_clocked(program, data, use_block_compiler=True)
+        self.assertEqual(interpreted[0], compiled[0], "registers")
+        self.assertEqual(interpreted[1], compiled[1], "zero flag")
+        self.assertEqual(interpreted[2], compiled[2], "memory")
+        self.assertEqual(interpreted[3], compiled[3], "error")
+        self.assertEqual(interpreted[4], compiled[4], "cycles")
+        return compiled
+
+    def test_random_programs(self):
+        rng: random.Random = random.Random(3)
+        for _ in range(300):
+            program: bytearray = generate_program(rng)
+            data: bytes = bytes(rng.randrange(256) for _ in range(0xF8))
+            with self.subTest(program=program.hex()):
+                self.assert_same_as_interpreter(program, data)
+
+    def test_error_in_the_middle_of_a_block(self):
+        # MOV R0, 7; MOV R1, 0; ADD R0, R0, 1; DIV R0, R0, R1; HLT
+        program: bytearray = bytearray.fromhex("020100 0700 020101 0000 08010000 0100 0b00000001 01") # fmt: skip
+        registers, _, _, error, cycles = self.assert_same_as_interpreter(program)
+        self.assertEqual(error, "ZeroDivisionError")
+        self.assertEqual(cycles, 3)
+        self.assertEqual(registers[0x00], 8)
+        self.assertEqual(registers[0x05], PROGRAM_ADDRESS + 21)
+
+    def test_store_into_the_running_block(self):
+        # MOV R0, 0x0101; STR R0, [0x14] (overwrites the ADD with HLT); ADD R1, R1, 1; HLT
+        program: bytearray = bytearray.fromhex("020100 0101 150100 1400 08010101 0100 01") # fmt: skip
+        registers, _, _, error, cycles = self.assert_same_as_interpreter(program)
+        self.assertIsNone(error)
+        self.assertEqual(cycles, 3)
+        self.assertEqual(registers[0x01], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
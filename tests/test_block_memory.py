@@ -0,0 +1,60 @@
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import RunResult
+
+DATA_ADDRESS: int = 0x200
+DATA: bytes = bytes(range(1, 9))
+
+
+def run(source: str, use_block_compiler: bool) -> tuple[RunResult, bytes]:
+    # Runs with DATA at DATA_ADDRESS, returns the result and the 16 bytes from DATA_ADDRESS
+    cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=use_block_compiler)
+    cpu.load_program(DATA_ADDRESS, bytearray(DATA))
+    result: RunResult = cpu.run(Assembler().assemble(source), max_cycles=100)
+    return result, bytes(cpu.get_memory().read(DATA_ADDRESS, 16))
+
+
+class BlockMemoryTest(unittest.TestCase):
+    def assert_run(self, source: str, memory: bytes, **registers: int) -> RunResult:
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                result, data = run(source, use_block_compiler)
+                self.assertEqual(result.status, "halted", result.error)
+                self.assertEqual(data, memory)
+                for name, value in registers.items():
+                    self.assertEqual(result.registers[name], value, name)
+        return result
+
+    def test_copy(self):
+        self.assert_run("MOV R0, 0x208\nMOV R1, 0x200\nMCPY R0, R1, 8\nHLT\n", DATA * 2)
+
+    def test_overlapping_copies(self):
+        self.assert_run("MOV R0, 0x202\nMOV R1, 0x200\nMOV R2, 6\nMCPY R0, R1, R2\nHLT\n", bytes([1, 2, 1, 2, 3, 4, 5, 6]) + bytes(8)) # fmt: skip
+        self.assert_run("MOV R0, 0x200\nMOV R1, 0x202\nMCPY R0, R1, 6\nHLT\n", bytes([3, 4, 5, 6, 7, 8, 7, 8]) + bytes(8)) # fmt: skip
+
+    def test_fill_with_the_lowest_byte(self):
+        self.assert_run("MOV R0, 0x204\nMOV R1, 0x1AB\nMSET R0, R1, 6\nHLT\n", bytes([1, 2, 3, 4]) + bytes([0xAB] * 6) + bytes(6)) # fmt: skip
+
+    def test_compare_sets_the_zero_flag(self):
+        # R3 is 1 if the first two bytes equal the ones at 0x208, 2 if not
+        program: str = "MOV R0, 0x200\nMOV R1, 0x208\nMCMP R0, R1, 2\nBEQ equal\nMOV R3, 2\nHLT\nequal: MOV R3, 1\nHLT\n" # fmt: skip
+        self.assert_run(program, DATA + bytes(8), R3=2)
+        self.assert_run("MOV R0, 0x208\nMOV R1, 0x200\nMCPY R0, R1, 2\n" + program, DATA + bytes([1, 2]) + bytes(6), R3=1) # fmt: skip
+        self.assertTrue(self.assert_run("MOV R0, 0x200\nMCMP R0, R0, 0\nHLT\n", DATA + bytes(8)).zero_flag) # fmt: skip
+
+    def test_copy_over_the_following_code(self):
+        # Copies HLT (0x01 at 0x200) over ADD, which is not executed
+        self.assert_run(".load 0x20\nMOV R0, 0x30\nMOV R1, 0x200\nMCPY R0, R1, 1\nADD R2, R2, 1\nHLT\n", DATA + bytes(8), R2=0) # fmt: skip
+
+    def test_out_of_bounds(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                result, data = run("MOV R0, 0x3FC\nMOV R1, 0x200\nMCPY R0, R1, 8\nHLT\n", use_block_compiler) # fmt: skip
+                self.assertEqual(result.status, "error")
+                self.assertIn("out of bounds", result.error)
+                self.assertEqual(data, DATA + bytes(8))
+
+
+if __name__ == "__main__":
+    unittest.main()
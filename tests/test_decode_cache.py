@@ -0,0 +1,70 @@
+import json
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from central_processing_unit.ControlUnit import ControlUnit
+from loader.ProgramImage import ProgramImage
+from data_types import DecodedInstruction, Interrupt, InterruptStatus, RunResult
+
+# MOV R0, <value> at 0x20 (5 bytes), IRET at 0x25
+PROGRAM: str = ".load 0x20\nMOV R0, {value}\nIRET\n"
+
+
+class DecodeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=False)
+        self.cpu.load_image(Assembler().assemble(PROGRAM.format(value=1)))
+        self.control_unit: ControlUnit = self.cpu.get_control_unit()
+
+    def test_instructions_are_decoded_once(self):
+        first: DecodedInstruction = self.control_unit.decode(0x20)
+        self.assertIs(self.control_unit.decode(0x20), first)
+        self.assertEqual((first.length, first.next_address), (5, 0x25))
+
+    def test_writes_into_an_instruction_invalidate_it(self):
+        # Writes up to the last byte of MOV, short ones look up the addresses before them,
+        # long ones the cached instructions
+        for length in (1, 0x25):
+            with self.subTest(length=length):
+                self.cpu.load_image(Assembler().assemble(PROGRAM.format(value=1)))
+                instruction: DecodedInstruction = self.control_unit.decode(0x20)
+                iret: DecodedInstruction = self.control_unit.decode(0x25)
+                self.cpu.get_memory().write(0x25 - length, bytes(length))
+                self.assertIsNot(self.control_unit.decode(0x20), instruction)
+                self.assertIs(self.control_unit.decode(0x25), iret)
+
+    def test_writes_next_to_an_instruction_keep_it(self):
+        instruction: DecodedInstruction = self.control_unit.decode(0x20)
+        self.cpu.get_memory().write(0x1C, bytes(4))
+        self.cpu.get_memory().write(0x25, b"\x03")
+        self.assertIs(self.control_unit.decode(0x20), instruction)
+
+    def test_store_changes_the_next_run(self):
+        # Overwrites the value of MOV R0 and runs it again
+        image: ProgramImage = Assembler().assemble(".load 0x20\nstart: MOV R0, 1\nMOV R1, 2\nSTR R1, [0x23]\nCMP R0, 1\nBEQ start\nHLT\n") # fmt: skip
+        result: RunResult = self.cpu.run(image, max_cycles=100)
+        self.assertEqual((result.status, result.registers["R0"]), ("halted", 2))
+
+    def test_loads_replace_cached_code(self):
+        self.assertEqual(self.cpu.run(Assembler().assemble(PROGRAM.format(value=1))).registers["R0"], 1) # fmt: skip
+        self.assertEqual(self.cpu.run(Assembler().assemble(PROGRAM.format(value=2))).registers["R0"], 2) # fmt: skip
+
+    def test_load_interrupts_replace_cached_code(self):
+        replies: list[tuple[InterruptStatus, bytes]] = []
+
+        def queue(command: int, address: int, arguments: bytes = b"") -> None:
+            self.cpu.queue_interrupt(Interrupt(command, address, bytearray(arguments), lambda status, payload: replies.append((status, payload)))) # fmt: skip
+
+        self.cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        self.cpu.start_sliced(0x00)
+        queue(0x01, 0x20)
+        self.cpu.run_slice(100)
+        queue(0x00, 0x20, Assembler().assemble(PROGRAM.format(value=2)).code)
+        queue(0x01, 0x20)
+        self.cpu.run_slice(100)
+        self.assertEqual([status for status, _ in replies], [InterruptStatus.OK] * 3)
+        self.assertEqual([json.loads(replies[index][1])["registers"]["R0"] for index in (0, 2)], [1, 2]) # fmt: skip
+
+
+if __name__ == "__main__":
+    unittest.main()
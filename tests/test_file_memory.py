@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from assembler.Assembler import Assembler
+from base.FileRam import FileRam
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import RunResult
+
+
+class FileMemoryTest(unittest.TestCase):
+    def setUp(self):
+        directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: str = os.path.join(directory.name, "memory.bin")
+
+    def write_file(self, data: bytes) -> None:
+        with open(self.path, "wb") as file:
+            file.write(data)
+
+    def read_file(self) -> bytes:
+        with open(self.path, "rb") as file:
+            return file.read()
+
+    def test_memory_is_shared_through_the_file(self):
+        memory: FileRam = FileRam(self.path, 1024)  # Created with zeros
+        other: FileRam = FileRam(self.path)  # As large as the file
+        memory.write_uint(0x10, 0x1234, 2)
+        self.assertEqual(len(other), 1024)
+        self.assertEqual(other.read_uint(0x10, 2), 0x1234)
+        memory.flush()
+        memory.close()
+        other.close()
+        self.assertEqual(self.read_file()[0x10:0x12], b"\x34\x12")
+
+    def test_short_file_is_extended(self):
+        self.write_file(b"\x01\x02")
+        memory: FileRam = FileRam(self.path, 16)
+        self.assertEqual(bytes(memory.read(0, 4)), b"\x01\x02\x00\x00")
+        memory.close()
+        self.assertEqual(len(self.read_file()), 16)
+
+    def test_copy_on_write_keeps_the_file(self):
+        self.write_file(bytes(64))
+        memory: FileRam = FileRam(self.path, copy_on_write=True)
+        memory.fill(0, 64, 0xFF)
+        memory.flush()
+        self.assertEqual(memory.read_byte(63), 0xFF)
+        memory.close()
+        self.assertEqual(self.read_file(), bytes(64))
+        with self.assertRaises(ValueError):
+            FileRam(self.path, 128, copy_on_write=True)
+
+    def test_empty_file(self):
+        self.write_file(b"")
+        with self.assertRaises(ValueError):
+            FileRam(self.path)
+
+    def test_cpu_runs_in_the_memory_file(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte=1024, memory_file=self.path) # fmt: skip
+        result: RunResult = cpu.run(Assembler().assemble("MOV R0, 0x2A\nSTR R0, [0x300]\nHLT\n"))
+        self.assertEqual(result.status, "halted")
+        other: FileRam = FileRam(self.path)
+        self.assertEqual(other.read_byte(0x300), 0x2A)
+        other.close()
+
+
+class MappedImageTest(unittest.TestCase):
+    def setUp(self):
+        directory: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: str = os.path.join(directory.name, "image.bin")
+        # MOV R0, 5; STR R0, [0x1000]; HLT at the start of the page at 0x1000
+        self.code: bytes = Assembler().assemble("MOV R0, 5\nSTR R0, [0x1000]\nHLT\n").code
+        with open(self.path, "wb") as file:
+            file.write(self.code)
+
+    def test_rom_can_not_be_written(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte=0x10000, page_size=0x1000) # fmt: skip
+        self.assertEqual(cpu.map_image(0x1000, self.path), len(self.code))
+        self.assertEqual(bytes(cpu.get_memory().read(0x1000, len(self.code))), self.code)
+        result: RunResult = cpu.run(None, 0x1000)
+        self.assertEqual(result.status, "error")
+        self.assertEqual(cpu.get_memory().read_byte(0x1000), self.code[0])
+
+    def test_copy_on_write_image(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte=0x10000, page_size=0x1000) # fmt: skip
+        cpu.map_image(0x1000, self.path, read_only=False)
+        result: RunResult = cpu.run(None, 0x1000)
+        self.assertEqual(result.status, "halted")
+        self.assertEqual(cpu.get_memory().read_byte(0x1000), 5)
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), self.code)
+
+    def test_invalid_mappings(self):
+        paged: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte=0x10000, page_size=0x1000) # fmt: skip
+        for cpu, address, options in (
+            (CentralProcessingUnit(), 0x00, {}),  # Without paged memory
+            (paged, 0x1004, {}),  # Not page aligned
+            (paged, 0x1000, {"offset": 2, "length": len(self.code)}),
+        ):
+            with self.subTest(address=address, options=options):
+                with self.assertRaises(ValueError):
+                    cpu.map_image(address, self.path, **options)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+import unittest
+from assembler.Assembler import Assembler
+from base.Flag import Flag
+from CentralProcessingUnit import CentralProcessingUnit
+from interrupt_controller.InterruptController import InterruptController
+from data_types import ExecutionStatus, Interrupt, InterruptStatus, RunResult
+
+# Stores 1 at 0x100 and returns
+HANDLER: str = ".load 0x20\nMOV R0, 1\nSTR R0, [0x100]\nIRET\n"
+
+
+class IdleTest(unittest.TestCase):
+    def setUp(self):
+        self.cpu: CentralProcessingUnit = CentralProcessingUnit()
+        self.cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        self.cpu.load_image(Assembler().assemble(HANDLER))
+
+    def test_sliced_cpu_returns_while_idle(self):
+        self.cpu.start_sliced(0x00)
+        self.assertEqual(self.cpu.run_slice(100), ExecutionStatus.IDLE)
+        self.assertEqual(self.cpu.get_register_set()[0x05].get(), 0x00)  # The PC stays on WFI
+        self.cpu.queue_interrupt(Interrupt(0x01, 0x20, bytearray()))
+        self.assertEqual(self.cpu.run_slice(100), ExecutionStatus.IDLE)
+        self.assertEqual(self.cpu.get_memory().read_byte(0x100), 1)
+
+    def test_idle_cpu_wakes_up_on_an_interrupt(self):
+        # The CPU blocks in WFI on its own thread until the interrupt is queued
+        threading.Thread(target=self.cpu.start, kwargs={"port": None}, daemon=True).start()
+        time.sleep(0.1)
+        replies: list[tuple[InterruptStatus, bytes]] = []
+        done: threading.Event = threading.Event()
+
+        def on_complete(status: InterruptStatus, payload: bytes) -> None:
+            replies.append((status, payload))
+            done.set()
+
+        start: float = time.perf_counter()
+        self.cpu.queue_interrupt(Interrupt(0x01, 0x20, bytearray(), on_complete))
+        self.assertTrue(done.wait(5))
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(json.loads(replies[0][1])["status"], "returned")
+        metrics: dict = self.cpu.get_interrupt_controller().metrics.to_dict(0, 0)
+        self.assertGreater(metrics["idle_ratio"], 0)
+
+    def test_wait_for_interrupt_times_out(self):
+        interrupt_controller: InterruptController = InterruptController({}, Flag())
+        interrupt_controller.idle_timeout = 0.05
+        start: float = time.perf_counter()
+        self.assertEqual(interrupt_controller.asm_WFI(), ExecutionStatus.IDLE)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.04)
+        interrupt_controller.idle_timeout = 0
+        self.assertEqual(interrupt_controller.asm_WFI(), ExecutionStatus.IDLE)
+        interrupt_controller.queue_interrupt(Interrupt(0x03, 0x00, bytearray()))
+        self.assertIsNone(interrupt_controller.asm_WFI())
+
+    def test_run_ends_on_wfi(self):
+        result: RunResult = CentralProcessingUnit().run(Assembler().assemble("MOV R0, 1\nWFI\nMOV R0, 2\nHLT\n")) # fmt: skip
+        self.assertEqual((result.status, result.registers["R0"]), ("idle", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+from interrupt_controller.InterruptQueue import InterruptQueue
+from data_types import Interrupt
+
+
+def load(address: int, length: int = 4) -> Interrupt:
+    return Interrupt(0x00, address, bytearray(length))
+
+
+def run(address: int) -> Interrupt:
+    return Interrupt(0x01, address, bytearray())
+
+
+def metrics() -> Interrupt:
+    return Interrupt(0x03, 0x00, bytearray())
+
+
+def take_all(queue: InterruptQueue) -> list[Interrupt]:
+    interrupts: list[Interrupt] = []
+    while len(queue):
+        interrupts += queue.get()
+    return interrupts
+
+
+class InterruptQueueOrderTest(unittest.TestCase):
+    def test_fifo_by_default(self):
+        queue: InterruptQueue = InterruptQueue()
+        interrupts: list[Interrupt] = [load(0x0A), run(0x0A), load(0x0A), metrics(), run(0x0A)] # fmt: skip
+        for interrupt in interrupts:
+            queue.put(interrupt)
+        self.assertEqual(queue.peek_all(), interrupts)
+        self.assertEqual(take_all(queue), interrupts)
+
+    def test_priorities_serve_commands_first(self):
+        queue: InterruptQueue = InterruptQueue(priorities={0x03: 0})
+        interrupts: list[Interrupt] = [load(0x0A), run(0x0A), metrics()]
+        for interrupt in interrupts:
+            queue.put(interrupt)
+        self.assertEqual(take_all(queue), [interrupts[2], interrupts[0], interrupts[1]])
+
+    def test_load_does_not_overtake_an_earlier_run_at_its_address(self):
+        queue: InterruptQueue = InterruptQueue(priorities={0x00: 0, 0x01: 1})
+        load_a, run_a, load_b, load_c = load(0x0A), run(0x0A), load(0x08, 4), load(0x40)
+        for interrupt in (load_a, run_a, load_b, load_c):
+            queue.put(interrupt)
+        # load_c does not touch 0x0A and goes first, load_b overwrites 0x0A and waits for run_a
+        self.assertEqual(take_all(queue), [load_a, load_c, run_a, load_b])
+
+    def test_run_does_not_overtake_an_earlier_load_at_its_address(self):
+        queue: InterruptQueue = InterruptQueue(priorities={0x01: 0, 0x00: 1})
+        load_a, run_a, run_b = load(0x0A), run(0x0C), run(0x40)
+        for interrupt in (load_a, run_a, run_b):
+            queue.put(interrupt)
+        self.assertEqual(take_all(queue), [run_b, load_a, run_a])
+
+    def test_directly_following_loads_are_taken_together(self):
+        queue: InterruptQueue = InterruptQueue()
+        interrupts: list[Interrupt] = [load(0x0A), load(0x20), load(0x30), run(0x0A), load(0x40)] # fmt: skip
+        for interrupt in interrupts:
+            queue.put(interrupt)
+        self.assertEqual(queue.get(max_loads=2), interrupts[0:2])
+        self.assertEqual(queue.get(max_loads=2), interrupts[2:3])
+        self.assertEqual(queue.get(max_loads=2), interrupts[3:4])
+        self.assertEqual(len(queue), 1)
+
+    def test_empty_queue(self):
+        queue: InterruptQueue = InterruptQueue()
+        self.assertFalse(queue.has_interrupt)
+        with self.assertRaises(IndexError):
+            queue.get()
+        queue.put(run(0x0A))
+        self.assertTrue(queue.has_interrupt)
+        queue.clear()
+        self.assertFalse(queue.has_interrupt)
+        self.assertEqual(len(queue), 0)
+
+
+class InterruptQueueBackpressureTest(unittest.TestCase):
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            InterruptQueue(max_size=0)
+
+    def test_full_queue_refuses_without_blocking(self):
+        queue: InterruptQueue = InterruptQueue(max_size=2)
+        self.assertTrue(queue.put(run(0x0A), block=False))
+        self.assertTrue(queue.put(run(0x0A), block=False))
+        self.assertFalse(queue.put(run(0x0A), block=False))
+        start: float = time.perf_counter()
+        self.assertFalse(queue.put(run(0x0A), timeout=0.05))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual(len(queue), 2)
+
+    def test_blocked_sender_continues_when_an_interrupt_is_taken(self):
+        queue: InterruptQueue = InterruptQueue(max_size=1)
+        queue.put(run(0x0A))
+        results: list[bool] = []
+        sender: threading.Thread = threading.Thread(target=lambda: results.append(queue.put(run(0x20), timeout=5))) # fmt: skip
+        sender.start()
+        time.sleep(0.05)
+        self.assertEqual(results, [])
+        self.assertEqual(queue.get()[0].memory_address, 0x0A)
+        sender.join(5)
+        self.assertEqual(results, [True])
+        self.assertEqual(queue.get()[0].memory_address, 0x20)
+
+    def test_wait_returns_when_an_interrupt_is_queued(self):
+        queue: InterruptQueue = InterruptQueue()
+        self.assertFalse(queue.wait(0.01))
+        timer: threading.Timer = threading.Timer(0.05, lambda: queue.put(run(0x0A)))
+        timer.start()
+        self.assertTrue(queue.wait(5))
+        timer.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from assembler.Assembler import Assembler
+from base.Flag import Flag
+from CentralProcessingUnit import CentralProcessingUnit
+from interrupt_controller.InterruptClient import InterruptClient
+from interrupt_controller.InterruptController import InterruptController
+from interrupt_controller.InterruptServer import InterruptServer
+from loader.ProgramImage import ProgramImage
+from data_types import Interrupt, InterruptStatus
+
+# MOV R0, <value>, IRET
+PROGRAM: str = ".load {address}\nMOV R0, {value}\nIRET\n"
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1]
+
+
+class InterruptServerTest(unittest.TestCase):
+    # The server queues into an interrupt controller without CPU, the tests serve the interrupts
+    @classmethod
+    def setUpClass(cls):
+        cls.port: int = free_port()
+        cls.interrupt_controller: InterruptController = InterruptController({}, Flag())
+        server: InterruptServer = InterruptServer(cls.interrupt_controller, port=cls.port)
+        server.CHUNK_SIZE = 4
+        server.start()
+
+    def connect(self) -> socket.socket:
+        connection: socket.socket = socket.create_connection(("localhost", self.port))
+        self.addCleanup(connection.close)
+        return connection
+
+    def next_interrupts(self) -> list[Interrupt]:
+        self.assertTrue(self.interrupt_controller.wait_for_interrupt(5))
+        return self.interrupt_controller.get_next_interrupts(max_loads=16)
+
+    def read_response(self, connection: socket.socket) -> tuple[InterruptStatus, bytes]:
+        data: bytes = b""
+        while len(data) < InterruptServer.RESPONSE_HEADER.size:
+            data += connection.recv(InterruptServer.RESPONSE_HEADER.size - len(data))
+        magic, status, length = InterruptServer.RESPONSE_HEADER.unpack(data)
+        self.assertEqual(magic, InterruptServer.RESPONSE_MAGIC)
+        payload: bytes = b""
+        while len(payload) < length:
+            payload += connection.recv(length - len(payload))
+        return InterruptStatus(status), payload
+
+    def test_load_is_queued_once_complete(self):
+        program: bytes = bytes(range(1, 13))
+        connection: socket.socket = self.connect()
+        connection.sendall(InterruptServer.REQUEST_HEADER.pack(InterruptServer.REQUEST_MAGIC, 0x00, 0x40, len(program))) # fmt: skip
+        connection.sendall(program[:6])
+        time.sleep(0.2)
+        # More than a chunk arrived, nothing is queued before the rest
+        self.assertFalse(self.interrupt_controller.has_interrupt)
+        connection.sendall(program[6:])
+        interrupts: list[Interrupt] = self.next_interrupts()
+        self.assertEqual(len(interrupts), 1)
+        self.assertEqual((interrupts[0].memory_address, bytes(interrupts[0].arguments)), (0x40, program)) # fmt: skip
+        on_complete = interrupts[0].on_complete
+        assert on_complete is not None
+        on_complete(InterruptStatus.OK, b"")
+        status, payload = self.read_response(connection)
+        self.assertEqual(status, InterruptStatus.OK)
+        self.assertEqual(json.loads(payload), {"address": 0x40, "length": len(program)})
+
+
+class ProtocolTest(unittest.TestCase):
+    # A CPU idling in WFI behind its interrupt listener
+    @classmethod
+    def setUpClass(cls):
+        cls.port: int = free_port()
+        cpu: CentralProcessingUnit = CentralProcessingUnit(memory_size_byte=4096)
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        threading.Thread(target=cpu.start, kwargs={"port": cls.port}, daemon=True).start()
+
+    def connect(self) -> InterruptClient:
+        for _ in range(100):
+            try:
+                client: InterruptClient = InterruptClient("localhost", self.port)
+                self.addCleanup(client.close)
+                return client
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        self.fail("The CPU does not listen")
+
+    def send(self, data: bytes) -> None:
+        with socket.create_connection(("localhost", self.port)) as connection:
+            connection.sendall(data)
+
+    def run_until(self, client: InterruptClient, address: int, value: int) -> dict:
+        # Text and image requests are not answered, the program runs once they are loaded
+        for _ in range(100):
+            status, payload = client.run(address)
+            result: dict = json.loads(payload)
+            if status == InterruptStatus.OK and result["registers"]["R0"] == value:
+                return result
+            time.sleep(0.05)
+        self.fail(f"The program at {address:#x} was not loaded")
+
+    def test_requests_on_one_connection(self):
+        client: InterruptClient = self.connect()
+        image: ProgramImage = Assembler().assemble(PROGRAM.format(address=0x100, value=7))
+        status, payload = client.load(0x100, image.code)
+        self.assertEqual((status, json.loads(payload)), (InterruptStatus.OK, {"address": 0x100, "length": len(image.code)})) # fmt: skip
+        status, payload = client.run(0x100)
+        self.assertEqual(status, InterruptStatus.OK)
+        result: dict = json.loads(payload)
+        self.assertEqual((result["status"], result["registers"]["R0"]), ("returned", 7))
+        status, payload = client.metrics()
+        self.assertEqual(status, InterruptStatus.OK)
+        self.assertGreaterEqual(json.loads(payload)["interrupts_serviced"], 3)
+
+    def test_errors(self):
+        client: InterruptClient = self.connect()
+        self.assertEqual(client.request(0x07, 0x100)[0], InterruptStatus.UNKNOWN_COMMAND)
+        self.assertEqual(client.load(0x1000, b"\x01")[0], InterruptStatus.ERROR)
+        # The connection stays usable after an error
+        self.assertEqual(client.load(0x180, b"\x01")[0], InterruptStatus.OK)
+
+    def test_text_protocol(self):
+        code: bytes = Assembler().assemble(PROGRAM.format(address=0x200, value=9)).code
+        self.send(("0x00 0x200 " + " ".join(f"0x{byte:02x}" for byte in code)).encode("utf-8"))
+        self.assertEqual(self.run_until(self.connect(), 0x200, 9)["status"], "returned")
+
+    def test_program_image(self):
+        image: ProgramImage = Assembler().assemble(PROGRAM.format(address=0x280, value=11))
+        self.send(image.to_bytes())
+        self.assertEqual(self.run_until(self.connect(), 0x280, 11)["status"], "returned")
+
+    def test_http_metrics(self):
+        with socket.create_connection(("localhost", self.port)) as connection:
+            connection.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response: bytes = b""
+            while chunk := connection.recv(4096):
+                response += chunk
+        head, body = response.split(b"\r\n\r\n", 1)
+        self.assertTrue(head.startswith(b"HTTP/1.0 200 OK"))
+        self.assertIn(b"vcpu_instructions_retired_total ", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from loader.ProgramImage import ProgramImage
+from data_types import ExecutionStatus, Interrupt, InterruptStatus
+
+# Branches are relative to R6, so every program runs at its load address
+PROGRAMS: dict[str, str] = {
+    "looping": ".load 0x20\nMOV R0, 1\nloop: B loop\n",
+    "waiting": ".load 0x40\nMOV R0, 2\nloop: LDR R1, [0x100]\nCMP R1, 0\nBEQ loop\nIRET\n", # fmt: skip
+    "returning": ".load 0x60\nMOV R0, 3\nIRET\n",
+    "halting": ".load 0x80\nMOV R2, 4\nHLT\n",
+}
+FLAG_ADDRESS: int = 0x100  # The waiting program returns once it is not zero
+
+
+class InterruptContextTest(unittest.TestCase):
+    def setUp(self):
+        self.images: dict[str, ProgramImage] = {name: Assembler().assemble(source) for name, source in PROGRAMS.items()} # fmt: skip
+        self.replies: list[tuple[InterruptStatus, bytes]] = []
+
+    def start_cpu(self, **options) -> CentralProcessingUnit:
+        cpu: CentralProcessingUnit = CentralProcessingUnit(**options)
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        for image in self.images.values():
+            cpu.load_image(image)
+        cpu.start_sliced(0x00)
+        return cpu
+
+    def run_program(self, cpu: CentralProcessingUnit, name: str) -> None:
+        cpu.queue_interrupt(Interrupt(0x01, self.images[name].load_address, bytearray(), lambda status, payload: self.replies.append((status, payload)))) # fmt: skip
+        cpu.run_slice(100)
+
+    def result(self, index: int) -> dict:
+        status, payload = self.replies[index]
+        self.assertEqual(status, InterruptStatus.OK)
+        return json.loads(payload)
+
+    def test_interrupted_program_continues_with_its_registers(self):
+        cpu: CentralProcessingUnit = self.start_cpu()
+        self.run_program(cpu, "looping")
+        self.assertEqual(cpu.get_interrupt_controller().context_depth, 1)
+        self.run_program(cpu, "returning")
+        self.assertEqual(self.result(0)["registers"]["R0"], 3)
+        self.assertEqual(cpu.get_interrupt_controller().context_depth, 1)
+        self.assertEqual(cpu.get_register_set()[0x00].get(), 1)
+
+    def test_contexts_beyond_the_register_banks(self):
+        for register_banks in (1, 2, 8):
+            with self.subTest(register_banks=register_banks):
+                self.replies = []
+                cpu: CentralProcessingUnit = self.start_cpu(register_banks=register_banks) # fmt: skip
+                self.run_program(cpu, "looping")
+                self.run_program(cpu, "waiting")
+                self.run_program(cpu, "returning")
+                self.assertEqual(cpu.get_interrupt_controller().context_depth, 2)
+                self.assertEqual(cpu.get_register_set()[0x00].get(), 2)
+                cpu.load_program(FLAG_ADDRESS, bytearray([0x01]))
+                cpu.run_slice(100)
+                self.assertEqual(self.result(1)["registers"]["R0"], 2)
+                self.assertEqual(cpu.get_interrupt_controller().context_depth, 1)
+                self.assertEqual(cpu.get_register_set()[0x00].get(), 1)
+                self.assertEqual(cpu.get_register_set()[0x01].get(), 0)
+
+    def test_nesting_limit_answers_busy(self):
+        cpu: CentralProcessingUnit = self.start_cpu(max_interrupt_depth=2)
+        self.run_program(cpu, "looping")
+        self.run_program(cpu, "looping")
+        self.run_program(cpu, "returning")
+        self.assertEqual(self.replies, [(InterruptStatus.BUSY, b"Interrupt nesting limit reached")]) # fmt: skip
+        self.assertEqual(cpu.get_interrupt_controller().context_depth, 2)
+
+    def test_halt_ends_every_interrupted_program(self):
+        cpu: CentralProcessingUnit = self.start_cpu()
+        self.run_program(cpu, "looping")
+        self.run_program(cpu, "waiting")
+        self.run_program(cpu, "halting")
+        self.assertEqual([self.result(index)["status"] for index in range(3)], ["halted"] * 3) # fmt: skip
+        self.assertEqual(self.result(0)["registers"]["R2"], 4)
+        self.assertEqual(cpu.get_interrupt_controller().context_depth, 0)
+        self.assertEqual(cpu.run_slice(100), ExecutionStatus.IDLE)
+        self.assertEqual(cpu.get_register_set()[0x05].get(), 0x00)
+
+
+if __name__ == "__main__":
+    unittest.main()
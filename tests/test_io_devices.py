@@ -0,0 +1,104 @@
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from IO_controller.InputDevice import InputDevice, IteratorInput
+from IO_controller.OutputDevice import MemoryOutput, OutputDevice
+from loader.ProgramImage import ProgramImage
+from data_types import Interrupt, RunResult
+
+# Outputs 5 and waits until the flag at 0x100 is set, then ends with {end}
+WAITING: str = ".load 0x20\nMOV R0, 5\nOUT R0\nloop: LDR R1, [0x100]\nCMP R1, 0\nBEQ loop\n{end}\n" # fmt: skip
+FLAG_ADDRESS: int = 0x100
+
+
+class RecordingOutput(OutputDevice):
+    def __init__(self, buffer_size: int = 64 * 1024):
+        super().__init__(buffer_size)
+        self.writes: list[str] = []
+
+    def write_to_sink(self, text: str) -> None:
+        self.writes.append(text)
+
+
+class RecordingInput(InputDevice):
+    # Remembers what was written to the output when INP asked for a line
+    def __init__(self, output: RecordingOutput):
+        self.output: RecordingOutput = output
+        self.seen: list[list[str]] = []
+
+    def read_line(self, prompt: str) -> str:
+        self.seen.append(list(self.output.writes))
+        return "7"
+
+
+class OutputDeviceTest(unittest.TestCase):
+    def test_devices_without_their_method_cannot_be_created(self):
+        class NoSink(OutputDevice):
+            pass
+
+        class NoLines(InputDevice):
+            pass
+
+        for device in (OutputDevice, InputDevice, NoSink, NoLines):
+            with self.subTest(device=device.__name__):
+                with self.assertRaises(TypeError):
+                    device()
+
+    def test_output_is_written_when_the_buffer_is_full(self):
+        output: RecordingOutput = RecordingOutput(buffer_size=8)
+        output.write("123\n")
+        self.assertEqual(output.writes, [])
+        output.write("4567\n")
+        self.assertEqual(output.writes, ["123\n4567\n"])
+        output.write("8")
+        output.close()
+        self.assertEqual(output.writes, ["123\n4567\n", "8"])
+
+    def test_memory_output(self):
+        output: MemoryOutput = MemoryOutput()
+        output.write("a")
+        output.write("b")
+        output.flush()
+        self.assertEqual(output.getvalue(), "ab")
+        output.clear()
+        self.assertEqual(output.getvalue(), "")
+
+
+class FlushTest(unittest.TestCase):
+    def start_cpu(self, end: str) -> tuple[RecordingInput, RecordingOutput]:
+        output: RecordingOutput = RecordingOutput()
+        input_device: RecordingInput = RecordingInput(output)
+        cpu: CentralProcessingUnit = CentralProcessingUnit(output_device=output, input_device=input_device) # fmt: skip
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        cpu.load_image(Assembler().assemble(WAITING.format(end=end)))
+        cpu.start_sliced(0x00)
+        cpu.queue_interrupt(Interrupt(0x01, 0x20, bytearray()))
+        cpu.run_slice(100)
+        self.assertEqual(output.writes, [])
+        cpu.load_program(FLAG_ADDRESS, bytearray([0x01]))
+        cpu.run_slice(100)
+        return input_device, output
+
+    def test_halt_flushes(self):
+        _, output = self.start_cpu("HLT")
+        self.assertEqual(output.writes, ["5\n"])
+
+    def test_iret_flushes(self):
+        _, output = self.start_cpu("IRET")
+        self.assertEqual(output.writes, ["5\n"])
+
+    def test_input_flushes_first(self):
+        input_device, output = self.start_cpu("INP R2\nOUT R2\nIRET")
+        self.assertEqual(input_device.seen, [["5\n"]])
+        self.assertEqual(output.writes, ["5\n", "7\n"])
+
+    def test_input_runs_out(self):
+        image: ProgramImage = Assembler().assemble("INP R0\nINP R1\nHLT\n")
+        result: RunResult = CentralProcessingUnit().run(image, stdin=IteratorInput(["1"]))
+        self.assertEqual(result.status, "error")
+        self.assertEqual(result.error, "EOFError: No more input for INP")
+        self.assertEqual(result.registers["R0"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
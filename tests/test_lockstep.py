@@ -0,0 +1,49 @@
+import importlib.util
+import unittest
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import RunResult
+
+PROGRAMS: dict[str, str] = {
+    # INP R0; INP R1; ADD R0, R0, R1; OUT R0; HLT
+    "add": "160000 160001 0800000001 170000 01",
+    # INP R0; DIV R0, R0, R0 (fails for 0); OUT R0; IRET
+    "divide": "160000 0b00000000 170000 ff",
+    # INP R0; MOV R1, 0x12345 (address operand); CMP R0, 5; BEQ 0x14; HLT; OUT R1; HLT
+    "address operand": "160000 020201 45230100 130100 0500 0301 1400 01 170001 01",
+    # INP R0; MOV R9, 1 (unknown register code)
+    "unknown register": "160000 020109 0100",
+    # INP R0; unknown opcode
+    "unknown opcode": "160000 fe",
+}
+INPUTS: list[list[str]] = [["5", "7"], ["0", "3"], ["9", "1"], []]
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy is not installed")
+class LockstepEngineTest(unittest.TestCase):
+    def test_results_match_run(self):
+        from lockstep.LockstepEngine import LockstepEngine
+
+        engine: LockstepEngine = LockstepEngine(r1_size_byte=4)
+        for name, code in PROGRAMS.items():
+            program: bytearray = bytearray.fromhex(code)
+            results: list[RunResult] = engine.run(program, INPUTS, entry=0x0A, max_cycles=1000) # fmt: skip
+            for inputs, result in zip(INPUTS, results):
+                with self.subTest(program=name, inputs=inputs):
+                    cpu: CentralProcessingUnit = CentralProcessingUnit(r1_size_byte=4)
+                    expected: RunResult = cpu.run(program, 0x0A, max_cycles=1000, stdin=inputs, reset_memory=True) # fmt: skip
+                    self.assertEqual(result.status, expected.status)
+                    self.assertEqual(result.registers, expected.registers)
+                    self.assertEqual(result.zero_flag, expected.zero_flag)
+                    self.assertEqual(result.cycles, expected.cycles)
+                    self.assertEqual(result.output, expected.output)
+                    self.assertEqual(result.error, expected.error)
+
+    def test_mmu_is_rejected(self):
+        from lockstep.LockstepEngine import LockstepEngine
+
+        with self.assertRaises(ValueError):
+            LockstepEngine(program_limit=0x100)
+
+
+if __name__ == "__main__":
+    unittest.main()
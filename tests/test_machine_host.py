@@ -0,0 +1,75 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from assembler.Assembler import Assembler
+from interrupt_controller.InterruptClient import InterruptClient
+from machine_host.MachineHost import MachineHost
+from data_types import InterruptStatus
+
+# Counts R0 to 60000 twenty times, long enough to be preempted many times
+LONG: bytes = Assembler().assemble("MOV R1, 0\nouter: MOV R0, 0\nloop: ADD R0, R0, 1\nCMP R0, 60000\nBNE loop\nADD R1, R1, 1\nCMP R1, 20\nBNE outer\nIRET\n").code # fmt: skip
+SHORT: bytes = Assembler().assemble("MOV R0, 42\nOUT R0\nIRET\n").code
+FAILING: bytes = Assembler().assemble("INP R0\nIRET\n").code  # Machines have no input
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1]
+
+
+class MachineHostTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.port: int = free_port()
+        cls.host: MachineHost = MachineHost(4, quantum=1000)
+        threading.Thread(target=cls.host.start, kwargs={"port": cls.port}, daemon=True).start() # fmt: skip
+
+    def connect(self, machine: int) -> InterruptClient:
+        for _ in range(100):
+            try:
+                client: InterruptClient = InterruptClient("localhost", self.port, machine=machine) # fmt: skip
+                self.addCleanup(client.close)
+                return client
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        self.fail("The host does not listen")
+
+    def test_machines_have_their_own_memory(self):
+        first, second = self.connect(0), self.connect(1)
+        self.assertEqual(first.load(0x100, SHORT)[0], InterruptStatus.OK)
+        self.assertEqual(second.load(0x100, FAILING)[0], InterruptStatus.OK)
+        status, payload = first.run(0x100)
+        self.assertEqual(status, InterruptStatus.OK)
+        self.assertEqual(json.loads(payload)["registers"]["R0"], 42)
+        # The failing machine ends its program, it and the others keep serving
+        status, payload = second.run(0x100)
+        self.assertEqual(json.loads(payload)["status"], "error")
+        self.assertEqual(json.loads(second.run(0x100)[1])["status"], "error")
+        self.assertEqual(json.loads(first.run(0x100)[1])["registers"]["R0"], 42)
+
+    def test_long_program_does_not_block_other_machines(self):
+        busy, other = self.connect(2), self.connect(3)
+        busy.load(0x100, LONG)
+        other.load(0x100, SHORT)
+        replies: list[bytes] = []
+        runner: threading.Thread = threading.Thread(target=lambda: replies.append(busy.run(0x100)[1])) # fmt: skip
+        runner.start()
+        time.sleep(0.1)
+        for _ in range(5):
+            self.assertEqual(json.loads(other.run(0x100)[1])["status"], "returned")
+        self.assertEqual(replies, [])
+        runner.join(60)
+        self.assertEqual(json.loads(replies[0])["registers"]["R1"], 20)
+
+    def test_invalid_host(self):
+        with self.assertRaises(ValueError):
+            MachineHost(0)
+        with self.assertRaises(ValueError):
+            MachineHost(1, quantum=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import time
+import unittest
+from CentralProcessingUnit import CentralProcessingUnit
+from metrics.Metrics import Metrics
+from data_types import Interrupt, InterruptStatus
+
+
+def started_ten_seconds_ago() -> Metrics:
+    metrics: Metrics = Metrics()
+    metrics.start_time = time.perf_counter() - 10
+    metrics.instructions = 1000
+    for latency in range(1, 101):
+        metrics.record_interrupt(latency / 1000)
+    return metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def test_reports_do_not_change_the_metrics(self):
+        metrics: Metrics = started_ten_seconds_ago()
+        first: dict = metrics.to_dict(0, 0)
+        second: dict = metrics.to_dict(0, 0)
+        self.assertAlmostEqual(first["instructions_per_second"], 100, delta=1)
+        self.assertAlmostEqual(second["instructions_per_second"], first["instructions_per_second"], delta=1) # fmt: skip
+        self.assertEqual(first["instructions_retired"], second["instructions_retired"])
+
+    def test_json_payload(self):
+        payload: dict = json.loads(Metrics.to_json(started_ten_seconds_ago().to_dict(3, 2)))
+        self.assertEqual(payload["instructions_retired"], 1000)
+        self.assertEqual(payload["interrupts_serviced"], 100)
+        self.assertEqual((payload["pending_interrupts"], payload["context_depth"]), (3, 2))
+        self.assertEqual(payload["interrupt_latency_seconds"], {"p50": 0.05, "p90": 0.09, "p99": 0.099}) # fmt: skip
+        self.assertAlmostEqual(payload["interrupt_latency_seconds_sum"], 5.05)
+
+    def test_text_payload(self):
+        lines: list[str] = Metrics.to_text(started_ten_seconds_ago().to_dict(3, 2)).splitlines()
+        self.assertIn("# TYPE vcpu_instructions_retired_total counter", lines)
+        self.assertIn("vcpu_instructions_retired_total 1000", lines)
+        self.assertIn('vcpu_interrupt_latency_seconds{quantile="0.5"} 0.05', lines)
+        self.assertIn("vcpu_interrupt_latency_seconds_count 100", lines)
+        self.assertIn("vcpu_pending_interrupts 3", lines)
+
+    def test_labeled_text_payload(self):
+        metrics: dict = started_ten_seconds_ago().to_dict(0, 0)
+        lines: list[str] = Metrics.to_labeled_text({"0": metrics, "1": metrics}, "machine").splitlines() # fmt: skip
+        self.assertEqual(lines.count("# TYPE vcpu_instructions_retired_total counter"), 1)
+        self.assertIn('vcpu_instructions_retired_total{machine="1"} 1000', lines)
+        self.assertIn('vcpu_interrupt_latency_seconds{machine="0",quantile="0.99"} 0.099', lines) # fmt: skip
+
+    def test_cpu_reports_its_metrics(self):
+        replies: list[tuple[InterruptStatus, bytes]] = []
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        cpu.start_sliced(0x00)
+        for address in (0x00, 0x01, 0x02):
+            cpu.queue_interrupt(Interrupt(0x03, address, bytearray(), lambda status, payload: replies.append((status, payload)))) # fmt: skip
+        cpu.run_slice(10)
+        self.assertEqual([status for status, _ in replies], [InterruptStatus.OK, InterruptStatus.OK, InterruptStatus.ERROR]) # fmt: skip
+        self.assertEqual(json.loads(replies[0][1])["interrupts_serviced"], 1)
+        self.assertIn("vcpu_interrupts_serviced_total 2", replies[1][1].decode("utf-8").splitlines()) # fmt: skip
+
+
+if __name__ == "__main__":
+    unittest.main()
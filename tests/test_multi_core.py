@@ -0,0 +1,49 @@
+import unittest
+from concurrent.futures import Future
+from assembler.Assembler import Assembler
+from multi_core.MultiCoreSystem import MultiCoreSystem
+from data_types import RunResult
+
+# Adds 1 to the counter at 0x200 500 times with LDADD
+INCREMENT: str = ".load 0x40\nMOV R1, 0\nMOV R2, 1\nloop: LDADD R0, R2, 0x200\nADD R1, R1, 1\nCMP R1, 500\nBNE loop\nIRET\n" # fmt: skip
+# Increments the counter at 0x204 500 times with a CAS loop
+COMPARE_AND_SWAP: str = ".load 0x80\nMOV R1, 0\nagain: LDR R0, 0x204\nADD R2, R0, 1\nCAS R0, R2, 0x204\nBNE again\nADD R1, R1, 1\nCMP R1, 500\nBNE again\nIRET\n" # fmt: skip
+# Outputs the counter at the address given as operand
+READ_COUNTER: str = ".load 0xC0\nLDR R0, [{address}]\nOUT R0\nIRET\n"
+
+
+class MultiCoreSystemTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.system: MultiCoreSystem = MultiCoreSystem(number_of_cores=2, memory_size_byte=4096) # fmt: skip
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.system.shutdown()
+
+    def load(self, source: str) -> int:
+        image = Assembler().assemble(source)
+        self.system.load_program(image.load_address, image.code)
+        return image.entry
+
+    def read_counter(self, address: int) -> str:
+        return self.system.run(self.load(READ_COUNTER.format(address=address))).result(10).output.strip() # fmt: skip
+
+    def test_atomic_instructions_do_not_lose_updates(self):
+        for source, address in ((INCREMENT, 0x200), (COMPARE_AND_SWAP, 0x204)):
+            with self.subTest(address=address):
+                self.system.load_program(address, bytearray(2))
+                entry: int = self.load(source)
+                futures: list[Future[RunResult]] = [self.system.run(entry) for _ in range(6)]
+                self.assertEqual([future.result(30).status for future in futures], ["returned"] * 6) # fmt: skip
+                self.assertEqual(self.read_counter(address), "3000")
+
+    def test_loaded_code_replaces_cached_code_on_every_core(self):
+        for value in (1, 2):
+            entry: int = self.load(f".load 0x100\nMOV R0, {value}\nOUT R0\nIRET\n")
+            results: list[RunResult] = [future.result(10) for future in [self.system.run(entry) for _ in range(4)]] # fmt: skip
+            self.assertEqual([result.output.strip() for result in results], [str(value)] * 4) # fmt: skip
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from assembler.Assembler import Assembler
+from base.PagedRam import PagedRam
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import Interrupt, MemoryFault, PageProtection, RunResult
+
+# Stores 7 at 0x30 inside and at 0x40 beyond a program limit of 0x40
+OUT_OF_BOUNDS: str = ".load 0x100\nMOV R0, 7\nSTR R0, [0x30]\nLDR R1, [0x30]\nOUT R1\nSTR R0, [0x40]\nHLT\n" # fmt: skip
+# Writes beyond the limit and returns, the fault handler stores the address and access it gets
+FAULTING: str = ".load 0x100\nMOV R0, 7\nSTR R0, [0x50]\nMOV R2, 9\nIRET\n"
+FAULT_HANDLER: str = ".load 0x200\nSTR R0, [0x10]\nSTR R1, [0x12]\nIRET\n"
+
+
+class PagedRamTest(unittest.TestCase):
+    def test_pages_are_allocated_when_written(self):
+        memory: PagedRam = PagedRam(1 << 32, 4096)
+        self.assertEqual(memory.allocated_pages, 0)
+        self.assertEqual(memory.read_uint(0xFFFF0000, 4), 0)
+        self.assertEqual(memory.allocated_pages, 0)
+        memory.write_uint(0xFFFF0FFE, 0x12345678, 4)
+        self.assertEqual(memory.allocated_pages, 2)
+        self.assertEqual(memory.read_uint(0xFFFF0FFE, 4), 0x12345678)
+        memory.release(0, 1 << 32)
+        self.assertEqual(memory.allocated_pages, 0)
+        self.assertEqual(memory.read_uint(0xFFFF0FFE, 4), 0)
+
+    def test_protected_page_faults(self):
+        memory: PagedRam = PagedRam(1 << 16, 4096)
+        memory.protect(0x1000, 1, PageProtection.READ)
+        with self.assertRaises(MemoryFault) as context:
+            memory.write_uint(0x0FFE, 1, 4)
+        self.assertEqual(context.exception.address, 0x1000)
+        self.assertEqual(context.exception.access, PageProtection.WRITE)
+        self.assertEqual(memory.read_uint(0x0FFE, 4), 0)
+        # Loads from the host ignore the protection
+        memory.load_program(0x1000, b"\x01\x02")
+        self.assertEqual(memory.read_uint(0x1000, 2), 0x0201)
+
+    def test_mapped_file(self):
+        data: bytes = bytes(range(256)) * 40
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "image.bin")
+            with open(path, "wb") as file:
+                file.write(data)
+            memory: PagedRam = PagedRam(1 << 20, 4096)
+            memory.map_file(0x4000, path)
+            self.assertEqual(memory.read(0x4000, len(data)).tobytes(), data)
+            with self.assertRaises(MemoryFault):
+                memory.write_uint(0x4010, 1, 1)
+            writable: PagedRam = PagedRam(1 << 20, 4096)
+            writable.map_file(0x0000, path, read_only=False)
+            writable.fill(100, 5000, 7)
+            self.assertEqual(writable.read_byte(4099), 7)
+            memory.close()
+            writable.close()
+            # Writes are copied on write and never reach the file
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), data)
+
+
+class MemoryManagementUnitTest(unittest.TestCase):
+    def test_program_limit(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                cpu: CentralProcessingUnit = CentralProcessingUnit(1024, program_limit=0x40, use_block_compiler=use_block_compiler) # fmt: skip
+                result: RunResult = cpu.run(Assembler().assemble(OUT_OF_BOUNDS))
+                self.assertEqual(result.status, "error")
+                self.assertEqual(result.error, "MemoryFault: Write access to address 64 is not allowed") # fmt: skip
+                self.assertEqual(result.output, "7\n")
+                self.assertEqual(result.cycles, 4)
+                # Addresses are relative to the program's base in R6
+                self.assertEqual(cpu.get_memory().read_uint(0x130, 1), 7)
+
+    def test_fault_handler(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                cpu: CentralProcessingUnit = CentralProcessingUnit(1024, program_limit=0x40, fault_handler=0x200, use_block_compiler=use_block_compiler) # fmt: skip
+                cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+                cpu.load_image(Assembler().assemble(FAULT_HANDLER))
+                cpu.load_image(Assembler().assemble(FAULTING))
+                cpu.start_sliced(0x00)
+                replies: list[bytes] = []
+                cpu.queue_interrupt(Interrupt(0x01, 0x100, bytearray(), lambda status, payload: replies.append(payload))) # fmt: skip
+                cpu.run_slice(100)
+                # The handler got the address and the access, the program continued after the fault
+                self.assertEqual(cpu.get_memory().read_uint(0x210, 2), 0x50)
+                self.assertEqual(cpu.get_memory().read_uint(0x212, 2), PageProtection.WRITE) # fmt: skip
+                self.assertEqual(len(replies), 1)
+                self.assertIn(b'"R2": 9', replies[0])
+                self.assertEqual(cpu.get_interrupt_controller().context_depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
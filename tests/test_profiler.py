@@ -0,0 +1,52 @@
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from loader.ProgramImage import ProgramImage
+from profiler.Profiler import Profiler
+from data_types import RunResult
+
+# Counts R1 to 5 storing every value, then fails dividing by zero
+COUNTER: str = ".load 0x20\nMOV R1, 0\nloop: ADD R1, R1, 1\nSTR R1, [0x80]\nCMP R1, 5\nBNE loop\nMOV R2, 0\nDIV R0, R1, R2\nHLT\n" # fmt: skip
+
+
+def profile(source: str, **options) -> tuple[RunResult, Profiler]:
+    profiler: Profiler = Profiler()
+    result: RunResult = CentralProcessingUnit(profiler=profiler, **options).run(Assembler().assemble(source)) # fmt: skip
+    return result, profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_compiled_blocks_are_profiled(self):
+        compiled_result, compiled = profile(COUNTER)
+        interpreted_result, interpreted = profile(COUNTER, use_block_compiler=False)
+        self.assertEqual((compiled_result.status, compiled_result.cycles), (interpreted_result.status, interpreted_result.cycles)) # fmt: skip
+        self.assertGreater(compiled.compiled_instructions, 0)
+        self.assertEqual(interpreted.compiled_instructions, 0)
+        compiled_payload: dict = compiled.to_dict()
+        interpreted_payload: dict = interpreted.to_dict()
+        for key in ("instructions", "hot_addresses", "branches"):
+            with self.subTest(key=key):
+                self.assertEqual(compiled_payload[key], interpreted_payload[key])
+        self.assertEqual(
+            {mnemonic: entry["count"] for mnemonic, entry in compiled_payload["mnemonics"].items()}, # fmt: skip
+            {mnemonic: entry["count"] for mnemonic, entry in interpreted_payload["mnemonics"].items()}, # fmt: skip
+        )
+        self.assertEqual(compiled_payload["branches"]["BNE"]["taken"], 4)
+        self.assertEqual(compiled_payload["branches"]["BNE"]["not_taken"], 1)
+
+    def test_profiling_does_not_change_the_result(self):
+        image: ProgramImage = Assembler().assemble(COUNTER)
+        expected: RunResult = CentralProcessingUnit().run(image)
+        result, _ = profile(COUNTER)
+        self.assertEqual((result.status, result.cycles, result.error, result.registers), (expected.status, expected.cycles, expected.error, expected.registers)) # fmt: skip
+
+    def test_block_time_is_split_among_its_instructions(self):
+        profiler: Profiler = Profiler()
+        profiler.record_block(["MOV", "ADD", "BNE"], [0x20, 0x25, 0x2A], 0x20, 10, 20, True)
+        self.assertEqual((profiler.instructions, profiler.compiled_instructions), (3, 3))
+        self.assertEqual((profiler.decode_time_ns, profiler.execute_time_ns), (10, 20))
+        self.assertEqual(profiler.branches, {"BNE": [1, 0]})
+
+
+if __name__ == "__main__":
+    unittest.main()
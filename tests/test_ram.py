@@ -0,0 +1,70 @@
+import unittest
+from base.Ram import Ram
+
+
+class RamTest(unittest.TestCase):
+    def setUp(self):
+        self.ram: Ram = Ram(64)
+        self.writes: list[tuple[int, int]] = []
+        self.ram.add_write_listener(lambda address, length: self.writes.append((address, length))) # fmt: skip
+
+    def test_read_and_write(self):
+        self.ram.write(0x10, b"\x01\x02\x03")
+        self.assertEqual(bytes(self.ram.read(0x10, 3)), b"\x01\x02\x03")
+        self.assertEqual(self.ram.read_byte(0x11), 0x02)
+        self.assertEqual(self.writes, [(0x10, 3)])
+
+    def test_typed_access_is_little_endian(self):
+        self.ram.write_uint(0x00, 0x0102, 4)
+        self.assertEqual(bytes(self.ram.read(0x00, 4)), b"\x02\x01\x00\x00")
+        self.assertEqual(self.ram.read_uint(0x00, 2), 0x0102)
+        self.ram.write_uint(0x08, 0x030201)  # As many bytes as the value needs
+        self.ram.write_uint(0x0C, 0)
+        self.assertEqual(self.writes, [(0x00, 4), (0x08, 3), (0x0C, 1)])
+        self.assertEqual(self.ram.read_uint(0x08, 4), 0x030201)
+
+    def test_out_of_bounds(self):
+        for access in (
+            lambda: self.ram.read(-1, 1),
+            lambda: self.ram.read(62, 4),
+            lambda: self.ram.write(63, b"\x00\x00"),
+            lambda: self.ram.read_uint(64, 1),
+            lambda: self.ram.write_uint(62, 0, 4),
+            lambda: self.ram.fill(60, 8),
+            lambda: self.ram.copy(60, 0, 8),
+            lambda: self.ram.compare(0, 60, 8),
+        ):
+            with self.assertRaises(ValueError):
+                access()
+        self.assertEqual(self.writes, [])
+
+    def test_loading_the_same_program_again_is_skipped(self):
+        self.ram.load_program(0x20, b"\x01\x02")
+        self.ram.load_program(0x20, b"\x01\x02")
+        self.ram.load_program(0x20, b"\x01\x03")
+        self.assertEqual(self.writes, [(0x20, 2), (0x20, 2)])
+
+    def test_fill(self):
+        self.ram.fill(0x04, 4, 0xAA)
+        self.ram.fill(0x04, 4, 0xAA)  # Unchanged memory is not written
+        self.ram.fill(0x04, 0, 0xBB)
+        self.assertEqual(bytes(self.ram.read(0x03, 6)), b"\x00\xAA\xAA\xAA\xAA\x00")
+        self.assertEqual(self.writes, [(0x04, 4)])
+
+    def test_overlapping_copies(self):
+        for destination, source, expected in ((0x02, 0x00, b"\x01\x02\x01\x02\x03\x04"), (0x00, 0x02, b"\x03\x04\x05\x06\x05\x06")): # fmt: skip
+            with self.subTest(destination=destination, source=source):
+                self.ram.write(0x00, b"\x01\x02\x03\x04\x05\x06")
+                self.ram.copy(destination, source, 4)
+                self.assertEqual(bytes(self.ram.read(0x00, 6)), expected)
+                self.assertEqual(self.writes[-1], (destination, 4))
+
+    def test_compare(self):
+        self.ram.write(0x00, b"abcabd")
+        self.assertTrue(self.ram.compare(0x00, 0x03, 2))
+        self.assertFalse(self.ram.compare(0x00, 0x03, 3))
+        self.assertTrue(self.ram.compare(0x00, 0x03, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from base.Flag import Flag
+from base.Register import Register
+from base.RegisterFile import RegisterFile
+from interrupt_controller.InterruptController import InterruptController
+from data_types import CPUContext, ExecutionStatus, RegisterSet
+
+
+class RegisterBankTest(unittest.TestCase):
+    def setUp(self):
+        # Three banks: two interrupts switch banks, the third spills its context
+        self.register_file: RegisterFile = RegisterFile(7, number_of_banks=3)
+        self.register_set: RegisterSet = {index: Register(2, f"R{index}", self.register_file, index) for index in range(7)} # fmt: skip
+        self.zero_flag: Flag = Flag()
+        self.interrupt_controller: InterruptController = InterruptController(self.register_set, self.zero_flag) # fmt: skip
+
+    def enter(self, value: int) -> None:
+        # The running program has R0 = value and Z set for odd values when it is interrupted
+        self.register_set[0x00].set(value)
+        self.zero_flag.isFlagSet = value % 2 == 1
+        self.assertTrue(self.interrupt_controller.save_current_context())
+
+    def test_interrupts_switch_banks_before_they_spill(self):
+        self.enter(1)
+        self.assertIs(self.register_file.values, self.register_file.banks[1])
+        self.assertEqual(self.register_set[0x00].get(), 1)  # Starts with the interrupted registers
+        self.enter(2)
+        self.assertIs(self.register_file.values, self.register_file.banks[2])
+        self.enter(3)
+        self.assertIs(self.register_file.values, self.register_file.banks[2])
+        self.assertEqual([(context.R0, context.Z) for context in self.interrupt_controller.get_contexts()], [(1, True), (2, False), (3, True)]) # fmt: skip
+        self.register_set[0x00].set(4)
+        for value in (3, 2, 1):
+            with self.subTest(value=value):
+                self.assertEqual(self.interrupt_controller.asm_IRET(), ExecutionStatus.RETURNED)
+                self.assertEqual((self.register_set[0x00].get(), self.zero_flag.isFlagSet), (value, value % 2 == 1)) # fmt: skip
+        self.assertIs(self.register_file.values, self.register_file.banks[0])
+        self.assertEqual(self.interrupt_controller.context_depth, 0)
+
+    def test_contexts_are_replaced(self):
+        contexts: list[CPUContext] = [CPUContext(R0=value, R1=0, R2=0, R3=0, R4=0, R5=0x20 * value, R6=0, Z=value == 2) for value in (1, 2, 3, 4)] # fmt: skip
+        self.interrupt_controller.set_contexts(contexts)
+        self.assertEqual(self.interrupt_controller.get_contexts(), contexts)
+        self.assertIs(self.register_file.values, self.register_file.banks[2])
+        self.interrupt_controller.asm_IRET()
+        self.assertEqual(self.register_set[0x05].get(), 0x80)
+
+    def test_halt_keeps_the_registers_in_the_first_bank(self):
+        self.enter(1)
+        self.enter(2)
+        self.register_set[0x01].set(7)
+        self.interrupt_controller.halt()
+        self.assertIs(self.register_file.values, self.register_file.banks[0])
+        self.assertEqual((self.register_set[0x00].get(), self.register_set[0x01].get()), (2, 7))
+        self.assertEqual(self.interrupt_controller.get_contexts(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
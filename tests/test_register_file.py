@@ -0,0 +1,48 @@
+import unittest
+from assembler.Assembler import Assembler
+from base.Register import Register
+from base.RegisterFile import RegisterFile
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import RunResult
+
+
+class RegisterTest(unittest.TestCase):
+    def test_values_wrap_at_the_register_width(self):
+        register: Register = Register(2, "R0")
+        for value, expected in ((0x1234, 0x1234), (0x12345, 0x2345), (-1, 0xFFFF), (-2, 0xFFFE)):
+            with self.subTest(value=value):
+                register.set(value)
+                self.assertEqual(register.get(), expected)
+        self.assertEqual(register.value, bytearray([0xFE, 0xFF]))
+
+    def test_registers_share_their_register_file(self):
+        register_file: RegisterFile = RegisterFile(2)
+        first: Register = Register(1, "R0", register_file, 0)
+        second: Register = Register(16, "R1", register_file, 1)
+        first.set(0x1FF)
+        second.set(1 << 127)
+        self.assertEqual(register_file.values, [0xFF, 1 << 127])
+
+    def test_banks(self):
+        register_file: RegisterFile = RegisterFile(2, number_of_banks=3)
+        register: Register = Register(1, "R0", register_file, 0)
+        register.set(1)
+        register_file.select_bank(2)
+        self.assertEqual(register.get(), 0)
+        register.set(2)
+        register_file.select_bank(0)
+        self.assertEqual(register.get(), 1)
+        self.assertEqual(register_file.banks, [[1, 0], [0, 0], [2, 0]])
+
+    def test_invalid_number_of_banks(self):
+        with self.assertRaises(ValueError):
+            RegisterFile(7, number_of_banks=0)
+
+    def test_instructions_wrap_at_the_register_width(self):
+        program: str = "MOV R1, 0xFF\nADD R1, R1, 2\nSUB R2, R2, 1\nHLT\n"
+        result: RunResult = CentralProcessingUnit(r1_size_byte=1, r2_size_byte=2).run(Assembler().assemble(program)) # fmt: skip
+        self.assertEqual((result.registers["R1"], result.registers["R2"]), (0x01, 0xFFFF))
+
+
+if __name__ == "__main__":
+    unittest.main()
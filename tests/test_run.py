@@ -0,0 +1,61 @@
+import importlib.util
+import unittest
+from CentralProcessingUnit import CentralProcessingUnit
+from data_types import RunResult
+
+# MOV R0, 7; MOV R1, 0; ADD R0, R0, 1; DIV R0, R0, R1; HLT, the DIV fails after 3 instructions
+FAILING_PROGRAM: bytearray = bytearray.fromhex("020100 0700 020101 0000 08010000 0100 0b00000001 01") # fmt: skip
+# MOV R0, 7; ADD R0, R0, 1; HLT
+HALTING_PROGRAM: bytearray = bytearray.fromhex("020100 0700 08010000 0100 01")
+
+
+class RunTest(unittest.TestCase):
+    def test_failing_run_counts_the_instructions_before_the_error(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=use_block_compiler) # fmt: skip
+                result: RunResult = cpu.run(FAILING_PROGRAM, 0x0A)
+                self.assertEqual(result.status, "error")
+                self.assertTrue(result.error.startswith("ZeroDivisionError"))
+                self.assertEqual(result.cycles, 3)
+                self.assertEqual(result.registers["R0"], 8)
+                self.assertEqual(cpu.get_interrupt_controller().metrics.instructions, 3)
+
+    def test_halting_run(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=use_block_compiler) # fmt: skip
+                result: RunResult = cpu.run(HALTING_PROGRAM, 0x0A)
+                self.assertEqual(result.status, "halted")
+                self.assertEqual(result.cycles, 3)
+                self.assertEqual(result.registers["R0"], 8)
+
+    def test_cycle_limit(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        result: RunResult = cpu.run(FAILING_PROGRAM, 0x0A, max_cycles=2)
+        self.assertEqual(result.status, "cycle_limit")
+        self.assertEqual(result.cycles, 2)
+
+    def test_failing_slice_counts_the_instructions_before_the_error(self):
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                cpu: CentralProcessingUnit = CentralProcessingUnit(use_block_compiler=use_block_compiler) # fmt: skip
+                cpu.load_program(0x0A, FAILING_PROGRAM)
+                cpu.start_sliced(0x0A)
+                with self.assertRaises(ZeroDivisionError):
+                    cpu.run_slice(100)
+                self.assertEqual(cpu.get_interrupt_controller().metrics.instructions, 3)
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy is not installed")
+    def test_lockstep_cycles_match_run(self):
+        from lockstep.LockstepEngine import LockstepEngine
+
+        results: list[RunResult] = LockstepEngine().run(FAILING_PROGRAM, [[]], entry=0x0A) # fmt: skip
+        expected: RunResult = CentralProcessingUnit().run(FAILING_PROGRAM, 0x0A, reset_memory=True) # fmt: skip
+        self.assertEqual(results[0].status, expected.status)
+        self.assertEqual(results[0].cycles, expected.cycles)
+        self.assertEqual(results[0].registers, expected.registers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from central_processing_unit.Scheduler import Scheduler
+from loader.ProgramImage import ProgramImage
+from data_types import ExecutionStatus, Interrupt, InterruptStatus, Task
+
+# Counts R1 to 1000 and stores it at the address given as operand: 3003 instructions
+COUNTER: str = ".load {address}\nMOV R1, 0\nloop: ADD R1, R1, 1\nCMP R1, 1000\nBNE loop\nSTR R1, [{result}]\nHLT\n" # fmt: skip
+COUNTER_CYCLES: int = 3003
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.cpu: CentralProcessingUnit = CentralProcessingUnit(scheduler_quantum=100)
+        self.cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        self.counters: list[ProgramImage] = [
+            Assembler().assemble(COUNTER.format(address=address, result=result))
+            for address, result in ((0x20, 0x100), (0x40, 0x102))
+        ]
+        for image in self.counters:
+            self.cpu.load_image(image)
+
+    def run_until_idle(self) -> None:
+        for _ in range(1000):
+            if self.cpu.run_slice(100) == ExecutionStatus.IDLE:
+                return
+        self.fail("The tasks did not finish")
+
+    def test_tasks_share_the_cpu(self):
+        for image in self.counters:
+            self.cpu.add_task(image.entry)
+        self.cpu.start_sliced(0x00)
+        self.cpu.run_slice(1000)
+        tasks: list[Task] = self.cpu.get_scheduler().get_tasks()
+        self.assertEqual(len(tasks), 2)
+        # Neither task runs more than a quantum ahead of the other
+        self.assertLessEqual(abs(tasks[0].cycles - tasks[1].cycles), 100)
+        self.assertEqual(sum(task.slices for task in tasks), 10)
+        self.run_until_idle()
+        self.assertEqual(self.cpu.get_memory().read_uint(0x100, 2), 1000)
+        self.assertEqual(self.cpu.get_memory().read_uint(0x102, 2), 1000)
+        self.assertEqual(self.cpu.get_scheduler().get_tasks(), [])
+
+    def test_finished_task_is_reported(self):
+        replies: list[tuple[InterruptStatus, bytes]] = []
+        self.cpu.start_sliced(0x00)
+        for image in self.counters:
+            self.cpu.queue_interrupt(Interrupt(0x02, image.entry, bytearray(), lambda status, payload: replies.append((status, payload)))) # fmt: skip
+        self.run_until_idle()
+        self.assertEqual([status for status, _ in replies], [InterruptStatus.OK] * 2)
+        for _, payload in replies:
+            result: dict = json.loads(payload)
+            self.assertEqual(result["status"], "halted")
+            self.assertEqual(result["registers"]["R1"], 1000)
+            self.assertEqual(result["cycles"], COUNTER_CYCLES)
+            self.assertEqual(result["slices"], 31)
+
+    def test_started_program_continues_as_task(self):
+        first, second = self.counters
+        self.cpu.start_sliced(first.entry)
+        self.cpu.run_slice(50)
+        self.cpu.queue_interrupt(Interrupt(0x02, second.entry, bytearray()))
+        self.cpu.run_slice(100)
+        self.assertEqual(len(self.cpu.get_scheduler().get_tasks()), 2)
+        self.run_until_idle()
+        self.assertEqual(self.cpu.get_memory().read_uint(0x100, 2), 1000)
+        self.assertEqual(self.cpu.get_memory().read_uint(0x102, 2), 1000)
+        self.assertEqual(self.cpu.get_scheduler().get_tasks(), [])
+
+    def test_invalid_quantum(self):
+        with self.assertRaises(ValueError):
+            Scheduler(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from CentralProcessingUnit import CentralProcessingUnit
+from loader.MachineSnapshot import MachineSnapshot
+from data_types import ExecutionStatus, Interrupt
+
+# Counts R0 to 100, stores it at 0x80 and returns:
+# MOV R0, 0; loop: ADD R0, R0, 1; CMP R0, 100; BNE loop; STR R0, [0x80]; IRET
+COUNTER: bytearray = bytearray.fromhex("020100 0000 08010000 0100 130100 6400 0401 0500 150100 8000 ff") # fmt: skip
+COUNTER_ADDRESS: int = 0x20
+RESULT_ADDRESS: int = 0x80
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_file_round_trip(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        cpu.load_program(COUNTER_ADDRESS, COUNTER)
+        cpu.get_register_set()[0x01].set(0x1234)
+        cpu.queue_interrupt(Interrupt(0x01, COUNTER_ADDRESS, bytearray()))
+        snapshot: MachineSnapshot = MachineSnapshot.from_buffer(cpu.snapshot().to_bytes())
+        restored: CentralProcessingUnit = CentralProcessingUnit.from_snapshot(snapshot)
+        self.assertEqual(restored.get_memory().to_bytes(), cpu.get_memory().to_bytes())
+        self.assertEqual(restored.get_register_set()[0x01].get(), 0x1234)
+        self.assertEqual(len(restored.get_interrupt_controller().get_pending_interrupts()), 1) # fmt: skip
+
+    def test_restored_program_resumes_at_its_pc(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        cpu.load_program(COUNTER_ADDRESS, COUNTER)
+        cpu.start_sliced(COUNTER_ADDRESS)
+        self.assertIsNone(cpu.run_slice(50))
+        restored: CentralProcessingUnit = cpu.clone()
+        self.assertEqual(restored.get_register_set()[0x05].get(), cpu.get_register_set()[0x05].get()) # fmt: skip
+        # Returns when the resumed program returns with IRET
+        restored.start(port=None)
+        self.assertEqual(restored.get_memory().read_uint(RESULT_ADDRESS, 2), 100)
+
+    def test_restored_interrupt_resumes_and_returns(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit()
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        cpu.load_program(COUNTER_ADDRESS, COUNTER)
+        cpu.start_sliced(0x00)
+        self.assertEqual(cpu.run_slice(10), ExecutionStatus.IDLE)
+        cpu.queue_interrupt(Interrupt(0x01, COUNTER_ADDRESS, bytearray()))
+        self.assertIsNone(cpu.run_slice(50))
+        self.assertEqual(cpu.get_interrupt_controller().context_depth, 1)
+        restored: CentralProcessingUnit = cpu.clone()
+        restored.start_sliced()
+        self.assertEqual(restored.run_slice(1000), ExecutionStatus.IDLE)
+        self.assertEqual(restored.get_memory().read_uint(RESULT_ADDRESS, 2), 100)
+        self.assertEqual(restored.get_interrupt_controller().context_depth, 0)
+        self.assertEqual(restored.get_register_set()[0x05].get(), 0x00)
+
+    def test_registers_wider_than_8_bytes(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit(r1_size_byte=16)
+        cpu.load_program(0x00, bytearray([0x19]))  # System loop: WFI
+        cpu.load_program(COUNTER_ADDRESS, COUNTER)
+        cpu.get_register_set()[0x01].set(2**100)
+        cpu.start_sliced(0x00)
+        cpu.queue_interrupt(Interrupt(0x01, COUNTER_ADDRESS, bytearray()))
+        self.assertIsNone(cpu.run_slice(50))
+        # The interrupted program's R1 is saved in the context
+        cpu.get_register_set()[0x01].set(2**127 + 1)
+        snapshot: MachineSnapshot = MachineSnapshot.from_buffer(cpu.snapshot().to_bytes())
+        self.assertEqual(snapshot.registers[0x01], 2**127 + 1)
+        self.assertEqual(snapshot.contexts[0].R1, 2**100)
+        restored: CentralProcessingUnit = CentralProcessingUnit.from_snapshot(snapshot)
+        self.assertEqual(restored.get_register_set()[0x01].get(), 2**127 + 1)
+        restored.start_sliced()
+        self.assertEqual(restored.run_slice(1000), ExecutionStatus.IDLE)
+        self.assertEqual(restored.get_register_set()[0x01].get(), 2**100)
+
+    def test_paged_memory_is_rejected(self):
+        cpu: CentralProcessingUnit = CentralProcessingUnit(1 << 32, page_size=4096)
+        with self.assertRaises(ValueError):
+            cpu.snapshot()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from assembler.Assembler import Assembler
+from CentralProcessingUnit import CentralProcessingUnit
+from loader.ProgramImage import ProgramImage
+from tracer.TraceDecoder import TraceDecoder
+from tracer.Tracer import Tracer
+from data_types import RunResult, TraceRecord
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Counts R1 to 5 storing every value, then fails dividing by zero
+COUNTER: str = ".load 0x20\nMOV R1, 0\nloop: ADD R1, R1, 1\nSTR R1, [0x80]\nCMP R1, 5\nBNE loop\nMOV R2, 0\nDIV R0, R1, R2\nHLT\n" # fmt: skip
+# Squares 0xFFFF three times, the result needs 16 bytes
+WIDE: str = "MOV R0, 0xFFFF\nMUL R0, R0, R0\nMUL R0, R0, R0\nMUL R0, R0, R0\nHLT\n"
+
+
+def trace(source: str, **options) -> tuple[RunResult, list[TraceRecord]]:
+    tracer: Tracer = Tracer()
+    result: RunResult = CentralProcessingUnit(tracer=tracer, **options).run(Assembler().assemble(source)) # fmt: skip
+    return result, Tracer.from_bytes(tracer.to_bytes())
+
+
+class TracerTest(unittest.TestCase):
+    def test_compiled_blocks_record_like_the_interpreter(self):
+        compiled_result, compiled = trace(COUNTER)
+        interpreted_result, interpreted = trace(COUNTER, use_block_compiler=False)
+        self.assertEqual(compiled, interpreted)
+        self.assertEqual((compiled_result.status, compiled_result.cycles, compiled_result.error), (interpreted_result.status, interpreted_result.cycles, interpreted_result.error)) # fmt: skip
+        self.assertEqual(len(compiled), compiled_result.cycles + 1)
+        store: TraceRecord = compiled[2]
+        self.assertEqual((store.address, store.memory_address, store.memory_length), (0x2B, 0x80, 1)) # fmt: skip
+        self.assertEqual((compiled[1].register, compiled[1].register_value), (0x01, 1))
+        self.assertTrue(compiled[-1].error)
+        self.assertEqual(compiled[-1].address, 0x3E)
+
+    def test_tracing_does_not_change_the_result(self):
+        image: ProgramImage = Assembler().assemble(WIDE)
+        for use_block_compiler in (False, True):
+            with self.subTest(use_block_compiler=use_block_compiler):
+                expected: RunResult = CentralProcessingUnit(r0_size_byte=16, use_block_compiler=use_block_compiler).run(image) # fmt: skip
+                result, records = trace(WIDE, r0_size_byte=16, use_block_compiler=use_block_compiler) # fmt: skip
+                self.assertEqual((result.status, result.registers), (expected.status, expected.registers)) # fmt: skip
+                self.assertEqual(records[3].register_value, 0xFFFF ** 8 & (1 << 128) - 1)
+
+    def test_ring_buffer_keeps_the_last_records(self):
+        tracer: Tracer = Tracer(capacity=4)
+        result: RunResult = CentralProcessingUnit(tracer=tracer).run(Assembler().assemble(COUNTER)) # fmt: skip
+        records: list[TraceRecord] = Tracer.from_bytes(tracer.to_bytes())
+        self.assertEqual([record.cycle for record in records], list(range(result.cycles - 3, result.cycles + 1))) # fmt: skip
+
+    def test_decode_trace_prints_the_trace_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "cpu.trace")
+            cpu: CentralProcessingUnit = CentralProcessingUnit(tracer=Tracer(path=path))
+            cpu.run(Assembler().assemble(COUNTER))
+            output: str = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "decode_trace.py"), path, "--last", "3"],
+                capture_output=True, text=True, check=True, cwd=ROOT,
+            ).stdout  # fmt: skip
+        decoder: TraceDecoder = TraceDecoder(CentralProcessingUnit.INSTRUCTIONS, CentralProcessingUnit.REGISTER_NAMES, CentralProcessingUnit.OPERAND_TYPES) # fmt: skip
+        self.assertEqual(decoder.disassemble(bytes.fromhex("0800000001")), "ADD R0, R0, R1")
+        lines: list[str] = output.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("MOV R2, 0x0000", lines[1])
+        self.assertIn("R2=0x0000", lines[1])
+        self.assertIn("DIV R0, R1, R2", lines[2])
+        self.assertTrue(lines[2].endswith("ERROR"))
+
+    def test_invalid_trace_file(self):
+        for data, message in ((b"VT", "Trace file is too short"), (b"XXXX" + bytes(16), "Not a trace file")): # fmt: skip
+            with self.subTest(message=message):
+                with self.assertRaises(ValueError) as context:
+                    Tracer.from_bytes(data)
+                self.assertEqual(str(context.exception), message)
+
+
+if __name__ == "__main__":
+    unittest.main()
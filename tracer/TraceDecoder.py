@@ -0,0 +1,57 @@
+from typing import Iterable, Iterator
+from data_types import Byte, OperandTypeSet, TraceRecord
+
+
+class TraceDecoder:
+    # Prints trace records as assembly with the mnemonics of the CPU's instruction set
+    # (the tables of CentralProcessingUnit: INSTRUCTIONS, REGISTER_NAMES and OPERAND_TYPES)
+    def __init__(
+        self,
+        instructions: dict[Byte, tuple[str, int]],
+        register_names: dict[Byte, str],
+        operand_type_set: OperandTypeSet,
+    ):
+        self.__instructions: dict[Byte, tuple[str, int]] = instructions
+        self.__register_names: dict[Byte, str] = register_names
+        self.__operand_type_set: OperandTypeSet = operand_type_set
+
+    def __register_name(self, code: int) -> str:
+        return self.__register_names.get(code, f"R?{code:#04x}")
+
+    def disassemble(self, code: bytes) -> str:
+        if not code:
+            return "<not decoded>"
+        if code[0] not in self.__instructions:
+            return f"<unknown opcode {code[0]:#04x}>"
+        mnemonic, number_of_operands = self.__instructions[code[0]]
+        if number_of_operands == 0:
+            return mnemonic
+        operands: list[str] = [
+            self.__register_name(register_code)
+            for register_code in code[2 : 1 + number_of_operands]
+        ]
+        last_operand_type_code: int = code[1]
+        if last_operand_type_code == 0x00:  # Register
+            operands.append(self.__register_name(code[1 + number_of_operands]))
+        elif last_operand_type_code in self.__operand_type_set:
+            operand_size_byte: int = self.__operand_type_set[last_operand_type_code].operand_size_byte # fmt: skip
+            start: int = 1 + number_of_operands
+            value: int = int.from_bytes(code[start : start + operand_size_byte], byteorder="little") # fmt: skip
+            operands.append(f"{value:#06x}")
+        else:
+            operands.append(f"<operand type {last_operand_type_code:#04x}>")
+        return f"{mnemonic} {', '.join(operands)}"
+
+    def format_record(self, record: TraceRecord) -> str:
+        line: str = f"{record.cycle:>10}  {record.address:#06x}  {self.disassemble(record.code):<24} Z={int(record.zero_flag)}" # fmt: skip
+        if record.register is not None:
+            line += f"  {self.__register_name(record.register)}={record.register_value:#06x}"
+        if record.memory_address is not None:
+            line += f"  [{record.memory_address:#06x}+{record.memory_length}]"
+        if record.error:
+            line += "  ERROR"
+        return line
+
+    def format(self, records: Iterable[TraceRecord]) -> Iterator[str]:
+        for record in records:
+            yield self.format_record(record)
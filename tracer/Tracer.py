@@ -0,0 +1,156 @@
+import struct
+from typing import Optional
+from data_types import TraceRecord
+
+
+class Tracer:
+    # Records the last capacity executed instructions in a preallocated ring buffer of packed records.
+    # Record: cycle, PC, flags, encoded instruction, written register and value, written memory range.
+    # Values take as many bytes as the widest register
+    MAGIC: bytes = b"VTRC"
+    VERSION: int = 2
+    HEADER: struct.Struct = struct.Struct("<4sBBHIQ")  # magic, version, value size, instruction length, records, cycles # fmt: skip
+    ZERO_FLAG: int = 0x01
+    REGISTER_WRITTEN: int = 0x02
+    MEMORY_WRITTEN: int = 0x04
+    ERROR: int = 0x08
+    NOT_DECODED: int = 0x10
+    NO_REGISTER: int = 0xFF
+    # Instructions whose first operand is the register they write
+    REGISTER_WRITING_MNEMONICS: set[str] = {
+        "MOV", "ADD", "SUB", "MUL", "DIV", "MOD", "AND", "ORR", "XOR", "NOT", "LSL", "LSR",
+        "LDR", "INP", "CAS", "SWP", "LDADD",
+    }  # fmt: skip
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        path: Optional[str] = None,
+        dump_on_halt: bool = True,
+        instruction_length: int = 6,
+        value_size_byte: int = 8,
+    ):
+        # path is written on HLT (if dump_on_halt) and when an instruction raises an exception.
+        # instruction_length has to hold the longest encoded instruction and value_size_byte the widest
+        # register, the CPU sets both when attaching
+        if capacity < 1:
+            raise ValueError("Trace capacity has to be at least 1 record")
+        self.capacity: int = capacity
+        self.path: Optional[str] = path
+        self.dump_on_halt: bool = dump_on_halt
+        self.cycle: int = 0  # Recorded instructions, also the cycle of the next record
+        self.set_layout(instruction_length, value_size_byte)
+        # Written memory of the current instruction, set by the memory's write listener
+        self.memory_address: int = 0
+        self.memory_length: int = 0
+
+    @staticmethod
+    def __get_record(instruction_length: int, value_size_byte: int) -> struct.Struct:
+        return struct.Struct(f"<QIB{instruction_length}sB{value_size_byte}sIH")
+
+    def set_layout(self, instruction_length: int, value_size_byte: int) -> None:
+        # Clears the trace, the record size depends on the instruction length and value size
+        self.instruction_length: int = instruction_length
+        self.value_size_byte: int = value_size_byte
+        self.__record: struct.Struct = self.__get_record(instruction_length, value_size_byte) # fmt: skip
+        self.__buffer: bytearray = bytearray(self.capacity * self.__record.size)
+        self.cycle = 0
+
+    def on_memory_write(self, address: int, length: int) -> None:
+        self.memory_address = address
+        self.memory_length = length
+
+    def record(
+        self,
+        address: int,
+        code: bytes,
+        zero_flag: bool,
+        register_code: int = NO_REGISTER,
+        register_value: int = 0,
+        error: bool = False,
+    ) -> None:
+        # Called after every instruction, by the interpreter and from compiled blocks
+        flags: int = self.ZERO_FLAG if zero_flag else 0
+        if self.memory_length:
+            flags |= self.MEMORY_WRITTEN
+        if error:
+            flags |= self.ERROR
+        if not code:
+            flags |= self.NOT_DECODED
+        if register_code != self.NO_REGISTER:
+            flags |= self.REGISTER_WRITTEN
+        self.__record.pack_into(
+            self.__buffer,
+            (self.cycle % self.capacity) * self.__record.size,
+            self.cycle,
+            address,
+            flags,
+            code,
+            register_code,
+            register_value.to_bytes(self.value_size_byte, "little"),
+            self.memory_address,
+            self.memory_length,
+        )
+        self.cycle += 1
+        self.memory_length = 0
+
+    def halted(self) -> None:
+        if self.dump_on_halt and self.path is not None:
+            self.dump()
+
+    def failed(self) -> None:
+        if self.path is not None:
+            self.dump()
+
+    def to_bytes(self) -> bytes:
+        # Header and the records from the oldest to the newest
+        records: int = min(self.cycle, self.capacity)
+        record_size: int = self.__record.size
+        split: int = (self.cycle % self.capacity) * record_size if self.cycle > self.capacity else 0 # fmt: skip
+        used: int = records * record_size
+        header: bytes = self.HEADER.pack(self.MAGIC, self.VERSION, self.value_size_byte, self.instruction_length, records, self.cycle) # fmt: skip
+        return header + self.__buffer[split:used] + self.__buffer[:split]
+
+    def dump(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("No trace file given")
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    def clear(self) -> None:
+        self.cycle = 0
+        self.memory_length = 0
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> list[TraceRecord]:
+        if len(data) < cls.HEADER.size:
+            raise ValueError("Trace file is too short")
+        magic, version, value_size_byte, instruction_length, records, _ = cls.HEADER.unpack_from(data) # fmt: skip
+        if magic != cls.MAGIC:
+            raise ValueError("Not a trace file")
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported trace version: {version}")
+        record: struct.Struct = cls.__get_record(instruction_length, value_size_byte)
+        if len(data) != cls.HEADER.size + records * record.size:
+            raise ValueError("Trace file is truncated")
+        return [
+            TraceRecord(
+                cycle=cycle,
+                address=address,
+                code=b"" if flags & cls.NOT_DECODED else code,
+                zero_flag=bool(flags & cls.ZERO_FLAG),
+                register=register_code if flags & cls.REGISTER_WRITTEN else None,
+                register_value=int.from_bytes(register_value, "little"),
+                memory_address=memory_address if flags & cls.MEMORY_WRITTEN else None,
+                memory_length=memory_length,
+                error=bool(flags & cls.ERROR),
+            )
+            for cycle, address, flags, code, register_code, register_value, memory_address, memory_length
+            in record.iter_unpack(memoryview(data)[cls.HEADER.size :])
+        ]  # fmt: skip
+
+    @classmethod
+    def read_file(cls, path: str) -> list[TraceRecord]:
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())